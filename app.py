@@ -7,7 +7,7 @@ import shutil
 import subprocess
 import webbrowser
 import sys
-from flask import Flask, request, render_template, send_from_directory, send_file, flash, g, url_for, abort, jsonify
+from flask import Flask, Response, request, render_template, send_from_directory, send_file, flash, g, url_for, abort, jsonify
 from threading import Timer, Thread, Event, Lock
 import yt_dlp
 import re
@@ -24,15 +24,42 @@ import hashlib
 from html import unescape as html_unescape
 from urllib.parse import urlparse
 import uuid
+import tempfile
+import wave
+import collections
+import atexit
+import importlib.metadata
+from functools import lru_cache
 import pretty_midi
 
 from console_ui import cmd_log, install_pretty_console, print_banner, set_console_title
+from utils.eta import DEFAULT_RATES, DurationModel
+from utils.events import ObservedTasks, TaskEvents
+from utils.hashing import DigestIndex, bytes_digest, file_digest
+from utils.history_store import HistoryStore
+from utils.inflight import InflightRegistry
+from utils.job_store import JobStore, StoredResults
+from utils.fs_watcher import FolderWatcher
+from utils.library_index import MIDI_EXTENSIONS, LibraryIndex
+from utils.long_audio import ProcessGroup, plan_windows, split_wav, stitch_midis, transcribe_chunks, wav_duration
+from utils.media_cache import MediaResultCache
+from utils.progress import STAGE_SPANS, FfmpegProgress, overall_percent, parse_percent_line
+from utils.sheet_cache import SheetCache, sheet_cache_key
+from utils.silence import find_silent_regions, remap_midi, trim_regions
+from utils.scheduler import ConversionScheduler, QueueFull
+from utils.transcription_cache import TranscriptionCache, cache_key, wav_pcm_digest
+from utils.transkun_worker import (
+    TranskunEngine,
+    TranskunEngineUnavailable,
+    TranskunWorkerCrashed,
+    TranskunWorkerError,
+)
 
 install_pretty_console(logging.INFO)
 STARTUP_WARNINGS = []
 
 try:
-    from midi_to_sheets import convert_midi_to_sheets
+    from midi_to_sheets import CONVERTER_VERSION, convert_midi_to_sheets, normalize_settings
     HAS_MIDI_TO_SHEETS = True
 except ImportError as e:
     HAS_MIDI_TO_SHEETS = False
@@ -44,12 +71,32 @@ ALLOWED_EXTENSIONS = {
 }
 ALLOWED_MIDI_EXTENSIONS = {"mid", "midi"}
 HISTORY_FILE = "history.json"
+HISTORY_DB_FILE = "history.sqlite3"
 SETTINGS_FILE = "settings.json"
 
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+def is_truthy(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in {'1', 'true', 'yes', 'on'}
+
 UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", "uploads")
 CONVERTED_FOLDER = os.environ.get("CONVERTED_FOLDER", "converted")
+CACHE_FOLDER = os.environ.get("CACHE_FOLDER", "cache")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(CONVERTED_FOLDER, exist_ok=True)
+os.makedirs(CACHE_FOLDER, exist_ok=True)
 
 COMMON_MACOS_BIN_DIRS = (
     "/opt/homebrew/bin",
@@ -240,45 +287,59 @@ def resolve_transkun_device(device=None) -> str:
         return resolve_transkun_device(None)
     return device
 
-# history.json is written from request handlers and background conversion
-# threads; serialize writes so concurrent conversions can't corrupt it.
-HISTORY_LOCK = Lock()
-
-def ensure_history_file():
-    if not os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+# Conversion history lives in SQLite; a legacy history.json is imported on
+# first start. HISTORY_MAX_ITEMS and HISTORY_MAX_AGE_DAYS bound it (0 = no
+# limit).
+history_store = HistoryStore(
+    HISTORY_DB_FILE,
+    max_items=env_int("HISTORY_MAX_ITEMS", 200),
+    max_age_days=env_int("HISTORY_MAX_AGE_DAYS", 0),
+)
+try:
+    _migrated = history_store.import_json(HISTORY_FILE)
+    if _migrated:
+        cmd_log(logger, "i", "Imported %d history entries from %s", _migrated, HISTORY_FILE)
+except Exception as exc:
+    STARTUP_WARNINGS.append(f"Could not import {HISTORY_FILE}: {exc}")
 
 def load_history(max_items: int | None = None):
-    ensure_history_file()
+    """History entries, newest first."""
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if not isinstance(data, list):
-                return []
-            if max_items:
-                return list(reversed(data[-max_items:]))
-            return list(reversed(data))
-    except Exception:
+        return history_store.entries(limit=max_items)
+    except Exception as exc:
+        logger.error("Failed to read history: %s", exc)
         return []
 
 def append_history(entry: dict):
-    ensure_history_file()
-    with HISTORY_LOCK:
+    stored = history_store.append(entry)
+    if entry.get("midi_name"):
         try:
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if not isinstance(data, list):
-                    data = []
-        except Exception:
-            data = []
+            library_index.refresh_file(entry["midi_name"], library_metadata(entry))
+        except Exception as exc:
+            logger.warning("Could not index %s: %s", entry["midi_name"], exc)
+    return stored
 
-        data.append(entry)
-        if len(data) > 200:
-            data = data[-200:]
+# Per-process prefix, so an ETag from before a restart never matches
+_HISTORY_ETAG_PREFIX = secrets.token_hex(4)
 
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+def history_etag(version: int) -> str:
+    return f"h{_HISTORY_ETAG_PREFIX}-{version}"
+
+def history_not_modified(etag: str):
+    """A 304 response when the client already has this history version."""
+    if etag not in request.if_none_match:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def history_json_response(data, etag: str):
+    response = jsonify(data)
+    response.set_etag(etag)
+    # Revalidate on every use: the ETag makes that a cheap 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 def human_dt(ts: float) -> str:
     try:
@@ -290,6 +351,7 @@ def prepare_history_for_ui(items: list[dict]):
     prepared = []
     for it in items:
         prepared.append({
+            "id": it.get("id"),
             "timestamp": it.get("timestamp"),
             "time_str": human_dt(it.get("timestamp", time.time())),
             "type": it.get("type"),
@@ -304,6 +366,7 @@ def prepare_history_for_ui(items: list[dict]):
             "midi_name": it.get("midi_name"),
             "library": it.get("library"),
             "conversion_time": it.get("conversion_time"),
+            "cache_hit": it.get("cache_hit", False),
         })
     return prepared
 
@@ -553,7 +616,18 @@ def is_allowed_thumbnail_url(url: str) -> bool:
         for domain in ALLOWED_THUMBNAIL_DOMAINS
     )
 
+# Digests of files in the uploads folder, reused until a file changes. Also
+# the digest -> file lookup that deduplicates stored thumbnails; thumbnails
+# saved before the index existed are hashed once, in the background.
+THUMBNAIL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+digest_index = DigestIndex(os.path.join(CACHE_FOLDER, "digests.sqlite3"))
+Thread(target=digest_index.index_folder, args=(UPLOAD_FOLDER, THUMBNAIL_EXTENSIONS), daemon=True).start()
 
+def _upload_url(filename: str) -> str:
+    try:
+        return url_for('serve_upload', filename=filename)
+    except Exception:
+        return f"/uploads/{filename}"
 
 def save_thumbnail_locally(url: str, prefix: str = 'thumb') -> str | None:
     if not is_allowed_thumbnail_url(url):
@@ -596,25 +670,13 @@ def save_thumbnail_locally(url: str, prefix: str = 'thumb') -> str | None:
         logger.warning('Unexpected error fetching thumbnail: %s', exc)
         return None
 
-    blob_sha = hashlib.sha256(blob).hexdigest()
+    blob_sha = bytes_digest(blob)
     uploads_dir = app.config['UPLOAD_FOLDER']
     os.makedirs(uploads_dir, exist_ok=True)
 
-    try:
-        for name in os.listdir(uploads_dir):
-            candidate = os.path.join(uploads_dir, name)
-            if not os.path.isfile(candidate):
-                continue
-            if os.path.splitext(name)[1].lower() not in ('.jpg', '.jpeg', '.png', '.webp'):
-                continue
-            with open(candidate, 'rb') as existing:
-                if hashlib.sha256(existing.read()).hexdigest() == blob_sha:
-                    try:
-                        return url_for('serve_upload', filename=name)
-                    except Exception:
-                        return f"/uploads/{name}"
-    except Exception as exc:
-        logger.warning('Failed to deduplicate thumbnail: %s', exc)
+    existing = digest_index.find(blob_sha, uploads_dir)
+    if existing is not None:
+        return _upload_url(os.path.basename(existing))
 
     ext_map = {
         'image/jpeg': '.jpg',
@@ -629,14 +691,56 @@ def save_thumbnail_locally(url: str, prefix: str = 'thumb') -> str | None:
         if not os.path.exists(destination):
             with open(destination, 'wb') as handle:
                 handle.write(blob)
-        try:
-            return url_for('serve_upload', filename=filename)
-        except Exception:
-            return f"/uploads/{filename}"
+        digest_index.record(destination, blob_sha)
+        return _upload_url(filename)
     except Exception as exc:
         logger.warning('Failed to store thumbnail: %s', exc)
         return None
 
+def store_thumbnail_later(task_id: str, remote_url: str, prefix: str, history_id: int | None,
+                          source: str, url: str, media_id: str | None):
+    """Fetch a finished task's thumbnail into the uploads folder off the
+    conversion path, then point its result, history entry, library row and
+    media cache entry at the local copy, or at nothing when the fetch
+    fails: the remote URL they hold until then is signed and expires. The
+    pending fetch is kept in the job store so a restart retries it."""
+    job_store.add_pending_thumbnail(task_id, {
+        "remote_url": remote_url, "prefix": prefix, "history_id": history_id,
+        "source": source, "url": url, "media_id": media_id,
+    })
+
+    def _run():
+        try:
+            local_url = save_thumbnail_locally(remote_url, prefix) or None
+            entry = history_store.update(history_id, {"thumbnail_url": local_url}) if history_id is not None else None
+            if entry is not None and entry.get("midi_name"):
+                try:
+                    library_index.refresh_file(entry["midi_name"], library_metadata(entry))
+                except Exception as exc:
+                    logger.warning("Could not index %s: %s", entry["midi_name"], exc)
+            _load_stored_task(task_id)
+            result = task_results.get(task_id)
+            if result is not None:
+                result = {**result, "thumbnail_url": local_url}
+                task_results[task_id] = result
+            if url and (result or entry):
+                remember_media_result(source, url, media_id, result or entry)
+        except Exception as exc:
+            logger.warning("Could not store thumbnail for %s: %s", task_id[:8], exc)
+        finally:
+            job_store.finish_pending_thumbnail(task_id)
+
+    Thread(target=_run, name=f"thumbnail:{task_id}", daemon=True).start()
+
+def retry_pending_thumbnails():
+    """Restart the thumbnail fetches a previous run did not finish."""
+    for task_id, fetch in job_store.pending_thumbnails():
+        store_thumbnail_later(
+            task_id, fetch.get("remote_url") or "", fetch.get("prefix") or "thumb",
+            fetch.get("history_id"), fetch.get("source") or "", fetch.get("url") or "",
+            fetch.get("media_id"),
+        )
+
 
 def _resolve_safe_path(base_dir: str, filename: str, allowed_exts: set[str]) -> str:
     if not filename:
@@ -689,21 +793,91 @@ class ConversionCancelled(Exception):
 # so /api/stop can actually kill it instead of letting it run to completion.
 task_processes: dict = {}
 
-def yt_dlp_cancel_options(task_id: str | None) -> dict:
-    """Abort an in-flight yt-dlp download as soon as the task is cancelled."""
+# task_id -> (stage, overall percent, monotonic time) of the last progress
+# update written to conversion_tasks, used to throttle tool output.
+_progress_reported: dict = {}
+PROGRESS_MIN_STEP = 0.5
+PROGRESS_MIN_INTERVAL = 1.0
+
+def report_progress(task_id: str | None, stage: str, fraction: float,
+                    throughput: float | None = None, unit: str | None = None, text: str | None = None):
+    """Record how far a running stage has got, as reported by the tool doing
+    the work. Updates closer than PROGRESS_MIN_STEP percent and
+    PROGRESS_MIN_INTERVAL seconds to the previous one are dropped so chatty
+    tools don't flood the event streams."""
+    if not task_id or not _is_active(task_id):
+        return
+    percent = overall_percent(stage, fraction)
+    now = time.monotonic()
+    last = _progress_reported.get(task_id)
+    if (text is None and fraction < 1.0 and last is not None and last[0] == stage
+            and abs(percent - last[1]) < PROGRESS_MIN_STEP and now - last[2] < PROGRESS_MIN_INTERVAL):
+        return
+    _progress_reported[task_id] = (stage, percent, now)
+    changes = {
+        "stage": stage,
+        "stage_percent": round(100.0 * min(1.0, max(0.0, fraction)), 1),
+        "percent": round(percent, 1),
+        "throughput": round(throughput, 2) if throughput is not None else None,
+        "throughput_unit": unit if throughput is not None else None,
+    }
+    if text:
+        changes["progress"] = text
+    # Runs on tool reader threads: checked and written in one step so a
+    # cancellation landing in between is not overwritten
+    conversion_tasks.merge_if(task_id, ("queued", "processing"), changes)
+
+def _transcription_progress(task_id: str | None):
+    """Output-line callback turning Transkun's tqdm-style percentages into
+    progress, with throughput in seconds of audio per second."""
+    def _on_line(line: str):
+        fraction = parse_percent_line(line)
+        if fraction is None:
+            return
+        estimate = task_estimates.get(task_id, {})
+        throughput = None
+        if estimate.get("audio_seconds") and estimate.get("started"):
+            elapsed = time.time() - estimate["started"]
+            if elapsed > 0:
+                throughput = estimate["audio_seconds"] * fraction / elapsed
+        report_progress(task_id, "transcribe", fraction, throughput, "x")
+    return _on_line
+
+def yt_dlp_progress_options(task_id: str | None) -> dict:
+    """Report download progress from yt-dlp and abort an in-flight download
+    as soon as the task is cancelled."""
     if not task_id:
         return {}
 
-    def _hook(_progress):
+    def _hook(progress):
         if _is_cancelled(task_id):
             raise ConversionCancelled('Cancelled by user')
+        if progress.get('status') != 'downloading':
+            return
+        total = progress.get('total_bytes') or progress.get('total_bytes_estimate')
+        if total:
+            fraction = min(1.0, (progress.get('downloaded_bytes') or 0) / total)
+            report_progress(task_id, "download", fraction, progress.get('speed'), "B/s")
 
     return {'progress_hooks': [_hook]}
 
+def yt_dlp_audio_postprocessors(extract_mp3: bool) -> list:
+    """MP3 extraction is skipped in direct-decode mode: ffmpeg decodes the
+    downloaded container straight to PCM later, so the 320k re-encode would
+    only be decoded again."""
+    if not extract_mp3:
+        return []
+    return [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '320',
+    }]
+
 def download_mp3_from_youtube(youtube_url: str, output_dir: str,
                               custom_name: str | None = None,
                               cookiefile: str | None = None,
-                              task_id: str | None = None) -> tuple[str, str, str]:
+                              task_id: str | None = None,
+                              extract_mp3: bool = True) -> tuple[str, str, str, str | None]:
     if not is_valid_youtube_url(youtube_url):
         raise ValueError("Invalid YouTube URL")
 
@@ -736,15 +910,11 @@ def download_mp3_from_youtube(youtube_url: str, output_dir: str,
                     'webpage_client': ['web_safari'],
                 },
             },
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '320',
-            }],
+            'postprocessors': yt_dlp_audio_postprocessors(extract_mp3),
         }
         ydl_opts.update(quiet_yt_dlp_options())
         ydl_opts.update(yt_dlp_js_runtime_options())
-        ydl_opts.update(yt_dlp_cancel_options(task_id))
+        ydl_opts.update(yt_dlp_progress_options(task_id))
 
         if cookiefile:
             ydl_opts['cookiefile'] = cookiefile
@@ -774,11 +944,15 @@ def download_mp3_from_youtube(youtube_url: str, output_dir: str,
     if original_ext == 'mhtml':
         raise ValueError('Video downloaded as MHTML format (web archive). This video may have restrictions or audio is not available. Please try a different video.')
     
-    src_mp3 = os.path.splitext(prepared)[0] + '.mp3'
+    if extract_mp3:
+        src_audio = os.path.splitext(prepared)[0] + '.mp3'
+    else:
+        src_audio = prepared
 
-    if not os.path.exists(src_mp3):
+    if not os.path.exists(src_audio):
         original_file = os.path.splitext(prepared)[0] + '.' + original_ext
-        if os.path.exists(original_file) and original_ext not in ['mp3', 'mhtml']:
+        src_mp3 = os.path.splitext(prepared)[0] + '.mp3'
+        if extract_mp3 and os.path.exists(original_file) and original_ext not in ['mp3', 'mhtml']:
             logger.warning(f"MP3 postprocessing may have failed. Attempting manual conversion from {original_file}")
             try:
                 ffmpeg_cmd = [
@@ -800,31 +974,36 @@ def download_mp3_from_youtube(youtube_url: str, output_dir: str,
             except Exception as e:
                 raise FileNotFoundError(f'Failed to convert to MP3: {str(e)}')
         else:
-            raise FileNotFoundError(f'MP3 file not found after download. Original format: {original_ext}')
+            raise FileNotFoundError(f'Audio file not found after download. Original format: {original_ext}')
 
+    audio_ext = os.path.splitext(src_audio)[1] or '.mp3'
     if custom_name:
         sanitized = sanitize_filename(custom_name)
-        target_name = (sanitized or 'video') + '.mp3'
+        target_name = (sanitized or 'video') + audio_ext
     else:
         title = info_dict.get('title') or 'video'
         sanitized_title = sanitize_filename(title)
-        target_name = (sanitized_title or 'video') + '.mp3'
+        target_name = (sanitized_title or 'video') + audio_ext
 
     dest_path = os.path.join(output_dir, target_name)
     dest_path = get_unique_filepath(dest_path)
 
-    shutil.move(src_mp3, dest_path)
+    shutil.move(src_audio, dest_path)
     if not os.path.exists(dest_path):
-        raise FileNotFoundError('Failed to move MP3 to destination')
+        raise FileNotFoundError('Failed to move audio to destination')
 
     video_title = info_dict.get('title', 'video')
     thumbnail_url = info_dict.get('thumbnail', '')
-    return dest_path, video_title, thumbnail_url
+    return dest_path, video_title, thumbnail_url, info_dict.get('id')
 
 def download_mp3_from_tiktok(tiktok_url: str, output_dir: str,
                              custom_name: str | None = None,
                              cookiefile: str | None = None,
-                             task_id: str | None = None) -> tuple[str, str, str]:
+                             task_id: str | None = None,
+                             extract_mp3: bool = True,
+                             store_thumbnail: bool = True) -> tuple[str, str, str, str | None]:
+    """store_thumbnail=False returns the remote thumbnail URL instead of
+    fetching it into the uploads folder (see store_thumbnail_later)."""
     if not is_valid_tiktok_url(tiktok_url):
         raise ValueError("Invalid TikTok URL")
 
@@ -838,14 +1017,10 @@ def download_mp3_from_tiktok(tiktok_url: str, output_dir: str,
         'restrictfilenames': True,
         'noplaylist': True,
         'ignoreerrors': True,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '320',
-        }],
+        'postprocessors': yt_dlp_audio_postprocessors(extract_mp3),
     }
     ydl_opts.update(quiet_yt_dlp_options())
-    ydl_opts.update(yt_dlp_cancel_options(task_id))
+    ydl_opts.update(yt_dlp_progress_options(task_id))
 
     if cookiefile:
         ydl_opts['cookiefile'] = cookiefile
@@ -855,45 +1030,52 @@ def download_mp3_from_tiktok(tiktok_url: str, output_dir: str,
         if info_dict is None:
             raise ValueError('Download failed')
         prepared = ydl.prepare_filename(info_dict)
-        src_mp3 = os.path.splitext(prepared)[0] + '.mp3'
+        src_audio = os.path.splitext(prepared)[0] + '.mp3' if extract_mp3 else prepared
 
+    audio_ext = os.path.splitext(src_audio)[1] or '.mp3'
     if custom_name:
         sanitized = sanitize_filename(custom_name)
-        target_name = (sanitized or 'video') + '.mp3'
+        target_name = (sanitized or 'video') + audio_ext
     else:
         title = info_dict.get('title') or 'video'
         sanitized_title = sanitize_filename(title)
-        target_name = (sanitized_title or 'video') + '.mp3'
+        target_name = (sanitized_title or 'video') + audio_ext
 
     dest_path = os.path.join(output_dir, target_name)
     dest_path = get_unique_filepath(dest_path)
 
-    if not os.path.exists(src_mp3):
+    if not os.path.exists(src_audio):
         # Postprocessor didn't produce an MP3 — try converting the original
         # download ourselves so the real ffmpeg error reaches the UI.
-        if prepared and os.path.exists(prepared) and not prepared.endswith('.mp3'):
+        if extract_mp3 and prepared and os.path.exists(prepared) and not prepared.endswith('.mp3'):
             logger.warning(f"MP3 postprocessing failed, converting manually: {os.path.basename(prepared)}")
-            convert_to_mp3(prepared, src_mp3, task_id=task_id)
+            convert_to_mp3(prepared, src_audio, task_id=task_id)
             try:
                 os.remove(prepared)
             except OSError:
                 pass
         else:
-            raise FileNotFoundError('MP3 file not found after download')
+            raise FileNotFoundError('Audio file not found after download')
 
-    shutil.move(src_mp3, dest_path)
+    shutil.move(src_audio, dest_path)
     if not os.path.exists(dest_path):
-        raise FileNotFoundError('Failed to move MP3 to destination')
+        raise FileNotFoundError('Failed to move audio to destination')
 
     video_title = info_dict.get('title', 'video')
     raw_thumb = info_dict.get("thumbnail", "")
+    if not store_thumbnail:
+        return dest_path, video_title, raw_thumb, info_dict.get('id')
     thumbnail_url = save_thumbnail_locally(raw_thumb, "tiktok") if raw_thumb else None
-    return dest_path, video_title, thumbnail_url
+    return dest_path, video_title, thumbnail_url, info_dict.get('id')
 
 def download_mp3_from_discord(discord_url: str, output_dir: str,
                               custom_name: str | None = None,
                               cookiefile: str | None = None,
-                              task_id: str | None = None) -> tuple[str, str, str]:
+                              task_id: str | None = None,
+                              extract_mp3: bool = True,
+                              store_thumbnail: bool = True) -> tuple[str, str, str, str | None]:
+    """store_thumbnail=False returns the remote thumbnail URL instead of
+    fetching it into the uploads folder (see store_thumbnail_later)."""
     if not is_valid_discord_url(discord_url):
         raise ValueError("Invalid Discord URL")
 
@@ -905,14 +1087,10 @@ def download_mp3_from_discord(discord_url: str, output_dir: str,
         'restrictfilenames': True,
         'noplaylist': True,
         'ignoreerrors': True,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '320',
-        }],
+        'postprocessors': yt_dlp_audio_postprocessors(extract_mp3),
     }
     ydl_opts.update(quiet_yt_dlp_options())
-    ydl_opts.update(yt_dlp_cancel_options(task_id))
+    ydl_opts.update(yt_dlp_progress_options(task_id))
 
     if cookiefile:
         ydl_opts['cookiefile'] = cookiefile
@@ -922,72 +1100,125 @@ def download_mp3_from_discord(discord_url: str, output_dir: str,
         if info_dict is None:
             raise ValueError('Download failed')
         prepared = ydl.prepare_filename(info_dict)
-        src_mp3 = os.path.splitext(prepared)[0] + '.mp3'
+        src_audio = os.path.splitext(prepared)[0] + '.mp3' if extract_mp3 else prepared
 
+    audio_ext = os.path.splitext(src_audio)[1] or '.mp3'
     if custom_name:
         sanitized = sanitize_filename(custom_name)
-        target_name = (sanitized or 'video') + '.mp3'
+        target_name = (sanitized or 'video') + audio_ext
     else:
         title = info_dict.get('title') or 'discord_audio'
         sanitized_title = sanitize_filename(title)
-        target_name = (sanitized_title or 'discord_audio') + '.mp3'
+        target_name = (sanitized_title or 'discord_audio') + audio_ext
 
     dest_path = os.path.join(output_dir, target_name)
     dest_path = get_unique_filepath(dest_path)
 
-    if not os.path.exists(src_mp3):
+    if not os.path.exists(src_audio):
         # Postprocessor didn't produce an MP3 — try converting the original
         # download ourselves so the real ffmpeg error reaches the UI.
-        if prepared and os.path.exists(prepared) and not prepared.endswith('.mp3'):
+        if extract_mp3 and prepared and os.path.exists(prepared) and not prepared.endswith('.mp3'):
             logger.warning(f"MP3 postprocessing failed, converting manually: {os.path.basename(prepared)}")
-            convert_to_mp3(prepared, src_mp3, task_id=task_id)
+            convert_to_mp3(prepared, src_audio, task_id=task_id)
             try:
                 os.remove(prepared)
             except OSError:
                 pass
         else:
-            raise FileNotFoundError('MP3 file not found after download')
+            raise FileNotFoundError('Audio file not found after download')
 
-    shutil.move(src_mp3, dest_path)
+    shutil.move(src_audio, dest_path)
     if not os.path.exists(dest_path):
-        raise FileNotFoundError('Failed to move MP3 to destination')
+        raise FileNotFoundError('Failed to move audio to destination')
 
     video_title = info_dict.get('title', 'discord_audio')
     raw_thumb = info_dict.get("thumbnail", "")
+    if not store_thumbnail:
+        return dest_path, video_title, raw_thumb, info_dict.get('id')
     thumbnail_url = save_thumbnail_locally(raw_thumb, "discord") if raw_thumb else None
-    return dest_path, video_title, thumbnail_url
+    return dest_path, video_title, thumbnail_url, info_dict.get('id')
+
 
+# Lines of output kept from streams handed to a callback (and from stderr
+# always), enough for error messages without buffering hours of tool output.
+SUBPROCESS_TAIL_LINES = 200
 
-def _run_tracked_subprocess(cmd: list[str], task_id: str | None = None, timeout: int | None = None):
+def _run_tracked_subprocess(cmd: list[str], task_id: str | None = None, timeout: int | None = None,
+                            on_stdout_line=None, on_stderr_line=None):
     """Run a subprocess, registering it in task_processes so /api/stop can kill it.
 
-    Returns (returncode, stdout, stderr). Raises ConversionCancelled when the
+    Output is read line by line while the process runs and passed to the
+    optional callbacks (carriage returns end a line too, so progress bars
+    arrive as they redraw). Returns (returncode, stdout, stderr): stdout in
+    full unless on_stdout_line consumes it, otherwise like stderr only its
+    last SUBPROCESS_TAIL_LINES lines. Raises ConversionCancelled when the
     process exits abnormally after its task was cancelled (i.e. it was killed).
     """
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    proc = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, encoding='utf-8', errors='replace', bufsize=1,
+    )
     if task_id:
         task_processes[task_id] = proc
+    stdout_lines = [] if on_stdout_line is None else collections.deque(maxlen=SUBPROCESS_TAIL_LINES)
+    stderr_lines = collections.deque(maxlen=SUBPROCESS_TAIL_LINES)
+
+    def _pump(stream, sink, callback):
+        try:
+            for line in stream:
+                sink.append(line)
+                if callback is not None:
+                    try:
+                        callback(line.rstrip('\n'))
+                    except Exception:
+                        logger.debug("Output callback failed for %s", cmd[0], exc_info=True)
+        finally:
+            stream.close()
+
+    readers = [
+        Thread(target=_pump, args=(proc.stdout, stdout_lines, on_stdout_line), daemon=True),
+        Thread(target=_pump, args=(proc.stderr, stderr_lines, on_stderr_line), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
     try:
-        stdout, stderr = proc.communicate(timeout=timeout)
-    except subprocess.TimeoutExpired:
-        proc.kill()
-        proc.communicate()
-        raise
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            for reader in readers:
+                reader.join()
     finally:
         if task_id:
             task_processes.pop(task_id, None)
     if proc.returncode != 0 and task_id and _is_cancelled(task_id):
         raise ConversionCancelled('Cancelled by user')
-    return proc.returncode, stdout, stderr
+    return proc.returncode, ''.join(stdout_lines), ''.join(stderr_lines)
+
+def _ffmpeg_progress(task_id: str | None, duration: float | None):
+    """stdout callback for an ffmpeg run with `-progress pipe:1`, reporting
+    the decode stage against the probed media duration."""
+    if not task_id or not duration:
+        return None
+    parser = FfmpegProgress(
+        duration, lambda fraction, speed: report_progress(task_id, "decode", fraction, speed, "x")
+    )
+    return parser.feed
 
-def convert_to_mp3(input_path: str, output_path: str, task_id: str | None = None) -> str:
+def convert_to_mp3(input_path: str, output_path: str, task_id: str | None = None,
+                   duration: float | None = None) -> str:
     try:
         ffmpeg_cmd = [
             'ffmpeg', '-i', input_path,
             '-vn', '-acodec', 'libmp3lame', '-ab', '320k',
-            '-ar', '44100', '-y', output_path
+            '-ar', '44100', '-progress', 'pipe:1', '-nostats', '-y', output_path
         ]
-        returncode, _, stderr = _run_tracked_subprocess(ffmpeg_cmd, task_id=task_id, timeout=600)
+        returncode, _, stderr = _run_tracked_subprocess(
+            ffmpeg_cmd, task_id=task_id, timeout=600, on_stdout_line=_ffmpeg_progress(task_id, duration)
+        )
         if returncode != 0:
             # RuntimeError, not FileNotFoundError: the message contains "ffmpeg",
             # which the handler below would misreport as "FFmpeg not found"
@@ -1007,6 +1238,253 @@ def convert_to_mp3(input_path: str, output_path: str, task_id: str | None = None
     except Exception as e:
         raise Exception(f'Failed to convert to MP3: {str(e)}')
 
+# "resident" keeps the Transkun model loaded in long-lived worker processes;
+# "subprocess" runs the transkun CLI per job. Resident mode falls back to the
+# CLI on its own when a worker cannot load the model.
+TRANSKUN_ENGINE_MODE = os.environ.get("TRANSKUN_ENGINE", "resident").strip().lower()
+transkun_engine = TranskunEngine(cwd=os.path.dirname(os.path.abspath(__file__)))
+atexit.register(transkun_engine.shutdown)
+
+def _transcribe_resident(input_path, output_path, device, task_id=None) -> bool:
+    """Run a job on a resident worker. Returns False when the caller should
+    fall back to the transkun CLI."""
+    if TRANSKUN_ENGINE_MODE != "resident" or not transkun_engine.available(device):
+        return False
+
+    def _register(proc):
+        if task_id:
+            task_processes[task_id] = proc
+
+    try:
+        transkun_engine.transcribe(
+            input_path, output_path, device, on_start=_register,
+            on_output=_transcription_progress(task_id) if task_id else None,
+        )
+        return True
+    except TranskunEngineUnavailable as exc:
+        logger.warning("Resident Transkun engine unavailable on %s, using the CLI: %s", device, exc)
+    except TranskunWorkerCrashed as exc:
+        if task_id and _is_cancelled(task_id):
+            raise ConversionCancelled('Cancelled by user')
+        logger.warning("Resident Transkun worker crashed, retrying with the CLI: %s", compact_tool_output(str(exc)))
+    except TranskunWorkerError as exc:
+        cmd_log(logger, "-", "Transkun failed: %s", compact_tool_output(str(exc)), level=logging.ERROR)
+        raise
+    finally:
+        if task_id:
+            task_processes.pop(task_id, None)
+    if task_id and _is_cancelled(task_id):
+        raise ConversionCancelled('Cancelled by user')
+    return False
+
+# "direct" decodes every input once into PCM WAV at the model's sample rate
+# and hands that to Transkun; "mp3" keeps the older MP3 normalization step.
+CONVERSION_PIPELINE = os.environ.get("CONVERSION_PIPELINE", "direct").strip().lower()
+DIRECT_DECODE = CONVERSION_PIPELINE != "mp3"
+TRANSKUN_SAMPLE_RATE = env_int("TRANSKUN_SAMPLE_RATE", 44100)
+
+def decode_to_pcm(input_path: str, output_path: str, task_id: str | None = None,
+                  duration: float | None = None) -> str:
+    """Decode any supported media into mono 16-bit PCM WAV at Transkun's
+    sample rate, so transcription reads it without another decode/resample.
+    With the media duration known, ffmpeg's progress is reported to the task."""
+    try:
+        ffmpeg_cmd = [
+            'ffmpeg', '-i', input_path,
+            '-vn', '-ac', '1', '-ar', str(TRANSKUN_SAMPLE_RATE),
+            '-c:a', 'pcm_s16le', '-progress', 'pipe:1', '-nostats', '-y', output_path
+        ]
+        returncode, _, stderr = _run_tracked_subprocess(
+            ffmpeg_cmd, task_id=task_id, timeout=600, on_stdout_line=_ffmpeg_progress(task_id, duration)
+        )
+        if returncode != 0:
+            error_msg = compact_tool_output(stderr) or 'Unknown error'
+            raise RuntimeError(f'FFmpeg decode failed: {error_msg}')
+        if not os.path.exists(output_path):
+            raise FileNotFoundError('WAV file not created after decoding')
+        return output_path
+    except ConversionCancelled:
+        raise
+    except FileNotFoundError as e:
+        if 'ffmpeg' in str(e).lower():
+            raise FileNotFoundError('FFmpeg not found. Please install FFmpeg to convert audio/video.')
+        raise
+    except subprocess.TimeoutExpired:
+        raise TimeoutError('FFmpeg decoding timed out (10 minutes)')
+    except Exception as e:
+        raise Exception(f'Failed to decode audio: {str(e)}')
+
+def probe_media(path: str, task_id: str | None = None) -> dict | None:
+    """Duration, codec and sample rate of the first audio stream via ffprobe.
+    Returns None when ffprobe is unavailable or cannot read the file, and
+    {"audio": False} when the file has no audio stream at all."""
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'a:0',
+        '-show_entries', 'format=duration:stream=codec_name,sample_rate,channels,duration',
+        '-of', 'json', path,
+    ]
+    try:
+        returncode, stdout, _ = _run_tracked_subprocess(cmd, task_id=task_id, timeout=30)
+    except ConversionCancelled:
+        raise
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        logger.debug("ffprobe unavailable for %s: %s", path, exc)
+        return None
+    if returncode != 0:
+        return None
+    try:
+        info = json.loads(stdout or "{}")
+    except ValueError:
+        return None
+
+    streams = info.get("streams") or []
+    if not streams:
+        return {"audio": False}
+    stream = streams[0]
+
+    def _number(value, cast=float):
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return None
+
+    duration = _number((info.get("format") or {}).get("duration")) or _number(stream.get("duration"))
+    return {
+        "audio": True,
+        "duration": round(duration, 2) if duration else None,
+        "codec": stream.get("codec_name"),
+        "sample_rate": _number(stream.get("sample_rate"), int),
+        "channels": _number(stream.get("channels"), int),
+    }
+
+def prepare_transcription_audio(source_path: str, task_id: str | None = None,
+                                duration: float | None = None) -> str:
+    """Return the file Transkun should read for a downloaded or uploaded file.
+
+    The result may be source_path itself (an MP3 in mp3 mode); otherwise it is
+    a new file in the upload folder that the caller must clean up.
+    """
+    base = os.path.splitext(os.path.basename(source_path))[0]
+    if DIRECT_DECODE:
+        pcm_path = get_unique_filepath(os.path.join(app.config['UPLOAD_FOLDER'], f"{base}.wav"))
+        return decode_to_pcm(source_path, pcm_path, task_id=task_id, duration=duration)
+    if source_path.lower().endswith('.mp3'):
+        return source_path
+    mp3_path = get_unique_filepath(os.path.join(app.config['UPLOAD_FOLDER'], f"{base}.mp3"))
+    return convert_to_mp3(source_path, mp3_path, task_id=task_id, duration=duration)
+
+# Silent stretches longer than SILENCE_MIN_SECONDS are cut from the decoded
+# WAV before transcription and the MIDI is shifted back afterwards.
+SILENCE_TRIM = is_truthy(os.environ.get("SILENCE_TRIM", "1"))
+SILENCE_THRESHOLD_DB = env_float("SILENCE_THRESHOLD_DB", -50.0)
+SILENCE_MIN_SECONDS = max(0.5, env_float("SILENCE_MIN_SECONDS", 2.0))
+
+def trim_silence(wav_path: str) -> tuple[str, list | None, dict | None]:
+    """Returns (audio to transcribe, kept segments, stats). The segments are
+    None when nothing was cut and the input is used as is."""
+    if not SILENCE_TRIM or not wav_path.lower().endswith(".wav"):
+        return wav_path, None, None
+    try:
+        regions, duration = find_silent_regions(
+            wav_path, threshold_db=SILENCE_THRESHOLD_DB, min_silence=SILENCE_MIN_SECONDS
+        )
+    except (ValueError, wave.Error, EOFError) as exc:
+        logger.warning("Silence scan skipped: %s", exc)
+        return wav_path, None, None
+
+    skipped = sum(end - start for start, end in regions)
+    stats = {
+        "original_seconds": round(duration, 2),
+        "skipped_seconds": round(skipped, 2),
+        "skipped_regions": len(regions),
+    }
+    if not regions or skipped >= duration:
+        stats["skipped_seconds"] = 0
+        stats["skipped_regions"] = 0
+        return wav_path, None, stats
+
+    trimmed_path = os.path.splitext(wav_path)[0] + "_trimmed.wav"
+    segments = trim_regions(wav_path, trimmed_path, regions)
+    cmd_log(logger, "i", "Skipping %.1fs of silence in %d regions", skipped, len(regions))
+    return trimmed_path, segments, stats
+
+def keep_audio_copy(source_path: str, task_id: str | None = None) -> str:
+    """Store an MP3 of the source next to the MIDI, for users who asked to
+    keep the audio. Nothing else produces an MP3 in direct-decode mode."""
+    base = os.path.splitext(os.path.basename(source_path))[0]
+    target = get_unique_filepath(os.path.join(app.config['CONVERTED_FOLDER'], f"{base}.mp3"))
+    if source_path.lower().endswith('.mp3'):
+        shutil.copy2(source_path, target)
+        return target
+    return convert_to_mp3(source_path, target, task_id=task_id)
+
+# Long recordings on CPU are split into overlapping windows transcribed by
+# several resident workers at once, each limited to a share of the cores.
+LONG_AUDIO_THRESHOLD_SECONDS = env_int("LONG_AUDIO_THRESHOLD_SECONDS", 900)
+LONG_AUDIO_WINDOW_SECONDS = max(30, env_int("LONG_AUDIO_WINDOW_SECONDS", 120))
+LONG_AUDIO_OVERLAP_SECONDS = max(0, env_int("LONG_AUDIO_OVERLAP_SECONDS", 6))
+LONG_AUDIO_WORKERS = max(1, env_int("LONG_AUDIO_WORKERS", max(1, min(4, (os.cpu_count() or 2) // 2))))
+LONG_AUDIO_THREADS = max(1, env_int("LONG_AUDIO_THREADS", max(1, (os.cpu_count() or 1) // LONG_AUDIO_WORKERS)))
+
+def use_long_audio_mode(audio_path: str, device: str) -> bool:
+    """Chunked mode needs decoded WAV input and resident CPU workers."""
+    if device != "cpu" or LONG_AUDIO_THRESHOLD_SECONDS <= 0:
+        return False
+    if not audio_path.lower().endswith(".wav"):
+        return False
+    if TRANSKUN_ENGINE_MODE != "resident" or not transkun_engine.available("cpu"):
+        return False
+    try:
+        return wav_duration(audio_path) > LONG_AUDIO_THRESHOLD_SECONDS
+    except (wave.Error, EOFError, OSError):
+        return False
+
+def _transcribe_long_audio(input_path, output_path, task_id=None) -> bool:
+    """Chunked CPU transcription. Returns False when the caller should fall
+    back to a single serial run."""
+    windows = plan_windows(wav_duration(input_path), LONG_AUDIO_WINDOW_SECONDS, LONG_AUDIO_OVERLAP_SECONDS)
+    cmd_log(
+        logger, "i", "Long audio: transcribing %d windows on %d workers x %d threads",
+        len(windows), LONG_AUDIO_WORKERS, LONG_AUDIO_THREADS,
+    )
+    chunk_dir = tempfile.mkdtemp(prefix="chunks_", dir=UPLOAD_FOLDER)
+    group = ProcessGroup()
+    if task_id:
+        task_processes[task_id] = group
+    finished = [0]
+    finished_lock = Lock()
+
+    def _one(src, dst):
+        if task_id and _is_cancelled(task_id):
+            raise ConversionCancelled('Cancelled by user')
+        transkun_engine.transcribe(src, dst, "cpu", threads=LONG_AUDIO_THREADS, on_start=group.add)
+        with finished_lock:
+            finished[0] += 1
+            done = finished[0]
+        report_progress(
+            task_id, "transcribe", done / len(windows),
+            text=f"Converting to MIDI ({done}/{len(windows)} sections)...",
+        )
+
+    try:
+        chunk_paths = split_wav(input_path, chunk_dir, windows)
+        midi_paths = transcribe_chunks(chunk_paths, _one, LONG_AUDIO_WORKERS)
+        stitch_midis(midi_paths, windows, output_path)
+        return True
+    except TranskunEngineUnavailable as exc:
+        logger.warning("Resident Transkun engine unavailable for chunked mode: %s", exc)
+    except TranskunWorkerCrashed as exc:
+        if task_id and _is_cancelled(task_id):
+            raise ConversionCancelled('Cancelled by user')
+        logger.warning("Chunked transcription failed, retrying serially: %s", compact_tool_output(str(exc)))
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        if task_id:
+            task_processes.pop(task_id, None)
+    if task_id and _is_cancelled(task_id):
+        raise ConversionCancelled('Cancelled by user')
+    return False
+
 def convert_to_midi(input_path, output_path, device=None, task_id=None):
     try:
         device = resolve_transkun_device(device)
@@ -1018,12 +1496,22 @@ def convert_to_midi(input_path, output_path, device=None, task_id=None):
             os.path.basename(output_path),
             device,
         )
+        if use_long_audio_mode(input_path, device) and _transcribe_long_audio(input_path, output_path, task_id=task_id):
+            cmd_log(logger, "+", "Transkun finished: %s", os.path.basename(output_path))
+            return "transkun"
+        if _transcribe_resident(input_path, output_path, device, task_id=task_id):
+            cmd_log(logger, "+", "Transkun finished: %s", os.path.basename(output_path))
+            return "transkun"
+
         transkun_cmd = shutil.which("transkun")
         if transkun_cmd:
             cmd = [transkun_cmd, input_path, output_path, "--device", device]
         else:
             cmd = [sys.executable, "-m", "transkun.transcribe", input_path, output_path, "--device", device]
-        returncode, stdout, stderr = _run_tracked_subprocess(cmd, task_id=task_id)
+        on_line = _transcription_progress(task_id) if task_id else None
+        returncode, stdout, stderr = _run_tracked_subprocess(
+            cmd, task_id=task_id, on_stdout_line=on_line, on_stderr_line=on_line
+        )
         if returncode != 0:
             raise subprocess.CalledProcessError(returncode, cmd, output=stdout, stderr=stderr)
         cmd_log(logger, "+", "Transkun finished: %s", os.path.basename(output_path))
@@ -1043,7 +1531,100 @@ def convert_to_midi(input_path, output_path, device=None, task_id=None):
                 "Transkun is not installed for this Python. Install it with: python3 -m pip install transkun"
             ) from e
         raise
-from functools import lru_cache
+
+# Transkun results keyed by the decoded audio, so a re-uploaded song or the
+# same audio behind another URL is served from disk instead of re-transcribed.
+transcription_cache = TranscriptionCache(
+    os.path.join(CACHE_FOLDER, "transcriptions"),
+    env_int("TRANSCRIPTION_CACHE_MAX_MB", 512) * 1024 * 1024,
+)
+
+# Sheet text per (MIDI content, converter settings, converter version), so
+# reopening a sheet or switching a setting back skips the conversion.
+sheet_cache = SheetCache(
+    os.path.join(CACHE_FOLDER, "sheets"),
+    env_int("SHEET_CACHE_MAX_MB", 64) * 1024 * 1024,
+    memory_items=env_int("SHEET_CACHE_MEMORY_ITEMS", 64),
+)
+# Cache key of the text last written to each _sheets.txt file
+_sheets_file_keys: dict[str, str] = {}
+
+@lru_cache(maxsize=1)
+def transkun_model_id() -> str:
+    try:
+        version = importlib.metadata.version("transkun")
+    except Exception:
+        version = "unknown"
+    parts = [f"transkun-{version}"]
+    # Custom model files are identified by location and stat, so another
+    # checkpoint with the same name, or an edited config, gets its own entries
+    for name in ("TRANSKUN_WEIGHT", "TRANSKUN_CONF"):
+        path = os.environ.get(name)
+        if not path:
+            parts.append("default")
+            continue
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+            parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(path)
+    return ":".join(parts)
+
+def decoded_audio_digest(audio_path: str, task_id: str | None = None) -> str:
+    """Digest of the decoded PCM. Direct-pipeline WAVs are hashed as they are;
+    anything else is decoded by ffmpeg to the same sample format first."""
+    if DIRECT_DECODE and audio_path.lower().endswith('.wav'):
+        return wav_pcm_digest(audio_path)
+
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', audio_path,
+        '-vn', '-ac', '1', '-ar', str(TRANSKUN_SAMPLE_RATE),
+        '-f', 's16le', 'pipe:1'
+    ]
+    digest = hashlib.sha256(f"1:2:{TRANSKUN_SAMPLE_RATE}:".encode())
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    if task_id:
+        task_processes[task_id] = proc
+    try:
+        for chunk in iter(lambda: proc.stdout.read(1024 * 1024), b''):
+            digest.update(chunk)
+        proc.wait()
+    finally:
+        if task_id:
+            task_processes.pop(task_id, None)
+    if proc.returncode != 0:
+        if task_id and _is_cancelled(task_id):
+            raise ConversionCancelled('Cancelled by user')
+        raise RuntimeError(f'FFmpeg could not decode {os.path.basename(audio_path)} for hashing')
+    return digest.hexdigest()
+
+def transcribe_with_cache(audio_path, midi_path, device=None, task_id=None, use_cache=True) -> tuple[str, bool]:
+    """convert_to_midi behind the transcription cache. Returns (library, cache_hit)."""
+    if not use_cache or not transcription_cache.enabled:
+        return convert_to_midi(audio_path, midi_path, device, task_id=task_id), False
+
+    device = resolve_transkun_device(device)
+    try:
+        parts = [transkun_model_id(), device]
+        if use_long_audio_mode(audio_path, device):
+            # Stitched windows can differ slightly from a single run
+            parts.append("chunked")
+        key = cache_key(decoded_audio_digest(audio_path, task_id), *parts)
+    except ConversionCancelled:
+        raise
+    except Exception as exc:
+        logger.warning("Could not fingerprint audio for the transcription cache: %s", exc)
+        return convert_to_midi(audio_path, midi_path, device, task_id=task_id), False
+
+    if transcription_cache.fetch(key, midi_path):
+        cmd_log(logger, "+", "Transcription cache hit: %s", os.path.basename(midi_path))
+        return "transkun", True
+
+    output_library = convert_to_midi(audio_path, midi_path, device, task_id=task_id)
+    transcription_cache.store(key, midi_path)
+    return output_library, False
+
 from utils.system_info import get_system_info
 
 @lru_cache(maxsize=1)
@@ -1110,27 +1691,15 @@ def upload_file():
                 flash("Failed to save file")
                 return render_with_history()
 
-            file_ext = ext.lower().lstrip('.')
-            needs_conversion = file_ext != 'mp3'
-            
+            try:
+                mp3_path = prepare_transcription_audio(original_path)
+            except Exception as e:
+                flash(f"Failed to decode audio: {str(e)}")
+                _cleanup_files(original_path)
+                return render_with_history()
+            needs_conversion = mp3_path != original_path
             if needs_conversion:
-                try:
-                    base_name = os.path.splitext(sanitized_name)[0]
-                    mp3_path = get_unique_filepath(os.path.join(app.config['UPLOAD_FOLDER'], f"{base_name}.mp3"))
-                    convert_to_mp3(original_path, mp3_path)
-                    try:
-                        os.remove(original_path)
-                    except OSError:
-                        pass
-                except Exception as e:
-                    flash(f"Failed to convert to MP3: {str(e)}")
-                    try:
-                        os.remove(original_path)
-                    except OSError:
-                        pass
-                    return render_with_history()
-            else:
-                mp3_path = original_path
+                _cleanup_files(original_path)
 
             base = os.path.splitext(os.path.basename(mp3_path))[0]
             midi_base_value = sanitize_filename(secure_filename(f"{base}_transkun")) or 'conversion'
@@ -1145,13 +1714,13 @@ def upload_file():
             
             start = time.time()
             try:
-                convert_to_midi(mp3_path, midi_path, device)
+                transcribe_with_cache(mp3_path, midi_path, device)
                 conversion_time = round(time.time() - start, 2)
 
                 append_history({
                     "timestamp": time.time(),
                     "type": "upload",
-                    "mp3_name": os.path.basename(mp3_path),
+                    "mp3_name": sanitized_name,
                     "youtube_url": None,
                     "tiktok_url": None,
                     "video_id": None,
@@ -1160,6 +1729,8 @@ def upload_file():
                     "library": "Transkun",
                     "conversion_time": conversion_time,
                 })
+                if needs_conversion:
+                    _cleanup_files(mp3_path)
 
             except Exception as e:
                 flash(f"Conversion failed: {str(e)}")
@@ -1189,28 +1760,31 @@ def upload_file():
                     m = re.search(r"(?:v=|youtu\.be/|shorts/)([\w-]{11})", url)
                     if m:
                         video_id = m.group(1)
-                    mp3_path, video_title, thumbnail_url = download_mp3_from_youtube(
+                    mp3_path, video_title, thumbnail_url, _ = download_mp3_from_youtube(
                         youtube_url=url,
                         output_dir=app.config["UPLOAD_FOLDER"],
                         custom_name=None,
-                        cookiefile=cookiefile, 
+                        cookiefile=cookiefile,
+                        extract_mp3=not DIRECT_DECODE,
                     )
                 elif source == 'tiktok':
-                    mp3_path, video_title, thumbnail_url = download_mp3_from_tiktok(
+                    mp3_path, video_title, thumbnail_url, _ = download_mp3_from_tiktok(
                         tiktok_url=url,
                         output_dir=app.config["UPLOAD_FOLDER"],
                         custom_name=None,
                         cookiefile=None,
+                        extract_mp3=not DIRECT_DECODE,
                     )
                 elif source == 'discord':
-                    mp3_path, video_title, thumbnail_url = download_mp3_from_discord(
+                    mp3_path, video_title, thumbnail_url, _ = download_mp3_from_discord(
                         discord_url=url,
                         output_dir=app.config["UPLOAD_FOLDER"],
                         custom_name=None,
                         cookiefile=None,
+                        extract_mp3=not DIRECT_DECODE,
                     )
                 if not os.path.exists(mp3_path) or os.path.getsize(mp3_path) == 0:
-                    flash("MP3 file was not downloaded successfully.")
+                    flash("Audio file was not downloaded successfully.")
                     return render_with_history()
 
                 midi_name = os.path.splitext(os.path.basename(mp3_path))[0] + "_transkun.mid"
@@ -1223,8 +1797,10 @@ def upload_file():
                     device = None
                 
                 start = time.time()
+                pcm_path = None
                 try:
-                    convert_to_midi(mp3_path, midi_path, device)
+                    pcm_path = prepare_transcription_audio(mp3_path)
+                    transcribe_with_cache(pcm_path, midi_path, device)
                     conversion_time = round(time.time() - start, 2)
 
                     append_history({
@@ -1244,6 +1820,9 @@ def upload_file():
 
                 except Exception as e:
                     flash(f"Conversion failed: {str(e)}")
+                finally:
+                    if pcm_path and pcm_path != mp3_path:
+                        _cleanup_files(pcm_path)
 
             except yt_dlp.DownloadError as e:
                 logger.error(f"YouTube/TikTok/Discord download error: {str(e)}")
@@ -1447,23 +2026,203 @@ def add_csp(response):
     response.headers.setdefault('Cross-Origin-Opener-Policy', 'same-origin')
     return response
 
-conversion_tasks = {}
-task_results = {}
+# Assignments to conversion_tasks are published to the /api/events streams
+# and, like task results, persisted so a restart keeps them.
+task_events = TaskEvents()
+job_store = JobStore(os.path.join(CACHE_FOLDER, "jobs.sqlite3"))
+conversion_tasks = ObservedTasks(task_events, store=job_store)
+task_results = StoredResults(job_store)
+
+# Conversions move through stage pools: "download" (yt-dlp, MuseScore),
+# "decode" (ffmpeg) and one transcription pool per device class. A single
+# CUDA/MPS slot keeps concurrent Transkun runs from fighting over one GPU, a
+# few CPU slots use the cores without oversubscribing them, and the next job
+# downloads and decodes while the current one is on the GPU.
+conversion_scheduler = ConversionScheduler(
+    {
+        "download": env_int("CONVERSION_DOWNLOAD_WORKERS", 2),
+        "decode": env_int("CONVERSION_DECODE_WORKERS", 2),
+        "cuda": env_int("CONVERSION_CUDA_WORKERS", 1),
+        "mps": env_int("CONVERSION_MPS_WORKERS", 1),
+        "cpu": env_int("CONVERSION_CPU_WORKERS", 2),
+    },
+    max_queue=env_int("CONVERSION_MAX_QUEUE", 20),
+)
+
+def _queue_full_response(exc: QueueFull):
+    response = jsonify({
+        "error": f"Too many conversions are queued. Try again in {exc.retry_after} seconds.",
+        "retry_after": exc.retry_after,
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = str(exc.retry_after)
+    return response
+
+# Identical URLs or uploads submitted while one is still queued or running
+# share that task's job instead of downloading and transcribing twice.
+inflight_tasks = InflightRegistry()
+
+# Transcription time against audio length per device (and for the chunked
+# CPU mode), seeded from history and refitted as jobs finish.
+duration_model = DurationModel({"cpu:chunked": DEFAULT_RATES["cpu"] / LONG_AUDIO_WORKERS})
+for _item in load_history():
+    if _item.get("device") and not _item.get("cache_hit"):
+        duration_model.observe(_item["device"], _item.get("audio_seconds"), _item.get("conversion_time"))
+
+# task_id -> {"audio_seconds", "device", "model_key", "predicted", "started"}
+task_estimates = {}
 
 def _is_cancelled(task_id: str) -> bool:
     return conversion_tasks.get(task_id, {}).get("status") == "cancelled"
 
+def _transcription_model_key(audio_path: str | None, device: str) -> str:
+    if audio_path and use_long_audio_mode(audio_path, device):
+        return f"{device}:chunked"
+    return device
+
+def _update_estimate(task_id: str, device, audio_seconds: float | None, audio_path: str | None = None):
+    device = resolve_transkun_device(device)
+    model_key = _transcription_model_key(audio_path, device)
+    task_estimates[task_id] = {
+        **task_estimates.get(task_id, {}),
+        "audio_seconds": audio_seconds,
+        "device": device,
+        "model_key": model_key,
+        "predicted": duration_model.predict(model_key, audio_seconds),
+    }
+
+def choose_transcription_device(job: dict) -> str:
+    """Device pool for the transcription stage. A long recording with no
+    explicit device goes to the chunked CPU mode when that is expected to
+    finish sooner than waiting for and running on the default device."""
+    device = resolve_transkun_device(job["device"])
+    seconds = job.get("audio_seconds")
+    if job["device"] is not None or device == "cpu" or not seconds:
+        return device
+    if LONG_AUDIO_THRESHOLD_SECONDS <= 0 or seconds <= LONG_AUDIO_THRESHOLD_SECONDS:
+        return device
+    if TRANSKUN_ENGINE_MODE != "resident" or not transkun_engine.available("cpu"):
+        return device
+    on_device = conversion_scheduler.pool(device).estimated_wait() + duration_model.predict(device, seconds)
+    chunked = conversion_scheduler.pool("cpu").estimated_wait() + duration_model.predict("cpu:chunked", seconds)
+    if chunked < on_device:
+        cmd_log(logger, "i", "Routing %.0f min of audio to chunked CPU transcription", seconds / 60)
+        job["device"] = "cpu"
+        return "cpu"
+    return device
+
+def estimate_task_progress(task_id: str, placement) -> dict:
+    """eta_seconds and percent_complete for a queued or running task. Running
+    stages report the progress their tools print; transcription without any
+    falls back to the duration model's prediction."""
+    estimate = task_estimates.get(task_id, {})
+    predicted = estimate.get("predicted")
+    task = conversion_tasks.get(task_id, {})
+    pool, position = placement if placement else (None, None)
+    eta = None
+    percent = 0.0
+
+    if pool in ("download", "decode"):
+        percent = STAGE_SPANS[pool][0]
+        if not position and task.get("stage") == pool:
+            percent = task["percent"]
+        if predicted is not None:
+            wait = conversion_scheduler.pool(pool).estimated_wait(position) if position else 0.0
+            eta = wait + conversion_scheduler.pool(estimate["device"]).estimated_wait() + predicted
+    elif pool is not None:
+        percent = STAGE_SPANS["transcribe"][0]
+        if position:
+            eta = conversion_scheduler.pool(pool).estimated_wait(position) + (predicted or 0.0)
+        elif estimate.get("started"):
+            elapsed = time.time() - estimate["started"]
+            reported = task.get("stage") == "transcribe"
+            fraction = task["stage_percent"] / 100.0 if reported else None
+            if reported:
+                percent = task["percent"]
+            if fraction is not None and fraction >= 0.05:
+                # Extrapolate from this run once it has made some headway
+                eta = max(1.0, elapsed * (1.0 - fraction) / fraction)
+            elif predicted is not None:
+                eta = max(1.0, predicted - elapsed)
+                if not reported:
+                    percent = overall_percent("transcribe", min(0.95, elapsed / predicted))
+
+    return {
+        "eta_seconds": round(eta) if eta is not None else None,
+        "percent_complete": round(percent, 1),
+    }
+
+def _is_active(task_id: str) -> bool:
+    return conversion_tasks.get(task_id, {}).get("status") in ("queued", "processing")
+
+def _subscribe_to_inflight(key: str, task_id: str) -> bool:
+    """Attach task_id to an identical queued or running conversion.
+    Returns False when task_id should do the work itself."""
+    leader = inflight_tasks.attach(key, task_id, _is_active)
+    if leader is None:
+        return False
+    # The leader is stored with it so a restart doesn't run the job again
+    conversion_tasks[task_id] = {
+        "status": "queued", "progress": "Waiting for an identical conversion", "leader": leader,
+    }
+    cmd_log(logger, "i", "Attached %s to running conversion %s", task_id[:8], leader[:8])
+    return True
+
+def _finish_inflight(task_id: str):
+    """Release task_id's in-flight key and store its final state and result
+    for the tasks that subscribed to it, so that after a restart they read
+    the result instead of looking interrupted."""
+    subscribers = inflight_tasks.finish(task_id)
+    state = conversion_tasks.get(task_id, {})
+    if not subscribers or state.get("status") not in ("completed", "error", "cancelled"):
+        return
+    result = task_results.get(task_id)
+    for subscriber in subscribers:
+        # Straight to the job store: in memory the subscriber still resolves
+        # to the leader
+        job_store.save_state(subscriber, {**state, "leader": task_id})
+        if result is not None:
+            job_store.save_result(subscriber, result)
+
+def _load_stored_task(task_id: str) -> bool:
+    """True when the task is known, loading it from the job store first if
+    it finished before a restart."""
+    if task_id in conversion_tasks:
+        return True
+    stored = job_store.get(task_id)
+    if stored is None:
+        return False
+    conversion_tasks.restore(task_id, stored["state"])
+    if stored["result"] is not None:
+        task_results.restore(task_id, stored["result"])
+    return True
+
 def _prune_finished_tasks(max_keep: int = 100):
-    """Drop the oldest finished tasks so the dicts don't grow forever."""
-    finished = [
-        tid for tid, task in conversion_tasks.items()
-        if task.get("status") in ("completed", "error", "cancelled")
-    ]
+    """Drop the oldest finished tasks so the dicts and the job store don't
+    grow forever."""
+    finished = []
+    for tid in list(conversion_tasks):
+        # A cancelled subscriber resolves to itself; the job it shared keeps
+        # its own entry until the work behind it has finished.
+        status = conversion_tasks.get(inflight_tasks.resolve(tid), {}).get("status")
+        if status in ("completed", "error", "cancelled"):
+            finished.append(tid)
     excess = len(finished) - max_keep
-    for tid in finished[:excess] if excess > 0 else []:
+
+    def _drop(tid: str):
         conversion_tasks.pop(tid, None)
         task_results.pop(tid, None)
         task_processes.pop(tid, None)
+        task_estimates.pop(tid, None)
+        _progress_reported.pop(tid, None)
+        task_events.forget(tid)
+        # Subscribers of a pruned task would resolve to nothing: drop them too
+        for subscriber in inflight_tasks.forget(tid):
+            _drop(subscriber)
+
+    for tid in finished[:excess] if excess > 0 else []:
+        _drop(tid)
+    job_store.prune(max_keep)
 
 def _cleanup_files(*filepaths: str):
     for filepath in filepaths:
@@ -1473,191 +2232,388 @@ def _cleanup_files(*filepaths: str):
             except Exception:
                 pass
 
-def run_conversion_task(task_id: str, url: str, device: str = None):
+# Finished URL conversions by (source, media id): resubmitting a video that
+# was already converted completes immediately, as long as its MIDI still
+# exists in CONVERTED_FOLDER. Pass "force" to /api/convert to bypass it.
+media_result_cache = MediaResultCache(os.path.join(CACHE_FOLDER, "media.sqlite3"))
+
+def media_cache_ids(source: str, url: str) -> list[str]:
+    """Ids a submitted URL can be looked up by without touching the network:
+    the platform's own media id when it is in the URL, plus the normalized
+    URL itself for short links that only yt-dlp can resolve."""
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    ids = []
+    if source == "youtube":
+        m = re.search(r"(?:v=|youtu\.be/|shorts/|embed/)([\w-]{11})", url)
+        if m:
+            ids.append(m.group(1))
+    elif source == "tiktok":
+        m = re.search(r"/(?:video|photo)/(\d+)", parsed.path)
+        if m:
+            ids.append(m.group(1))
+    elif source == "musescore":
+        score_id = _musescore_score_id_from_url(url)
+        if score_id:
+            ids.append(str(score_id))
+    # The query is left out on purpose: Discord signs attachment links with
+    # expiring parameters and TikTok appends tracking ones.
+    path = parsed.path.rstrip("/")
+    query = f"?{parsed.query}" if source == "youtube" and not ids else ""
+    ids.append(f"url:{(parsed.hostname or '').lower()}{path}{query}")
+    return ids
+
+def _converted_midi_exists(midi_name: str) -> bool:
+    return os.path.isfile(os.path.join(app.config["CONVERTED_FOLDER"], midi_name))
+
+def complete_from_media_cache(task_id: str, source: str, url: str, cached: dict):
+    """Finish a task straight from a media cache entry."""
+    now = time.time()
+    midi_name = cached["midi_name"]
+    entry = {
+        "timestamp": now,
+        "type": source,
+        "youtube_url": url if source == 'youtube' else None,
+        "tiktok_url": url if source == 'tiktok' else None,
+        "discord_url": url if source == 'discord' else None,
+        "musescore_url": url if source == 'musescore' else None,
+        "video_id": cached.get("video_id"),
+        "video_title": cached.get("video_title"),
+        "thumbnail_url": cached.get("thumbnail_url"),
+        "midi_name": midi_name,
+        "library": cached.get("library"),
+        "conversion_time": 0,
+        "cache_hit": True,
+    }
+    append_history(entry)
+    task_results[task_id] = {
+        **entry,
+        "status": "completed",
+        "download_url": f"/converted/{midi_name}",
+        "audio_name": None,
+        "audio_download_url": None,
+        "cache_stats": transcription_cache.stats(),
+    }
+    conversion_tasks[task_id] = {"status": "completed"}
+    cmd_log(logger, "+", "MIDI reused for %s: %s", url, midi_name)
+
+def remember_media_result(source: str, url: str, media_id: str | None, result: dict):
+    ids = media_cache_ids(source, url)
+    if media_id and source in ("youtube", "tiktok"):
+        ids.insert(0, str(media_id))
+    try:
+        media_result_cache.store(source, ids, result["midi_name"], {
+            key: result.get(key)
+            for key in ("midi_name", "video_id", "video_title", "thumbnail_url", "library")
+        })
+    except Exception as exc:
+        logger.warning("Could not record media cache entry: %s", exc)
+
+def _cleanup_job_files(job: dict, keep_outputs: bool = False):
+    """Remove a job's intermediate files, and its outputs unless it completed."""
+    _cleanup_files(job.get("audio_path"), job.get("pcm_path"), job.get("trimmed_path"))
+    if not keep_outputs:
+        _cleanup_files(job.get("midi_path"), job.get("kept_audio_path"))
+
+def _abandon_queued_job(task_id: str, job: dict):
+    """on_cancel for a job waiting between stages."""
+    _cleanup_job_files(job)
+    _finish_inflight(task_id)
+
+def _run_pipeline_stage(stage, task_id: str, job: dict):
+    """Run one stage of a conversion on the current pool's worker.
+
+    A stage returns (pool, next_stage) to continue on another pool, or None
+    when the job is finished: completed, failed, or stopped early. Splitting
+    the work this way lets the next job download and decode while the
+    previous one is still being transcribed.
+    """
+    next_step = None
     with app.app_context():
         try:
-            conversion_tasks[task_id] = {"status": "processing", "progress": "Starting download..."}
-            
+            # Checked before the status is overwritten: the task may have been
+            # cancelled while it was still waiting in a queue.
             if _is_cancelled(task_id):
-                return
-            
-            source = detect_source(url)
-            if source is None:
-                conversion_tasks[task_id] = {"status": "error", "error": "Invalid URL format"}
-                return
-            cmd_log(logger, "i", "Queued %s conversion (%s)", source, task_id[:8])
+                raise ConversionCancelled('Cancelled by user')
+            next_step = stage(task_id, job)
+        except ConversionCancelled:
+            cmd_log(logger, "i", "Conversion cancelled (%s)", task_id[:8])
+        except Exception as e:
+            logger.error(f"Conversion task error: {str(e)}")
+            if not _is_cancelled(task_id):
+                conversion_tasks[task_id] = {"status": "error", "error": str(e)}
+        finally:
+            task_processes.pop(task_id, None)
 
-            video_id = None
-            video_title = None
-            thumbnail_url = ''
+        if next_step is not None and not _is_cancelled(task_id):
+            pool, next_stage = next_step
+            conversion_scheduler.handoff(
+                task_id, pool, _run_pipeline_stage, next_stage, task_id, job,
+                on_cancel=lambda: _abandon_queued_job(task_id, job),
+            )
+            return
 
-            if source == 'musescore':
-                conversion_tasks[task_id] = {
-                    "status": "processing",
-                    "progress": "Downloading MIDI from MuseScore...",
-                }
-                start = time.time()
-                midi_path, video_title, thumbnail_url = download_musescore_midi(
-                    url, app.config["CONVERTED_FOLDER"]
-                )
+        completed = conversion_tasks.get(task_id, {}).get("status") == "completed"
+        _cleanup_job_files(job, keep_outputs=completed)
+        _finish_inflight(task_id)
 
-                if _is_cancelled(task_id):
-                    _cleanup_files(midi_path)
-                    return
+def _download_stage(task_id: str, job: dict):
+    url = job["url"]
+    conversion_tasks[task_id] = {"status": "processing", "progress": "Starting download..."}
 
-                conversion_time = round(time.time() - start, 2)
-                midi_filename = os.path.basename(midi_path)
+    source = detect_source(url)
+    if source is None:
+        conversion_tasks[task_id] = {"status": "error", "error": "Invalid URL format"}
+        return None
+    job["source"] = source
+    cmd_log(logger, "i", "Queued %s conversion (%s)", source, task_id[:8])
 
-                append_history({
-                    "timestamp": time.time(),
-                    "type": "musescore",
-                    "musescore_url": url,
-                    "video_title": video_title,
-                    "thumbnail_url": thumbnail_url,
-                    "midi_name": midi_filename,
-                    "library": "MuseScore",
-                    "conversion_time": conversion_time,
-                })
+    if source == 'musescore':
+        conversion_tasks[task_id] = {
+            "status": "processing",
+            "progress": "Downloading MIDI from MuseScore...",
+        }
+        start = time.time()
+        midi_path, video_title, thumbnail_url = download_musescore_midi(
+            url, app.config["CONVERTED_FOLDER"]
+        )
+        job["midi_path"] = midi_path
 
-                task_results[task_id] = {
-                    "status": "completed",
-                    "midi_name": midi_filename,
-                    "download_url": f"/converted/{midi_filename}",
-                    "conversion_time": conversion_time,
-                    "video_title": video_title,
-                    "thumbnail_url": thumbnail_url,
-                    "type": "musescore",
-                    "musescore_url": url,
-                    "library": "MuseScore",
-                    "timestamp": time.time(),
-                }
-                conversion_tasks[task_id] = {"status": "completed"}
-                cmd_log(logger, "+", "MIDI downloaded from MuseScore: %s (%ss)", midi_filename, conversion_time)
-                return
+        if _is_cancelled(task_id):
+            return None
 
-            conversion_tasks[task_id] = {"status": "processing", "progress": "Downloading video..."}
+        conversion_time = round(time.time() - start, 2)
+        midi_filename = os.path.basename(midi_path)
 
-            if _is_cancelled(task_id):
-                return
+        append_history({
+            "timestamp": time.time(),
+            "type": "musescore",
+            "musescore_url": url,
+            "video_title": video_title,
+            "thumbnail_url": thumbnail_url,
+            "midi_name": midi_filename,
+            "library": "MuseScore",
+            "conversion_time": conversion_time,
+        })
 
-            if source == 'youtube':
-                cookiefile = "cookies.txt" if os.path.exists("cookies.txt") else None
-                m = re.search(r"(?:v=|youtu\.be/|shorts/)([\w-]{11})", url)
-                if m:
-                    video_id = m.group(1)
-                mp3_path, video_title, thumbnail_url = download_mp3_from_youtube(
-                    youtube_url=url,
-                    output_dir=app.config["UPLOAD_FOLDER"],
-                    custom_name=None,
-                    cookiefile=cookiefile,
-                    task_id=task_id,
-                )
-            elif source == 'tiktok':
-                mp3_path, video_title, thumbnail_url = download_mp3_from_tiktok(
-                    tiktok_url=url,
-                    output_dir=app.config["UPLOAD_FOLDER"],
-                    custom_name=None,
-                    cookiefile=None,
-                    task_id=task_id,
-                )
-            elif source == 'discord':
-                mp3_path, video_title, thumbnail_url = download_mp3_from_discord(
-                    discord_url=url,
-                    output_dir=app.config["UPLOAD_FOLDER"],
-                    custom_name=None,
-                    cookiefile=None,
-                    task_id=task_id,
-                )
+        task_results[task_id] = {
+            "status": "completed",
+            "midi_name": midi_filename,
+            "download_url": f"/converted/{midi_filename}",
+            "conversion_time": conversion_time,
+            "video_title": video_title,
+            "thumbnail_url": thumbnail_url,
+            "type": "musescore",
+            "musescore_url": url,
+            "library": "MuseScore",
+            "timestamp": time.time(),
+        }
+        conversion_tasks[task_id] = {"status": "completed"}
+        remember_media_result(source, url, None, task_results[task_id])
+        cmd_log(logger, "+", "MIDI downloaded from MuseScore: %s (%ss)", midi_filename, conversion_time)
+        return None
 
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path)
-                return
+    conversion_tasks[task_id] = {"status": "processing", "progress": "Downloading video..."}
+
+    if source == 'youtube':
+        cookiefile = "cookies.txt" if os.path.exists("cookies.txt") else None
+        m = re.search(r"(?:v=|youtu\.be/|shorts/)([\w-]{11})", url)
+        if m:
+            job["video_id"] = m.group(1)
+        audio_path, video_title, thumbnail_url, downloaded_id = download_mp3_from_youtube(
+            youtube_url=url,
+            output_dir=app.config["UPLOAD_FOLDER"],
+            custom_name=None,
+            cookiefile=cookiefile,
+            task_id=task_id,
+            extract_mp3=not DIRECT_DECODE,
+        )
+    elif source == 'tiktok':
+        audio_path, video_title, thumbnail_url, downloaded_id = download_mp3_from_tiktok(
+            tiktok_url=url,
+            output_dir=app.config["UPLOAD_FOLDER"],
+            custom_name=None,
+            cookiefile=None,
+            task_id=task_id,
+            extract_mp3=not DIRECT_DECODE,
+            store_thumbnail=False,
+        )
+    else:
+        audio_path, video_title, thumbnail_url, downloaded_id = download_mp3_from_discord(
+            discord_url=url,
+            output_dir=app.config["UPLOAD_FOLDER"],
+            custom_name=None,
+            cookiefile=None,
+            task_id=task_id,
+            extract_mp3=not DIRECT_DECODE,
+            store_thumbnail=False,
+        )
+    if source != 'youtube':
+        # Stored locally once the task has completed (store_thumbnail_later)
+        job["remote_thumbnail_url"] = thumbnail_url
+        thumbnail_url = thumbnail_url if is_allowed_thumbnail_url(thumbnail_url) else None
+    job.update(
+        audio_path=audio_path,
+        video_title=video_title,
+        thumbnail_url=thumbnail_url,
+        downloaded_id=downloaded_id,
+    )
 
-            if not os.path.exists(mp3_path) or os.path.getsize(mp3_path) == 0:
-                conversion_tasks[task_id] = {"status": "error", "error": "MP3 file was not downloaded successfully"}
-                return
-            cmd_log(logger, "+", "Audio downloaded: %s", os.path.basename(mp3_path))
+    if _is_cancelled(task_id):
+        return None
 
-            conversion_tasks[task_id] = {"status": "processing", "progress": "Converting to MIDI..."}
-            
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path)
-                return
-            
-            midi_name = os.path.splitext(os.path.basename(mp3_path))[0] + "_transkun.mid"
-            midi_path = get_unique_filepath(os.path.join(app.config["CONVERTED_FOLDER"], midi_name))
+    if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+        conversion_tasks[task_id] = {"status": "error", "error": "Audio file was not downloaded successfully"}
+        return None
+    cmd_log(logger, "+", "Audio downloaded: %s", os.path.basename(audio_path))
 
-            start = time.time()
-            
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path)
-                return
-            
-            output_library = convert_to_midi(mp3_path, midi_path, device, task_id=task_id)
+    job["media"] = probe_media(audio_path, task_id=task_id)
+    if job["media"] is not None and not job["media"]["audio"]:
+        conversion_tasks[task_id] = {"status": "error", "error": "The downloaded media has no audio track"}
+        return None
+    _update_estimate(task_id, job["device"], (job["media"] or {}).get("duration"))
 
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path, midi_path)
-                return
+    conversion_tasks[task_id] = {"status": "queued", "progress": "Waiting to decode audio..."}
+    return "decode", _decode_stage
 
-            conversion_time = round(time.time() - start, 2)
-
-            append_history({
-                "timestamp": time.time(),
-                "type": source,
-                "youtube_url": url if source == 'youtube' else None,
-                "tiktok_url": url if source == 'tiktok' else None,
-                "discord_url": url if source == 'discord' else None,
-                "video_id": video_id,
-                "video_title": video_title,
-                "thumbnail_url": thumbnail_url,
-                "mp3_name": os.path.basename(mp3_path),
-                "midi_name": os.path.basename(midi_path),
-                "library": output_library,
-                "conversion_time": conversion_time,
-            })
+def _decode_stage(task_id: str, job: dict):
+    if job["source"] == "upload":
+        cmd_log(logger, "i", "Started upload conversion (%s): %s", task_id[:8], os.path.basename(job["audio_path"]))
 
-            midi_filename = os.path.basename(midi_path)
-            download_url_path = f"/converted/{midi_filename}"
-            
-            task_results[task_id] = {
-                "status": "completed",
-                "midi_name": midi_filename,
-                "download_url": download_url_path,
-                "conversion_time": conversion_time,
-                "video_id": video_id,
-                "video_title": video_title,
-                "thumbnail_url": thumbnail_url,
-                "type": source,
-                "youtube_url": url if source == 'youtube' else None,
-                "tiktok_url": url if source == 'tiktok' else None,
-                "discord_url": url if source == 'discord' else None,
-                "library": output_library,
-                "timestamp": time.time(),
-            }
-            conversion_tasks[task_id] = {"status": "completed"}
-            cmd_log(logger, "+", "MIDI ready: %s (%ss)", midi_filename, conversion_time)
-            
-            _cleanup_files(mp3_path)
-            logger.debug(f"Deleted downloaded MP3 file: {mp3_path}")
+    if job["keep_audio"]:
+        conversion_tasks[task_id] = {"status": "processing", "progress": "Saving audio..."}
+        job["kept_audio_path"] = keep_audio_copy(job["audio_path"], task_id=task_id)
 
-        except ConversionCancelled:
-            cmd_log(logger, "i", "Conversion cancelled (%s)", task_id[:8])
-            _cleanup_files(locals().get('mp3_path'), locals().get('midi_path'))
-        except Exception as e:
-            logger.error(f"Conversion task error: {str(e)}")
-            if not _is_cancelled(task_id):
-                conversion_tasks[task_id] = {"status": "error", "error": str(e)}
-            if 'mp3_path' in locals():
-                _cleanup_files(mp3_path)
-                logger.debug(f"Deleted downloaded MP3 file after error: {mp3_path}")
-        finally:
-            task_processes.pop(task_id, None)
+    conversion_tasks[task_id] = {
+        "status": "processing",
+        "progress": "Decoding audio..." if DIRECT_DECODE else "Converting to MP3...",
+    }
+    try:
+        job["pcm_path"] = prepare_transcription_audio(
+            job["audio_path"], task_id=task_id, duration=(job.get("media") or {}).get("duration")
+        )
+    except ConversionCancelled:
+        raise
+    except Exception as e:
+        if not _is_cancelled(task_id):
+            conversion_tasks[task_id] = {"status": "error", "error": f"Failed to decode audio: {str(e)}"}
+        return None
+    if job["pcm_path"] != job["audio_path"]:
+        cmd_log(logger, "+", "Audio decoded: %s", os.path.basename(job["pcm_path"]))
+
+    if _is_cancelled(task_id):
+        return None
+
+    conversion_tasks[task_id] = {"status": "processing", "progress": "Scanning for silence..."}
+    job["trimmed_path"], job["trim_segments"], job["silence_trim"] = trim_silence(job["pcm_path"])
+
+    try:
+        job["audio_seconds"] = round(wav_duration(job["trimmed_path"]), 2)
+    except (wave.Error, EOFError, OSError):
+        job["audio_seconds"] = (job.get("media") or {}).get("duration")
+    device = choose_transcription_device(job)
+    _update_estimate(task_id, device, job["audio_seconds"], job["trimmed_path"])
+
+    conversion_tasks[task_id] = {"status": "queued", "progress": "Waiting for transcription..."}
+    return device, _transcribe_stage
+
+def _transcribe_stage(task_id: str, job: dict):
+    conversion_tasks[task_id] = {"status": "processing", "progress": "Converting to MIDI..."}
+
+    source = job["source"]
+    url = job.get("url")
+    audio_path = job["audio_path"]
+    midi_name = os.path.splitext(os.path.basename(audio_path))[0] + "_transkun.mid"
+    midi_path = get_unique_filepath(os.path.join(app.config["CONVERTED_FOLDER"], midi_name))
+    job["midi_path"] = midi_path
+
+    start = time.time()
+    task_estimates.setdefault(task_id, {})["started"] = start
+    model_key = _transcription_model_key(job["trimmed_path"], resolve_transkun_device(job["device"]))
+
+    output_library, cache_hit = transcribe_with_cache(
+        job["trimmed_path"], midi_path, job["device"], task_id=task_id, use_cache=not job["force"]
+    )
+
+    if _is_cancelled(task_id):
+        return None
+
+    if job["trim_segments"]:
+        remap_midi(midi_path, job["trim_segments"])
+
+    conversion_time = round(time.time() - start, 2)
+    if not cache_hit:
+        duration_model.observe(model_key, job.get("audio_seconds"), conversion_time)
+    kept_audio_path = job.get("kept_audio_path")
+    kept_audio_name = os.path.basename(kept_audio_path) if kept_audio_path else None
+    # basename(midi_path): get_unique_filepath may have renamed the target
+    midi_filename = os.path.basename(midi_path)
+
+    history_entry = append_history({
+        "timestamp": time.time(),
+        "type": source,
+        "youtube_url": url if source == 'youtube' else None,
+        "tiktok_url": url if source == 'tiktok' else None,
+        "discord_url": url if source == 'discord' else None,
+        "video_id": job.get("video_id"),
+        "video_title": job.get("video_title"),
+        "thumbnail_url": job.get("thumbnail_url"),
+        "mp3_name": os.path.basename(audio_path),
+        "midi_name": midi_filename,
+        "audio_name": kept_audio_name,
+        "library": output_library,
+        "conversion_time": conversion_time,
+        "cache_hit": cache_hit,
+        "device": model_key,
+        "audio_seconds": job.get("audio_seconds"),
+    })
+
+    task_results[task_id] = {
+        "status": "completed",
+        "midi_name": midi_filename,
+        "download_url": f"/converted/{midi_filename}",
+        "conversion_time": conversion_time,
+        "video_id": job.get("video_id"),
+        "video_title": job.get("video_title"),
+        "thumbnail_url": job.get("thumbnail_url"),
+        "type": source,
+        "youtube_url": url if source == 'youtube' else None,
+        "tiktok_url": url if source == 'tiktok' else None,
+        "discord_url": url if source == 'discord' else None,
+        "library": output_library,
+        "audio_name": kept_audio_name,
+        "audio_download_url": f"/converted/{kept_audio_name}" if kept_audio_name else None,
+        "cache_hit": cache_hit,
+        "cache_stats": transcription_cache.stats(),
+        "silence_trim": job["silence_trim"],
+        "timestamp": time.time(),
+    }
+    conversion_tasks[task_id] = {"status": "completed"}
+    if url:
+        remember_media_result(source, url, job.get("downloaded_id"), task_results[task_id])
+    if job.get("remote_thumbnail_url"):
+        store_thumbnail_later(
+            task_id, job["remote_thumbnail_url"], source, history_entry.get("id"),
+            source, url, job.get("downloaded_id"),
+        )
+    cmd_log(logger, "+", "MIDI ready: %s (%ss)", midi_filename, conversion_time)
+    return None
+
+def run_conversion_task(task_id: str, url: str, device: str = None, keep_audio: bool = False,
+                        force: bool = False):
+    """First stage of a URL conversion; runs on the "download" pool."""
+    job = {"url": url, "device": device, "keep_audio": keep_audio, "force": force}
+    _run_pipeline_stage(_download_stage, task_id, job)
 
 @csrf.exempt
 @app.route("/api/health", methods=["GET"])
 def api_health():
     return jsonify({"status": "ok", "message": "Server is running"})
 
+@csrf.exempt
+@app.route("/api/cache", methods=["GET"])
+def api_cache_stats():
+    return jsonify({"transcription": transcription_cache.stats(), "sheets": sheet_cache.stats()})
+
 @csrf.exempt
 @app.route("/api/convert", methods=["POST"])
 def api_convert():
@@ -1681,11 +2637,37 @@ def api_convert():
         
         _prune_finished_tasks()
         task_id = str(uuid.uuid4())
+
+        keep_audio = is_truthy(data.get("keep_audio"))
+        force = is_truthy(data.get("force"))
+
+        # A cached result has no kept audio to hand back
+        if not force and not keep_audio:
+            cached = media_result_cache.lookup(source, media_cache_ids(source, url), _converted_midi_exists)
+            if cached:
+                complete_from_media_cache(task_id, source, url, cached)
+                return jsonify({"task_id": task_id, "status": "completed", "cached": True}), 200
+
         conversion_tasks[task_id] = {"status": "queued", "progress": "Queued for processing"}
 
-        thread = Thread(target=run_conversion_task, args=(task_id, url, device))
-        thread.daemon = True
-        thread.start()
+        inflight_key = (
+            f"url:{source}:{media_cache_ids(source, url)[0]}:{int(keep_audio)}:{int(force)}:{device or 'auto'}"
+        )
+        job_store.set_inputs(task_id, "url", {
+            "url": url, "device": device, "keep_audio": keep_audio, "force": force,
+            "inflight_key": inflight_key,
+        })
+        if _subscribe_to_inflight(inflight_key, task_id):
+            return jsonify({"task_id": task_id, "status": "queued", "deduplicated": True}), 202
+
+        try:
+            conversion_scheduler.submit(
+                task_id, "download", run_conversion_task, task_id, url, device, keep_audio, force
+            )
+        except QueueFull as exc:
+            _finish_inflight(task_id)
+            conversion_tasks.pop(task_id, None)
+            return _queue_full_response(exc)
 
         return jsonify({"task_id": task_id, "status": "queued"}), 202
 
@@ -1696,14 +2678,29 @@ def api_convert():
 @csrf.exempt
 @app.route("/api/status/<task_id>", methods=["GET"])
 def api_status(task_id):
-    if task_id not in conversion_tasks:
+    payload = task_status_payload(task_id)
+    if payload is None:
         return jsonify({"error": "Task not found"}), 404
+    return jsonify(payload)
 
-    task_status = conversion_tasks.get(task_id, {})
+def task_status_payload(task_id: str) -> dict | None:
+    """What /api/status and the event streams report for a task; None if
+    the task is unknown."""
+    if not _load_stored_task(task_id):
+        return None
+
+    if inflight_tasks.is_detached(task_id):
+        task_status = {"status": "cancelled"}
+    else:
+        # Deduplicated submissions report the task doing the actual work
+        task_id = inflight_tasks.resolve(task_id)
+        if not _load_stored_task(task_id):
+            return None
+        task_status = conversion_tasks.get(task_id, {})
     
     if task_status.get("status") == "completed":
         result = task_results.get(task_id, {})
-        return jsonify({
+        return {
             "status": "completed",
             "midi_name": result.get("midi_name"),
             "download_url": result.get("download_url"),
@@ -1716,39 +2713,174 @@ def api_status(task_id):
             "tiktok_url": result.get("tiktok_url"),
             "discord_url": result.get("discord_url"),
             "library": result.get("library"),
+            "audio_name": result.get("audio_name"),
+            "audio_download_url": result.get("audio_download_url"),
+            "cache_hit": result.get("cache_hit", False),
+            "cache_stats": result.get("cache_stats"),
+            "silence_trim": result.get("silence_trim"),
             "timestamp": result.get("timestamp"),
-        })
+        }
     elif task_status.get("status") == "error":
-        return jsonify({
+        return {
             "status": "error",
             "error": task_status.get("error", "Unknown error"),
-        })
+        }
     elif task_status.get("status") == "cancelled":
-        return jsonify({
+        return {
             "status": "cancelled",
             "error": "Conversion was cancelled by user",
-        })
+        }
     else:
-        return jsonify({
+        payload = {
             "status": task_status.get("status", "processing"),
             "progress": task_status.get("progress", "Processing..."),
-        })
+        }
+        placement = conversion_scheduler.position(task_id)
+        payload["queued_position"] = None
+        if placement is not None:
+            pool, position = placement
+            payload["queue"] = pool
+            payload["queued_position"] = position
+            if position > 0:
+                payload["progress"] = f"Queued (position {position})"
+        payload.update(estimate_task_progress(task_id, placement))
+        if task_status.get("stage"):
+            payload["stage"] = task_status["stage"]
+            payload["stage_percent"] = task_status.get("stage_percent")
+            payload["throughput"] = task_status.get("throughput")
+            payload["throughput_unit"] = task_status.get("throughput_unit")
+        return payload
+
+# Streams wake up on every task change; without one they re-check ETAs at
+# this interval and send a keep-alive comment so proxies keep them open.
+EVENT_STREAM_REFRESH_SECONDS = 5
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
+
+def _is_final_payload(payload: dict | None) -> bool:
+    return payload is None or payload.get("status") in ("completed", "error", "cancelled")
+
+def _sse(event: str, data: dict, event_id: int | None = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+def _event_stream_response(generator) -> Response:
+    response = Response(generator, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Keeps reverse proxies (nginx) from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@csrf.exempt
+@app.route("/api/events/<task_id>", methods=["GET"])
+def api_task_events(task_id):
+    """Server-Sent Events for one task: a `status` event with the same
+    payload as /api/status/<task_id> whenever it changes. The stream ends
+    after the final event."""
+    if task_status_payload(task_id) is None:
+        return jsonify({"error": "Task not found"}), 404
+
+    def generate():
+        seq = 0
+        last_sent = None
+        last_write = time.monotonic()
+        while True:
+            payload = task_status_payload(task_id)
+            if payload is None:
+                yield _sse("status", {"status": "error", "error": "Task not found"})
+                return
+            encoded = json.dumps(payload, sort_keys=True)
+            if encoded != last_sent:
+                last_sent = encoded
+                last_write = time.monotonic()
+                yield _sse("status", payload, seq)
+            if _is_final_payload(payload):
+                return
+            if time.monotonic() - last_write >= EVENT_STREAM_KEEPALIVE_SECONDS:
+                last_write = time.monotonic()
+                yield ": keepalive\n\n"
+            seq = task_events.wait(seq, EVENT_STREAM_REFRESH_SECONDS)
+
+    return _event_stream_response(generate())
+
+@csrf.exempt
+@app.route("/api/events", methods=["GET"])
+def api_all_events():
+    """Server-Sent Events for many tasks on one connection. `?tasks=a,b`
+    limits the stream to those ids; otherwise every task that is active
+    when the stream opens, or changes later, is reported. Each `status`
+    event carries its task_id."""
+    wanted = {tid for tid in request.args.get("tasks", "").split(",") if tid}
+
+    def generate():
+        seq = task_events.seq
+        if wanted:
+            pending = set(wanted)
+        else:
+            pending = {tid for tid in list(conversion_tasks) if _is_active(tid)}
+        last_sent: dict = {}
+        last_write = time.monotonic()
+        while True:
+            for tid in sorted(pending):
+                payload = task_status_payload(tid) or {"status": "error", "error": "Task not found"}
+                encoded = json.dumps(payload, sort_keys=True)
+                if last_sent.get(tid) == encoded:
+                    continue
+                last_sent[tid] = encoded
+                last_write = time.monotonic()
+                yield _sse("status", {"task_id": tid, **payload}, seq)
+
+            if time.monotonic() - last_write >= EVENT_STREAM_KEEPALIVE_SECONDS:
+                last_write = time.monotonic()
+                yield ": keepalive\n\n"
+
+            since = seq
+            seq = task_events.wait(since, EVENT_STREAM_REFRESH_SECONDS)
+            changed = set(task_events.changed_since(since))
+            if wanted:
+                # Subscribers follow the task doing their work
+                pending = {tid for tid in wanted if tid in changed or inflight_tasks.resolve(tid) in changed}
+                # Still-running tasks get their ETA refreshed on timeouts
+                if seq == since:
+                    pending = {tid for tid in wanted if not _is_final_payload(task_status_payload(tid))}
+            else:
+                pending = changed if seq != since else {tid for tid in list(conversion_tasks) if _is_active(tid)}
+
+    return _event_stream_response(generate())
+
+@csrf.exempt
+@app.route("/api/status", methods=["GET"])
+def api_pipeline_status():
+    """Queue depth and busy workers of every pipeline stage."""
+    return jsonify({"stages": conversion_scheduler.snapshot(), "eta_model": duration_model.snapshot()})
 
 @csrf.exempt
 @app.route("/api/stop/<task_id>", methods=["POST"])
 def api_stop(task_id):
-    if task_id not in conversion_tasks:
+    if not _load_stored_task(task_id):
         return jsonify({"error": "Task not found"}), 404
     
-    task_status = conversion_tasks.get(task_id, {})
-    if task_status.get("status") in ["completed", "error", "cancelled"]:
+    task_status = conversion_tasks.get(inflight_tasks.resolve(task_id), {})
+    if inflight_tasks.is_detached(task_id) or task_status.get("status") in ["completed", "error", "cancelled"]:
         return jsonify({"error": "Task is already finished"}), 400
-    
-    conversion_tasks[task_id] = {"status": "cancelled", "progress": "Cancelled by user"}
+
+    # Deduplicated submissions share one job; it is only stopped once the
+    # last task waiting for it has been cancelled.
+    job_id, remaining = inflight_tasks.detach(task_id)
+    if job_id != task_id:
+        conversion_tasks[task_id] = {"status": "cancelled", "progress": "Cancelled by user"}
+    if remaining:
+        return jsonify({"status": "cancelled", "message": "Conversion cancelled"})
+
+    conversion_tasks[job_id] = {"status": "cancelled", "progress": "Cancelled by user"}
+    # A job that has not started yet simply leaves the queue
+    conversion_scheduler.cancel(job_id)
 
     # Actually kill the running ffmpeg/transkun process instead of letting it
     # burn CPU to completion; the task thread cleans up its files afterwards.
-    proc = task_processes.get(task_id)
+    proc = task_processes.get(job_id)
     if proc is not None and proc.poll() is None:
         try:
             proc.kill()
@@ -1757,22 +2889,83 @@ def api_stop(task_id):
 
     return jsonify({"status": "cancelled", "message": "Conversion cancelled"})
 
+HISTORY_PAGE_MAX = 500
+
+def _history_time_arg(name: str, end_of_day: bool = False) -> float | None:
+    """A date filter given as Unix seconds or an ISO date/datetime. A bare
+    date as the upper bound includes that whole day."""
+    value = (request.args.get(name) or "").strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    timestamp = parsed.timestamp()
+    if end_of_day and len(value) == 10:
+        timestamp += 86400
+    return timestamp
+
+def _history_list_arg(name: str) -> list[str]:
+    return [part.strip() for part in request.args.get(name, "").split(",") if part.strip()]
+
 @csrf.exempt
 @app.route("/api/history", methods=["GET"])
 def api_history():
+    """History entries, newest first.
+
+    limit (1 to HISTORY_PAGE_MAX; follow the cursor for more), cursor (from
+    the X-Next-Cursor header of the previous page), source and library (comma-separated), since/until (Unix seconds or ISO
+    dates), q (title substring) and fields (comma-separated keys to return).
+    """
     try:
         limit = request.args.get("limit", type=int, default=10)
-        history = load_history(max_items=limit)
-        prepared = prepare_history_for_ui(history)
-        
+        if limit < 1:
+            # limit=0 used to mean "everything"; pages are capped now, so
+            # refuse it instead of quietly returning a single entry
+            return jsonify({"error": f"limit must be between 1 and {HISTORY_PAGE_MAX}"}), 400
+        limit = min(HISTORY_PAGE_MAX, limit)
+        version, entries = history_store.snapshot()
+        etag = history_etag(version)
+        not_modified = history_not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+
+        cursor = request.args.get("cursor", type=int)
+        sources = _history_list_arg("source")
+        libraries = _history_list_arg("library")
+        since = _history_time_arg("since")
+        until = _history_time_arg("until", end_of_day=True)
+        title = request.args.get("q", "").strip()
+        if cursor is None and not (sources or libraries or since is not None or until is not None or title):
+            # The unfiltered first page comes straight from the snapshot
+            page = list(entries[:limit])
+            next_cursor = page[-1]["id"] if len(entries) > limit else None
+        else:
+            page, next_cursor = history_store.page(
+                limit, before_id=cursor, types=sources, libraries=libraries,
+                since=since, until=until, title=title or None,
+            )
+
+        prepared = prepare_history_for_ui(page)
         for item in prepared:
             if item.get("midi_name"):
                 try:
                     item["download_url"] = url_for('download_file', filename=item["midi_name"])
                 except Exception:
                     item["download_url"] = f"/converted/{item['midi_name']}"
-        
-        return jsonify(prepared)
+
+        fields = _history_list_arg("fields")
+        if fields:
+            prepared = [{key: item.get(key) for key in ["id", *fields]} for item in prepared]
+
+        response = history_json_response(prepared, etag)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+        return response
+    except ValueError as e:
+        return jsonify({"error": f"Invalid filter: {e}"}), 400
     except Exception as e:
         logger.error(f"API history error: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1781,33 +2974,22 @@ def api_history():
 @app.route("/api/history/delete", methods=["POST"])
 def api_delete_history():
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
+        entry_id = data.get("id")
         timestamp = data.get("timestamp")
-        
-        if timestamp is None:
-            return jsonify({"error": "Timestamp is required"}), 400
-        
-        ensure_history_file()
-        with HISTORY_LOCK:
-            try:
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    history = json.load(f)
-                    if not isinstance(history, list):
-                        history = []
-            except Exception:
-                history = []
-
-            original_length = len(history)
-            timestamp_float = float(timestamp)
-            history = [item for item in history if abs(item.get("timestamp", 0) - timestamp_float) > 0.001]
 
-            if len(history) == original_length:
-                return jsonify({"status": "success", "message": "History item deleted (or not found in file)"}), 200
+        if entry_id is not None:
+            deleted = history_store.delete(int(entry_id))
+        elif timestamp is not None:
+            deleted = history_store.delete_by_timestamp(float(timestamp))
+        else:
+            return jsonify({"error": "id or timestamp is required"}), 400
 
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
-        
+        if not deleted:
+            return jsonify({"status": "success", "message": "History item deleted (or not found)"}), 200
         return jsonify({"status": "success", "message": "History item deleted"})
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid id or timestamp"}), 400
     except Exception as e:
         logger.error(f"API delete history error: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1873,28 +3055,18 @@ def api_convert_to_sheets():
         sheets_filename = f"{base_name}_sheets.txt"
         sheets_path = os.path.join(app.config['CONVERTED_FOLDER'], sheets_filename)
         
-        default_settings = {
-            'resilience': 2,
-            'place_shifted_notes': 'start',
-            'place_out_of_range_notes': 'inorder',
-            'break_lines_how': 'manually',
-            'break_lines_every': 4,
-            'quantize': 35,
-            'classic_chord_order': True,
-            'sequential_quantizes': False,
-            'curly_braces_for_quantized_chords': False,
-            'include_out_of_range': True,
-            'show_tempo_timing_marks': True,
-            'show_out_of_range_text_marks': True,
-            'out_of_range_separator': ':',
-            'show_bpm_changes_as_comments': True,
-            'auto_transpose': True,
-        }
-        
-        user_settings = data.get("settings", {})
-        settings = {**default_settings, **user_settings}
-        
-        _, sheet_text = convert_midi_to_sheets(midi_path, sheets_path, settings)
+        settings = normalize_settings(data.get("settings") or {})
+        key = sheet_cache_key(digest_index.digest(midi_path), settings, CONVERTER_VERSION)
+        sheet_text, cache_tier = sheet_cache.get(key)
+        if sheet_text is None:
+            _, sheet_text = convert_midi_to_sheets(midi_path, sheets_path, settings)
+            sheet_cache.put(key, sheet_text or "")
+            _sheets_file_keys[sheets_path] = key
+        elif _sheets_file_keys.get(sheets_path) != key or not os.path.exists(sheets_path):
+            # Keep the downloadable file in step with what is shown
+            with open(sheets_path, 'w', encoding='utf-8') as handle:
+                handle.write(sheet_text)
+            _sheets_file_keys[sheets_path] = key
         
         if sheet_text is None:
             sheet_text = ""
@@ -1908,7 +3080,9 @@ def api_convert_to_sheets():
             "success": True,
             "sheets_filename": sheets_filename,
             "download_url": download_url,
-            "sheet_text": sheet_text
+            "sheet_text": sheet_text,
+            "cache_hit": cache_tier is not None,
+            "cache_tier": cache_tier,
         })
         
     except Exception as e:
@@ -2020,125 +3194,18 @@ def api_import_midi():
         return jsonify({"error": str(e)}), 500
 
 
-def run_file_conversion_task(task_id: str, file_path: str, device: str = None):
-    with app.app_context():
-        try:
-            conversion_tasks[task_id] = {"status": "processing", "progress": "Processing file..."}
-            cmd_log(logger, "i", "Queued upload conversion (%s): %s", task_id[:8], os.path.basename(file_path))
-            
-            if _is_cancelled(task_id):
-                _cleanup_files(file_path)
-                return
-            
-            _, ext = os.path.splitext(file_path)
-            file_ext = ext.lower().lstrip('.')
-            
-            needs_conversion = file_ext != 'mp3'
-            mp3_path = file_path
-            
-            if needs_conversion:
-                conversion_tasks[task_id] = {"status": "processing", "progress": "Converting to MP3..."}
-                
-                if _is_cancelled(task_id):
-                    _cleanup_files(file_path)
-                    return
-                
-                try:
-                    base_name = os.path.splitext(os.path.basename(file_path))[0]
-                    mp3_path = get_unique_filepath(os.path.join(app.config['UPLOAD_FOLDER'], f"{base_name}.mp3"))
-                    convert_to_mp3(file_path, mp3_path, task_id=task_id)
-                    cmd_log(logger, "+", "Audio normalized to MP3: %s", os.path.basename(mp3_path))
-                    try:
-                        os.remove(file_path)
-                    except OSError:
-                        pass
-                except Exception as e:
-                    try:
-                        os.remove(file_path)
-                    except OSError:
-                        pass
-                    if not _is_cancelled(task_id):
-                        conversion_tasks[task_id] = {"status": "error", "error": f"Failed to convert to MP3: {str(e)}"}
-                    return
-            
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path)
-                return
-            
-            conversion_tasks[task_id] = {"status": "processing", "progress": "Converting to MIDI..."}
-            
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path)
-                return
-            
-            base = os.path.splitext(os.path.basename(mp3_path))[0]
-            midi_name = f"{base}_transkun.mid"
-            midi_path = get_unique_filepath(os.path.join(app.config['CONVERTED_FOLDER'], midi_name))
-            
-            start = time.time()
-            
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path)
-                return
-            
-            output_library = convert_to_midi(mp3_path, midi_path, device, task_id=task_id)
-
-            if _is_cancelled(task_id):
-                _cleanup_files(mp3_path, midi_path)
-                return
-
-            conversion_time = round(time.time() - start, 2)
-
-            append_history({
-                "timestamp": time.time(),
-                "type": "upload",
-                "mp3_name": os.path.basename(mp3_path),
-                "youtube_url": None,
-                "tiktok_url": None,
-                "video_id": None,
-                "video_title": None,
-                # basename(midi_path): get_unique_filepath may have renamed the target
-                "midi_name": os.path.basename(midi_path),
-                "library": output_library,
-                "conversion_time": conversion_time,
-            })
-            
-            midi_filename = os.path.basename(midi_path)
-            download_url_path = f"/converted/{midi_filename}"
-            
-            task_results[task_id] = {
-                "status": "completed",
-                "midi_name": midi_filename,
-                "download_url": download_url_path,
-                "conversion_time": conversion_time,
-                "video_id": None,
-                "video_title": None,
-                "thumbnail_url": None,
-                "type": "upload",
-                "youtube_url": None,
-                "tiktok_url": None,
-                "discord_url": None,
-                "library": output_library,
-                "timestamp": time.time(),
-            }
-            conversion_tasks[task_id] = {"status": "completed"}
-            cmd_log(logger, "+", "MIDI ready: %s (%ss)", midi_filename, conversion_time)
-            
-            _cleanup_files(mp3_path)
-            logger.debug(f"Deleted processed MP3 file: {mp3_path}")
-            
-        except ConversionCancelled:
-            cmd_log(logger, "i", "Conversion cancelled (%s)", task_id[:8])
-            _cleanup_files(locals().get('mp3_path'), locals().get('midi_path'))
-        except Exception as e:
-            logger.error(f"File conversion task error: {str(e)}")
-            if not _is_cancelled(task_id):
-                conversion_tasks[task_id] = {"status": "error", "error": str(e)}
-            if 'mp3_path' in locals():
-                _cleanup_files(mp3_path)
-                logger.debug(f"Deleted processed MP3 file after error: {mp3_path}")
-        finally:
-            task_processes.pop(task_id, None)
+def run_file_conversion_task(task_id: str, file_path: str, device: str = None, keep_audio: bool = False,
+                             force: bool = False, media: dict | None = None):
+    """First stage of an upload conversion; runs on the "decode" pool."""
+    job = {
+        "source": "upload",
+        "audio_path": file_path,
+        "media": media,
+        "device": device,
+        "keep_audio": keep_audio,
+        "force": force,
+    }
+    _run_pipeline_stage(_decode_stage, task_id, job)
 
 @csrf.exempt
 @app.route("/api/upload-media", methods=["POST"])
@@ -2166,120 +3233,163 @@ def api_upload_media():
         device = request.form.get("device") if request.form else None
         if device not in ["gpu", "mps", "cuda", "cpu"]:
             device = None
+        keep_audio = is_truthy(request.form.get("keep_audio")) if request.form else False
+        force = is_truthy(request.form.get("force")) if request.form else False
+
+        media = probe_media(original_path)
+        if media is not None and not media["audio"]:
+            _cleanup_files(original_path)
+            return jsonify({"error": "The file has no audio track"}), 400
         
         _prune_finished_tasks()
         task_id = str(uuid.uuid4())
         conversion_tasks[task_id] = {"status": "queued", "progress": "Queued for processing"}
 
-        thread = Thread(target=run_file_conversion_task, args=(task_id, original_path, device))
-        thread.daemon = True
-        thread.start()
-        
+        inflight_key = f"upload:{file_digest(original_path)}:{int(keep_audio)}:{int(force)}:{device or 'auto'}"
+        job_store.set_inputs(task_id, "upload", {
+            "file_path": original_path, "device": device, "keep_audio": keep_audio, "force": force,
+            "media": media, "inflight_key": inflight_key,
+        })
+        if _subscribe_to_inflight(inflight_key, task_id):
+            # The task already converting the same bytes has its own copy
+            _cleanup_files(original_path)
+            return jsonify({"task_id": task_id, "status": "queued", "deduplicated": True}), 202
+
+        _update_estimate(task_id, device, (media or {}).get("duration"))
+        try:
+            conversion_scheduler.submit(
+                task_id, "decode",
+                run_file_conversion_task, task_id, original_path, device, keep_audio, force, media,
+                on_cancel=lambda: _cleanup_files(original_path),
+            )
+        except QueueFull as exc:
+            _finish_inflight(task_id)
+            conversion_tasks.pop(task_id, None)
+            task_estimates.pop(task_id, None)
+            _cleanup_files(original_path)
+            return _queue_full_response(exc)
+
         return jsonify({"task_id": task_id, "status": "queued"}), 202
         
     except Exception as e:
         logger.error(f"Upload media error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-# filepath -> (mtime, size, sha256). Hashing every MIDI on each /api/midi-files
-# call re-reads the whole folder; unchanged files reuse the cached digest.
-_midi_hash_cache: dict = {}
+def library_metadata(entry: dict | None) -> dict | None:
+    """What the MIDI library shows from the history entry behind a file."""
+    if entry is None:
+        return None
+    source_type = entry.get('type') or ''
+    source_url = ''
+    if source_type in ('youtube', 'tiktok', 'discord'):
+        source_url = entry.get(f'{source_type}_url') or ''
+    return {
+        "thumbnail_url": entry.get('thumbnail_url') or '',
+        "video_title": entry.get('video_title') or '',
+        "video_id": entry.get('video_id') or '',
+        "source_type": source_type,
+        "source_url": source_url,
+    }
 
-def _midi_content_hash(filepath: str) -> str:
-    st = os.stat(filepath)
-    cached = _midi_hash_cache.get(filepath)
-    if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
-        return cached[2]
-    with open(filepath, 'rb') as f:
-        digest = hashlib.sha256(f.read()).hexdigest()
-    _midi_hash_cache[filepath] = (st.st_mtime, st.st_size, digest)
-    return digest
+# Size, mtime, content hash, MIDI stats and history metadata of every file in
+# the converted folder, kept on disk and reconciled against the folder when
+# its contents change.
+library_index = LibraryIndex(
+    os.path.join(CACHE_FOLDER, "library.sqlite3"),
+    CONVERTED_FOLDER,
+    metadata_for=lambda filename: library_metadata(history_store.find_by_midi(filename)),
+)
+Thread(target=library_index.reconcile, daemon=True).start()
+
+def _on_library_events(events):
+    for event in events:
+        if event.kind == "renamed":
+            library_index.rename(event.old_name, event.name)
+        elif event.kind == "deleted":
+            library_index.remove(event.name)
+        else:
+            library_index.refresh_file(event.name)
+
+# Files dropped into or removed from the converted folder by hand reach the
+# index through a watcher: "auto" uses inotify when the optional
+# inotify_simple package is installed and polls otherwise; "off" leaves only
+# the reconcile on /api/midi-files.
+LIBRARY_WATCH = os.environ.get("LIBRARY_WATCH", "auto").strip().lower()
+library_watcher = None
+if LIBRARY_WATCH != "off":
+    library_watcher = FolderWatcher(
+        CONVERTED_FOLDER, _on_library_events, suffixes=MIDI_EXTENSIONS, mode=LIBRARY_WATCH,
+        poll_interval=max(0.5, env_float("LIBRARY_WATCH_POLL_SECONDS", 2.0)),
+    ).start()
+
+def midi_file_payload(item: dict) -> dict:
+    filename = item["filename"]
+    metadata = item["metadata"]
+    thumbnail_url = metadata.get('thumbnail_url', '')
+    video_id = metadata.get('video_id', '')
+    # For YouTube, build thumbnail from video_id if not present
+    if not thumbnail_url and video_id:
+        thumbnail_url = f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
+
+    try:
+        download_url = url_for('download_file', filename=filename)
+    except Exception:
+        download_url = f"/converted/{filename}"
+
+    return {
+        "filename": filename,
+        "download_url": download_url,
+        "file_size": item["file_size"],
+        "modified_time": item["modified_time"],
+        "time_str": human_dt(item["modified_time"]),
+        "thumbnail_url": thumbnail_url or '',
+        "video_title": metadata.get('video_title', ''),
+        "video_id": video_id or '',
+        "source_type": metadata.get('source_type', ''),
+        "source_url": metadata.get('source_url', ''),
+        "content_hash": item["content_hash"][:16],
+        "duration": item["duration"],
+        "note_count": item["note_count"],
+    }
 
 @csrf.exempt
 @app.route("/api/midi-files", methods=["GET"])
 def api_midi_files():
-    """Return unique MIDI files from the converted folder, deduplicated by content hash."""
+    """Return unique MIDI files from the converted folder, deduplicated by content hash.
+    `token` can be passed to /api/library/changes to fetch later changes."""
     try:
-        converted_dir = app.config['CONVERTED_FOLDER']
-        if not os.path.exists(converted_dir):
-            return jsonify({"midi_files": []})
-
-        midi_extensions = ('.mid', '.midi')
-        midi_candidates = []
-
-        for filename in os.listdir(converted_dir):
-            if filename.lower().endswith(midi_extensions):
-                filepath = os.path.join(converted_dir, filename)
-                if os.path.isfile(filepath):
-                    midi_candidates.append((filename, filepath))
-
-        # Deduplicate by file content hash – keep the newest file per hash
-        seen_hashes = {}
-        for filename, filepath in midi_candidates:
-            try:
-                content_hash = _midi_content_hash(filepath)
-                mtime = os.path.getmtime(filepath)
-                if content_hash not in seen_hashes or mtime > seen_hashes[content_hash][2]:
-                    seen_hashes[content_hash] = (filename, filepath, mtime)
-            except Exception:
-                continue
-
-        # Build history lookup: midi_name -> history entry (for thumbnails)
-        history_data = load_history()
-        history_lookup = {}
-        for item in history_data:
-            midi_name = item.get('midi_name', '')
-            if midi_name and midi_name not in history_lookup:
-                history_lookup[midi_name] = item
-
-        result = []
-        for content_hash, (filename, filepath, mtime) in seen_hashes.items():
-            file_size = os.path.getsize(filepath)
-            time_str = human_dt(mtime)
-
-            # Try to find thumbnail from history
-            hist_entry = history_lookup.get(filename, {})
-            thumbnail_url = hist_entry.get('thumbnail_url', '')
-            video_title = hist_entry.get('video_title', '')
-            video_id = hist_entry.get('video_id', '')
-            source_type = hist_entry.get('type', '')
-            source_url = ''
-            if source_type == 'youtube':
-                source_url = hist_entry.get('youtube_url', '')
-            elif source_type == 'tiktok':
-                source_url = hist_entry.get('tiktok_url', '')
-            elif source_type == 'discord':
-                source_url = hist_entry.get('discord_url', '')
-
-            # For YouTube, build thumbnail from video_id if not present
-            if not thumbnail_url and video_id:
-                thumbnail_url = f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
-
-            try:
-                download_url = url_for('download_file', filename=filename)
-            except Exception:
-                download_url = f"/converted/{filename}"
+        library_index.reconcile_if_changed()
+        token = library_index.change_token()
+        result = [midi_file_payload(item) for item in library_index.files()]
+        return jsonify({"midi_files": result, "token": token})
+    except Exception as e:
+        logger.error(f"Error listing MIDI files: {e}")
+        return jsonify({"error": str(e)}), 500
 
-            result.append({
+@csrf.exempt
+@app.route("/api/library/changes", methods=["GET"])
+def api_library_changes():
+    """MIDI files added, changed or removed since a token from /api/midi-files
+    or an earlier call. `reset: true` means the token is too old and the
+    client should reload /api/midi-files."""
+    since = request.args.get("since", type=int)
+    if since is None:
+        return jsonify({"error": "since is required"}), 400
+    try:
+        token, changes = library_index.changes_since(since)
+        if changes is None:
+            return jsonify({"token": token, "reset": True, "changes": []})
+        payload = []
+        for filename, _change in changes:
+            item = library_index.file(filename)
+            payload.append({
                 "filename": filename,
-                "download_url": download_url,
-                "file_size": file_size,
-                "modified_time": mtime,
-                "time_str": time_str,
-                "thumbnail_url": thumbnail_url or '',
-                "video_title": video_title or '',
-                "video_id": video_id or '',
-                "source_type": source_type or '',
-                "source_url": source_url or '',
-                "content_hash": content_hash[:16],
+                "change": "upsert" if item is not None else "delete",
+                "file": midi_file_payload(item) if item is not None else None,
             })
-
-        # Sort by modification time, newest first
-        result.sort(key=lambda x: x['modified_time'], reverse=True)
-
-        return jsonify({"midi_files": result})
+        return jsonify({"token": token, "reset": False, "changes": payload})
     except Exception as e:
-        logger.error(f"Error listing MIDI files: {e}")
+        logger.error(f"Error listing library changes: {e}")
         return jsonify({"error": str(e)}), 500
 
 MAX_SHEET_PREVIEW_BYTES = 512 * 1024
@@ -2349,17 +3459,92 @@ def api_list_wallpapers():
 
 @app.route("/history.json", methods=["GET"])
 def serve_history_json():
-    ensure_history_file()
+    version, entries = history_store.snapshot()
+    etag = history_etag(version)
+    not_modified = history_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    # Oldest first, like the file this endpoint used to serve
+    return history_json_response(list(reversed(entries)), etag)
+
+# Jobs still queued or running in the job store when the server starts were
+# interrupted by the last shutdown. "requeue" runs them again from the start
+# (URL downloads, and uploads whose file is still there); "fail" marks them
+# failed.
+JOB_RECOVERY = os.environ.get("JOB_RECOVERY", "requeue").strip().lower()
+
+def _resubmit_stored_job(task_id: str, kind: str | None, inputs: dict) -> bool:
+    key = inputs.get("inflight_key")
+    if key and _subscribe_to_inflight(key, task_id):
+        return True
+    device = inputs.get("device")
+    keep_audio = bool(inputs.get("keep_audio"))
+    force = bool(inputs.get("force"))
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
-    except Exception as exc:
-        logger.error("Failed to read history.json: %s", exc)
-        data = []
-
-    response = jsonify(data)
-    response.headers['Cache-Control'] = 'no-store, max-age=0'
-    return response
+        if kind == "url" and inputs.get("url"):
+            conversion_scheduler.submit(
+                task_id, "download", run_conversion_task, task_id, inputs["url"], device, keep_audio, force
+            )
+            return True
+        file_path = inputs.get("file_path")
+        if kind == "upload" and file_path and os.path.exists(file_path):
+            media = inputs.get("media")
+            _update_estimate(task_id, device, (media or {}).get("duration"))
+            conversion_scheduler.submit(
+                task_id, "decode",
+                run_file_conversion_task, task_id, file_path, device, keep_audio, force, media,
+                on_cancel=lambda: _cleanup_files(file_path),
+            )
+            return True
+    except QueueFull:
+        pass
+    if key:
+        _finish_inflight(task_id)
+    return False
+
+def _recover_subscriber(task_id: str, leader: str, inputs: dict) -> bool:
+    """Settle a task that was waiting for another one's conversion: attach
+    it to the requeued leader, or give it the leader's final state. False
+    when there is neither."""
+    key = inputs.get("inflight_key")
+    if key and _subscribe_to_inflight(key, task_id):
+        return True
+    if not _load_stored_task(leader):
+        return False
+    state = conversion_tasks.get(leader, {})
+    if state.get("status") not in ("completed", "error", "cancelled"):
+        return False
+    if leader in task_results:
+        task_results[task_id] = task_results[leader]
+    conversion_tasks[task_id] = {**state, "leader": leader}
+    return True
+
+def recover_interrupted_jobs():
+    """Re-enqueue or fail the jobs the last run left queued or processing."""
+    requeued = failed = 0
+    subscribers = []
+    for stored in job_store.active():
+        task_id = stored["task_id"]
+        if stored["state"].get("leader"):
+            # Never run again on its own: settled once the leaders are back
+            subscribers.append(stored)
+            continue
+        conversion_tasks[task_id] = {"status": "queued", "progress": "Resuming after a restart"}
+        if JOB_RECOVERY == "requeue" and _resubmit_stored_job(task_id, stored["kind"], stored["inputs"]):
+            requeued += 1
+        else:
+            conversion_tasks[task_id] = {"status": "error", "error": "Interrupted by a server restart"}
+            failed += 1
+    for stored in subscribers:
+        task_id = stored["task_id"]
+        if not _recover_subscriber(task_id, stored["state"]["leader"], stored["inputs"]):
+            conversion_tasks[task_id] = {"status": "error", "error": "Interrupted by a server restart"}
+            failed += 1
+    if requeued or failed:
+        cmd_log(logger, "i", "Interrupted jobs: %d requeued, %d failed", requeued, failed)
+
+recover_interrupted_jobs()
+retry_pending_thumbnails()
 
 def silence_flask_startup_banner():
     try:
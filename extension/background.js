@@ -126,6 +126,80 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
   return false;
 });
 
+// Split a text/event-stream body into events and hand each parsed `data`
+// payload to onEvent(eventName, data).
+async function readEventStream(body, onEvent) {
+  const reader = body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += value.replace(/\r\n?/g, '\n');
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let eventName = 'message';
+      const data = [];
+      for (const line of block.split('\n')) {
+        if (!line || line.startsWith(':')) continue; // keep-alive comments
+        const colon = line.indexOf(':');
+        const field = colon === -1 ? line : line.slice(0, colon);
+        let fieldValue = colon === -1 ? '' : line.slice(colon + 1);
+        if (fieldValue.startsWith(' ')) fieldValue = fieldValue.slice(1);
+        if (field === 'event') eventName = fieldValue;
+        else if (field === 'data') data.push(fieldValue);
+      }
+      if (!data.length) continue;
+
+      try {
+        onEvent(eventName, JSON.parse(data.join('\n')));
+      } catch (err) {
+        console.warn('AudioConverter: bad event payload', err);
+      }
+    }
+  }
+}
+
+// Content scripts follow a conversion over a port named 'convertEvents'.
+// A service worker has no EventSource, so /api/events/<task_id> is read with
+// a streaming fetch and every status event is forwarded to the port. The
+// open port and the active fetch keep the worker alive while it runs.
+chrome.runtime.onConnect.addListener((port) => {
+  if (port.name !== 'convertEvents') return;
+
+  const abort = new AbortController();
+  port.onDisconnect.addListener(() => abort.abort());
+
+  port.onMessage.addListener(async (message) => {
+    if (!message || !message.taskId) return;
+    try {
+      const base = await serverBase();
+      const res = await fetch(`${base}/api/events/${encodeURIComponent(message.taskId)}`, {
+        headers: { Accept: 'text/event-stream' },
+        signal: abort.signal,
+      });
+      if (!res.ok || !res.body) {
+        throw new Error(`Server returned HTTP ${res.status}`);
+      }
+      await readEventStream(res.body, (eventName, data) => {
+        if (eventName === 'status') port.postMessage({ type: 'status', data });
+      });
+      port.postMessage({ type: 'end' });
+    } catch (err) {
+      if (abort.signal.aborted) return;
+      try {
+        port.postMessage({ type: 'failed', error: describeFetchError(err) });
+      } catch (_) {
+        // The content script went away in the meantime
+      }
+    }
+  });
+});
+
 // No popup any more: clicking the toolbar icon opens the app itself
 chrome.action.onClicked.addListener(async () => {
   const base = await serverBase();
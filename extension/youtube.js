@@ -1,8 +1,9 @@
 // YouTube / TikTok → AudioConverter
 //
 // Floating button on video pages. Click hands the URL to the local app, which
-// downloads the audio and runs the Transkun transcription; progress is polled
-// through the service worker so the request never hits a CORS wall.
+// downloads the audio and runs the Transkun transcription. Progress is
+// streamed through the service worker (so the request never hits a CORS
+// wall), with polling as the fallback when the stream is unavailable.
 
 (function () {
   'use strict';
@@ -110,6 +111,65 @@
     }
   }
 
+  function isFinal(state) {
+    return state.status === 'completed' || state.status === 'error' || state.status === 'cancelled';
+  }
+
+  // Follow the task over the worker's event stream. Resolves with the final
+  // state, or null when the stream ended early and polling should take over.
+  function streamStatus(taskId, onUpdate) {
+    return new Promise((resolve) => {
+      let port;
+      try {
+        port = chrome.runtime.connect({ name: 'convertEvents' });
+      } catch (err) {
+        resolve(null);
+        return;
+      }
+
+      let settled = false;
+      function finish(value) {
+        if (settled) return;
+        settled = true;
+        try {
+          port.disconnect();
+        } catch (_) {
+          // Already gone
+        }
+        resolve(value);
+      }
+
+      port.onMessage.addListener((message) => {
+        if (!message) return;
+        if (message.type === 'status') {
+          const state = message.data || {};
+          if (isFinal(state)) finish(state);
+          else onUpdate(state);
+        } else {
+          finish(null);
+        }
+      });
+      port.onDisconnect.addListener(() => finish(null));
+      port.postMessage({ taskId });
+    });
+  }
+
+  async function pollStatus(taskId, onUpdate) {
+    for (let polls = 0; polls < MAX_POLLS; polls++) {
+      await new Promise((r) => setTimeout(r, POLL_INTERVAL));
+
+      const status = await sendToWorker({ action: 'convertStatus', taskId });
+      if (!status || !status.success) {
+        throw new Error((status && status.error) || 'Lost contact with the app');
+      }
+
+      const state = status.data || {};
+      if (isFinal(state)) return state;
+      onUpdate(state);
+    }
+    throw new Error('Timed out after 30 minutes');
+  }
+
   async function convert(btn) {
     btn.disabled = true;
     busy = true;
@@ -122,38 +182,27 @@
       }
 
       const taskId = started.task_id;
-      let polls = 0;
-
-      while (polls < MAX_POLLS) {
-        await new Promise((r) => setTimeout(r, POLL_INTERVAL));
-        polls++;
-
-        const status = await sendToWorker({ action: 'convertStatus', taskId });
-        if (!status || !status.success) {
-          throw new Error((status && status.error) || 'Lost contact with the app');
-        }
-
-        const state = status.data || {};
-
-        if (state.status === 'completed') {
-          setState(btn, '✓ Added to app', 'done');
-          btn.title = state.midi_name || '';
-          resetLater(btn, 5000);
-          return;
-        }
-        if (state.status === 'error') {
-          throw new Error(state.error || 'Conversion failed');
-        }
-        if (state.status === 'cancelled') {
-          setState(btn, 'Cancelled', 'error');
-          resetLater(btn, 4000);
-          return;
-        }
-
-        setState(btn, state.progress || 'Processing…', 'busy');
+      const onUpdate = (state) => {
+        const percent = Number(state.percent_complete);
+        const label = state.progress || 'Processing…';
+        setState(btn, state.percent_complete != null && Number.isFinite(percent)
+          ? `${label} ${Math.round(percent)}%`
+          : label, 'busy');
+      };
+
+      const state = (await streamStatus(taskId, onUpdate)) || (await pollStatus(taskId, onUpdate));
+
+      if (state.status === 'completed') {
+        setState(btn, '✓ Added to app', 'done');
+        btn.title = state.midi_name || '';
+        resetLater(btn, 5000);
+        return;
       }
-
-      throw new Error('Timed out after 30 minutes');
+      if (state.status === 'error') {
+        throw new Error(state.error || 'Conversion failed');
+      }
+      setState(btn, 'Cancelled', 'error');
+      resetLater(btn, 4000);
     } catch (err) {
       console.error('AudioConverter:', err);
       setState(btn, '✕ ' + err.message, 'error');
@@ -1,4 +1,8 @@
+import bisect
+
+import numpy as np
 import pretty_midi
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Dict
 
 pretty_midi.pretty_midi.MAX_TICK = 1e10
@@ -34,6 +38,109 @@ def is_capital(char: str) -> bool:
     return char in CAPITAL_NOTES
 
 
+# Auto-transpose tries every shift in -TRANSPOSE_RANGE..TRANSPOSE_RANGE
+TRANSPOSE_RANGE = 12
+TRANSPOSE_OFFSETS = range(-TRANSPOSE_RANGE, TRANSPOSE_RANGE + 1)
+
+
+def _pitch_tables() -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-pitch flags for MIDI pitches 0-127: playable, has a key,
+    out of range and capital (shifted) key."""
+    pitches = np.arange(128)
+    valid = (pitches >= FIRST_POSSIBLE_NOTE) & (pitches <= LAST_POSSIBLE_NOTE)
+    has_char = np.array([note_to_char(int(pitch)) is not None for pitch in pitches])
+    out_of_range = np.array([is_out_of_range(int(pitch)) for pitch in pitches])
+    capital = np.array([bool(char) and is_capital(char) for char in map(note_to_char, range(128))])
+    return valid, has_char, out_of_range, capital
+
+
+VALID_PITCH, HAS_CHAR_PITCH, OUT_OF_RANGE_PITCH, CAPITAL_PITCH = _pitch_tables()
+
+# What one note at a (transposed) pitch adds to a transposition's score: 2
+# when playable, plus 1 for an in-range lowercase key or minus 1 for an
+# in-range capital one. Padded by TRANSPOSE_RANGE zeros on both sides for
+# pitches shifted below 0 or above 127, so row k of the sliding window is the
+# table for offset k - TRANSPOSE_RANGE.
+_in_range_key = HAS_CHAR_PITCH & ~OUT_OF_RANGE_PITCH
+_SCORE_WEIGHTS = np.pad(
+    2 * VALID_PITCH.astype(np.int64) + np.where(_in_range_key, np.where(CAPITAL_PITCH, -1, 1), 0),
+    TRANSPOSE_RANGE,
+)
+_OFFSET_WEIGHTS = sliding_window_view(_SCORE_WEIGHTS, 128)
+
+
+def score_transpositions(pitches) -> list[int]:
+    """Score of every offset in TRANSPOSE_OFFSETS for these pitches:
+    (valid notes * 2) + in-range lowercase notes - in-range capital notes.
+    One histogram of the pitches times the per-offset weight tables, so the
+    cost is one pass over the notes whatever the number of offsets."""
+    counts = np.bincount(np.asarray(pitches, dtype=np.int64), minlength=128)
+    return (_OFFSET_WEIGHTS @ counts).tolist()
+
+
+def pick_transpose(scores: list[int], resilience: float, current: int = 0) -> int:
+    """Keep `current` unless another offset scores more than `resilience`
+    above the best so far, trying offsets from lowest to highest."""
+    best_transpose = current
+    best_score = scores[current + TRANSPOSE_RANGE]
+    for transpose_by, score in zip(TRANSPOSE_OFFSETS, scores):
+        if score > best_score + resilience:
+            best_score = score
+            best_transpose = transpose_by
+    return best_transpose
+
+
+def region_scores(pitches: np.ndarray, region_sizes: np.ndarray) -> np.ndarray:
+    """Score matrix of consecutive note regions: row r holds
+    score_transpositions() of the next region_sizes[r] pitches, for all
+    regions from one histogram pass."""
+    regions = len(region_sizes)
+    region_of_note = np.repeat(np.arange(regions, dtype=np.int64), region_sizes)
+    counts = np.bincount(
+        region_of_note * 128 + pitches, minlength=regions * 128
+    ).reshape(regions, 128)
+    return counts @ _OFFSET_WEIGHTS.T
+
+
+def plan_transpositions(scores: np.ndarray, switch_cost: float, start: int = 0) -> list[int]:
+    """Transpose offset for every row of a region score matrix that
+    maximizes the summed scores minus switch_cost per change of offset
+    (counting a first offset other than `start`), by dynamic programming
+    over the 25 offsets. Among equal totals the plan with the fewest changes
+    wins, then offsets closest to no transposition, so a plan is
+    deterministic."""
+    regions, offsets = scores.shape
+    if regions == 0:
+        return []
+    preference = np.abs(np.arange(offsets) - TRANSPOSE_RANGE)
+
+    def best_of(total, switches):
+        return int(np.lexsort((preference, switches, -total))[0])
+
+    # Best total and its number of changes for a plan ending on each offset
+    total = np.full(offsets, -np.inf)
+    total[start + TRANSPOSE_RANGE] = 0.0
+    switches = np.zeros(offsets, dtype=np.int64)
+    stayed = np.zeros((regions, offsets), dtype=bool)
+    switched_from = np.zeros(regions, dtype=np.int64)
+    for region in range(regions):
+        source = best_of(total, switches)
+        switch_total = total[source] - switch_cost
+        switch_count = switches[source] + 1
+        stay = (total > switch_total) | ((total == switch_total) & (switches <= switch_count))
+        stayed[region] = stay
+        switched_from[region] = source
+        total = np.where(stay, total, switch_total) + scores[region]
+        switches = np.where(stay, switches, switch_count)
+    offset = best_of(total, switches)
+    plan = [0] * regions
+    for region in range(regions - 1, -1, -1):
+        plan[region] = offset - TRANSPOSE_RANGE
+        if not stayed[region, offset]:
+            offset = int(switched_from[region])
+    return plan
+
+
 def get_separator(time_diff: float, beat_duration: float) -> str:
     if time_diff < beat_duration / 4:
         return '-'
@@ -51,227 +158,191 @@ def get_separator(time_diff: float, beat_duration: float) -> str:
         return '...... '
 
 
+class NoteTable:
+    """The non-drum notes of a MIDI as parallel NumPy columns, sorted by
+    (start, pitch). Chords are ranges of rows (see chord_bounds), so grouping
+    and transposition never build per-note Python objects."""
+
+    __slots__ = ('start', 'end', 'pitch', 'velocity', 'program')
+
+    def __init__(self, start, end, pitch, velocity, program):
+        self.start = start
+        self.end = end
+        self.pitch = pitch
+        self.velocity = velocity
+        self.program = program
+
+    @classmethod
+    def from_midi(cls, midi_data: pretty_midi.PrettyMIDI) -> 'NoteTable':
+        instruments = [inst for inst in midi_data.instruments if not inst.is_drum]
+
+        def column(attribute, dtype):
+            return np.concatenate([np.empty(0, dtype)] + [
+                np.fromiter((getattr(note, attribute) for note in inst.notes), dtype, len(inst.notes))
+                for inst in instruments
+            ])
+
+        start = column('start', np.float64)
+        end = column('end', np.float64)
+        pitch = column('pitch', np.int16)
+        velocity = column('velocity', np.uint8)
+        program = np.concatenate([np.empty(0, np.uint8)] + [
+            np.full(len(inst.notes), inst.program, np.uint8) for inst in instruments
+        ])
+        order = np.lexsort((pitch, start))
+        return cls(start[order], end[order], pitch[order], velocity[order], program[order])
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def chord_bounds(self, quantize_seconds: float) -> list[int]:
+        """Row offsets where each chord starts, plus len(self): chord c is
+        rows bounds[c]:bounds[c + 1]. A chord takes every following note
+        that starts less than quantize_seconds after its first note."""
+        starts = self.start.tolist()
+        count = len(starts)
+        bounds = [0]
+        first = 0
+        while first < count:
+            anchor = starts[first]
+            # bisect finds the boundary; the checks after it keep the exact
+            # `start - anchor < quantize` test where anchor + quantize rounds
+            end = max(bisect.bisect_left(starts, anchor + quantize_seconds, first + 1), first + 1)
+            while end > first + 1 and starts[end - 1] - anchor >= quantize_seconds:
+                end -= 1
+            while end < count and starts[end] - anchor < quantize_seconds:
+                end += 1
+            bounds.append(end)
+            first = end
+        return bounds
+
+
+class BeatGrid:
+    """Tempo and beat length at every chord, and the gap to the next chord
+    in seconds and in beats, computed for all chords at once. The tempo at a
+    time is the last tempo change at or before it (the first tempo before
+    any, 120 BPM for MIDIs without tempo events), found by binary search."""
+
+    __slots__ = ('tempo', 'seconds_per_beat', 'gap_seconds', 'gap_beats')
+
+    def __init__(self, tempo_changes: tuple[np.ndarray, np.ndarray], chord_starts: np.ndarray):
+        change_times, tempos = tempo_changes
+        if len(tempos) == 0:
+            change_times, tempos = np.zeros(1), np.full(1, 120.0)
+        index = np.maximum(np.searchsorted(change_times, chord_starts, side='right') - 1, 0)
+        tempo = np.asarray(tempos, dtype=np.float64)[index]
+        seconds_per_beat = 1.0 / (tempo / 60.0)
+        gaps = np.diff(chord_starts)
+        self.tempo = tempo.tolist()
+        self.seconds_per_beat = seconds_per_beat.tolist()
+        self.gap_seconds = gaps.tolist()
+        self.gap_beats = (gaps / seconds_per_beat[:-1]).tolist()
+
+
+# Bump when a change to the converter changes its output for the same MIDI
+# and settings: cached sheets are keyed by it.
+CONVERTER_VERSION = 2
+
+DEFAULT_SETTINGS = {
+    'resilience': 2,
+    'place_shifted_notes': 'start',
+    'place_out_of_range_notes': 'inorder',
+    'break_lines_how': 'manually',
+    'break_lines_every': 4,
+    'quantize': 35,
+    'classic_chord_order': True,
+    'sequential_quantizes': False,
+    'curly_braces_for_quantized_chords': False,
+    'include_out_of_range': True,
+    'show_tempo_timing_marks': True,
+    'show_out_of_range_text_marks': True,
+    'out_of_range_separator': ':',
+    'show_bpm_changes_as_comments': True,
+    'auto_transpose': True,
+    'multi_transpose': False,
+}
+
+# Compared case-insensitively by the converter
+_CASE_INSENSITIVE_SETTINGS = ('place_shifted_notes', 'place_out_of_range_notes')
+
+
+def normalize_settings(settings: Dict = None) -> Dict:
+    """The converter's settings with defaults filled in, in a canonical form
+    that gives equal dicts for settings that produce the same sheet: unknown
+    keys are dropped, numbers become floats and case-insensitive choices
+    lowercase."""
+    final_settings = {}
+    for key, default in DEFAULT_SETTINGS.items():
+        value = settings.get(key, default) if settings else default
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        elif key in _CASE_INSENSITIVE_SETTINGS and isinstance(value, str):
+            value = value.lower()
+        final_settings[key] = value
+    return final_settings
+
+
 def convert_midi_to_sheets(midi_file_path: str, output_file_path: str, settings: Dict = None) -> tuple[str, str]:
-    if settings is None:
-        settings = {}
-    
-    defaults = {
-        'resilience': 2,
-        'place_shifted_notes': 'start',
-        'place_out_of_range_notes': 'inorder',
-        'break_lines_how': 'manually',
-        'break_lines_every': 4,
-        'quantize': 35,
-        'classic_chord_order': True,
-        'sequential_quantizes': False,
-        'curly_braces_for_quantized_chords': False,
-        'include_out_of_range': True,
-        'show_tempo_timing_marks': True,
-        'show_out_of_range_text_marks': True,
-        'out_of_range_separator': ':',
-        'show_bpm_changes_as_comments': True,
-        'auto_transpose': True,
-        'multi_transpose': False,
-    }
-    
-    final_settings = {**defaults, **settings}
+    final_settings = normalize_settings(settings)
     
     try:
         midi_data = pretty_midi.PrettyMIDI(midi_file_path)
     except Exception as e:
         raise Exception(f"Failed to load MIDI file: {str(e)}")
     
-    all_notes = []
-    for instrument in midi_data.instruments:
-        if instrument.is_drum:
-            continue
-        for note in instrument.notes:
-            all_notes.append({
-                'start': note.start,
-                'end': note.end,
-                'pitch': note.pitch,
-                'velocity': note.velocity,
-                'instrument': instrument.program
-            })
+    notes = NoteTable.from_midi(midi_data)
+    tempo_changes = midi_data.get_tempo_changes()
+    # The table holds everything still needed; drop pretty_midi's note objects
+    del midi_data
     
-    all_notes.sort(key=lambda x: (x['start'], x['pitch']))
+    quantize_seconds = final_settings['quantize'] / 1000.0
+    bounds = notes.chord_bounds(quantize_seconds)
+    chord_count = len(bounds) - 1
+    grid = BeatGrid(tempo_changes, notes.start[bounds[:-1]])
     
     applied_transpose = 0
     region_transpositions = []
     
-    def score_transposition(transpose_by, notes_to_score):
-            valid_notes = 0
-            lowercase_notes = 0
-            uppercase_notes = 0
-            
-            for note in notes_to_score:
-                transposed_pitch = note['pitch'] + transpose_by
-                if 21 <= transposed_pitch <= 108:
-                    valid_notes += 1
-                    char = note_to_char(transposed_pitch)
-                    if char and not is_out_of_range(transposed_pitch):
-                        if is_capital(char):
-                            uppercase_notes += 1
-                        else:
-                            lowercase_notes += 1
-            
-            return (valid_notes * 2) + lowercase_notes - uppercase_notes
-    
     if final_settings.get('auto_transpose', False):
         if final_settings.get('multi_transpose', False):
-            tempo_changes_temp = midi_data.get_tempo_changes()
-            if len(tempo_changes_temp[1]) == 0:
-                default_tempo_temp = 120.0
-                tempo_map_temp = [(0.0, 120.0)]
-            else:
-                default_tempo_temp = tempo_changes_temp[1][0]
-                tempo_map_temp = list(zip(tempo_changes_temp[0], tempo_changes_temp[1]))
-            
-            def get_tempo_at_time(time):
-                current_tempo = default_tempo_temp
-                for tempo_time, tempo in tempo_map_temp:
-                    if tempo_time <= time:
-                        current_tempo = tempo
-                    else:
-                        break
-                return current_tempo
-            
-            quantize_seconds_temp = final_settings['quantize'] / 1000.0
-            chords_temp = []
-            current_chord_temp = []
-            last_start_time_temp = None
-            
-            for note in all_notes:
-                if last_start_time_temp is None:
-                    last_start_time_temp = note['start']
-                    current_chord_temp = [note]
-                else:
-                    time_diff = note['start'] - last_start_time_temp
-                    if time_diff < quantize_seconds_temp:
-                        current_chord_temp.append(note)
-                    else:
-                        if current_chord_temp:
-                            chords_temp.append(current_chord_temp)
-                        current_chord_temp = [note]
-                        last_start_time_temp = note['start']
-            
-            if current_chord_temp:
-                chords_temp.append(current_chord_temp)
-            
             beats_per_line = final_settings['break_lines_every']
             regions = []
             current_region_start = 0
             beats_accumulated = 0.0
             
-            for i, chord in enumerate(chords_temp):
-                if i < len(chords_temp) - 1:
-                    next_chord = chords_temp[i + 1]
-                    if next_chord:
-                        chord_start = chord[0]['start']
-                        time_diff = next_chord[0]['start'] - chord_start
-                        current_tempo = get_tempo_at_time(chord_start)
-                        beats_per_second = current_tempo / 60.0
-                        seconds_per_beat = 1.0 / beats_per_second
-                        beats_passed = time_diff / seconds_per_beat
-                        beats_accumulated += beats_passed
-                        
-                        if beats_accumulated >= beats_per_line:
-                            regions.append((current_region_start, i + 1))
-                            current_region_start = i + 1
-                            beats_accumulated = 0.0
-            
-            if current_region_start < len(chords_temp):
-                regions.append((current_region_start, len(chords_temp)))
+            for i, beats_passed in enumerate(grid.gap_beats):
+                beats_accumulated += beats_passed
+                
+                if beats_accumulated >= beats_per_line:
+                    regions.append((current_region_start, i + 1))
+                    current_region_start = i + 1
+                    beats_accumulated = 0.0
             
-            if not regions:
-                regions = [(0, len(chords_temp))]
+            if current_region_start < chord_count:
+                regions.append((current_region_start, chord_count))
             
-            previous_transpose = 0
-            transpose_index = 1
+            region_sizes = np.diff([bounds[start] for start, _ in regions] + [len(notes)])
+            plan = plan_transpositions(
+                region_scores(notes.pitch, region_sizes),
+                final_settings.get('resilience', 2),
+            )
+            note_offsets = np.repeat(np.asarray(plan, dtype=np.int64), region_sizes)
+            np.clip(notes.pitch + note_offsets, 21, 108, out=notes.pitch, casting='unsafe')
             
-            for region_start, region_end in regions:
-                region_notes = []
-                for i in range(region_start, region_end):
-                    if i < len(chords_temp):
-                        region_notes.extend(chords_temp[i])
-                
-                if not region_notes:
-                    continue
-                
-                best_transpose = previous_transpose
-                best_score = score_transposition(previous_transpose, region_notes)
-                
-                for transpose_by in range(-12, 13):
-                    score = score_transposition(transpose_by, region_notes)
-                    if score > best_score + final_settings.get('resilience', 2):
-                        best_score = score
-                        best_transpose = transpose_by
-                
-                for note in region_notes:
-                    new_pitch = note['pitch'] + best_transpose
-                    note['pitch'] = max(21, min(108, new_pitch))
-                
+            for transpose_index, ((region_start, _), best_transpose) in enumerate(zip(regions, plan), 1):
                 region_transpositions.append({
                     'transpose': best_transpose,
                     'index': transpose_index,
                     'start_chord': region_start
                 })
-                transpose_index += 1
-                
-                previous_transpose = best_transpose
         else:
-            best_transpose = 0
-            best_score = score_transposition(0, all_notes)
-            
-            for transpose_by in range(-12, 13):
-                score = score_transposition(transpose_by, all_notes)
-                if score > best_score + final_settings.get('resilience', 2):
-                    best_score = score
-                    best_transpose = transpose_by
+            best_transpose = pick_transpose(
+                score_transpositions(notes.pitch),
+                final_settings.get('resilience', 2),
+            )
             
             applied_transpose = best_transpose
-            for note in all_notes:
-                new_pitch = note['pitch'] + best_transpose
-                note['pitch'] = max(21, min(108, new_pitch))
-    
-    tempo_changes = midi_data.get_tempo_changes()
-    if len(tempo_changes[1]) == 0:
-        default_tempo = 120.0
-        tempo_map = [(0.0, 120.0)]
-    else:
-        default_tempo = tempo_changes[1][0]
-        tempo_map = list(zip(tempo_changes[0], tempo_changes[1]))
-    
-    quantize_seconds = final_settings['quantize'] / 1000.0
-    chords = []
-    current_chord = []
-    last_start_time = None
-    
-    for note in all_notes:
-        if last_start_time is None:
-            last_start_time = note['start']
-            current_chord = [note]
-        else:
-            time_diff = note['start'] - last_start_time
-            if time_diff < quantize_seconds:
-                current_chord.append(note)
-            else:
-                if current_chord:
-                    chords.append(current_chord)
-                current_chord = [note]
-                last_start_time = note['start']
-    
-    if current_chord:
-        chords.append(current_chord)
-    
-    def get_tempo_at_time(time):
-        current_tempo = default_tempo
-        for tempo_time, tempo in tempo_map:
-            if tempo_time <= time:
-                current_tempo = tempo
-            else:
-                break
-        return current_tempo
+            np.clip(notes.pitch + best_transpose, 21, 108, out=notes.pitch)
     
     sheet_lines = []
     current_line = []
@@ -280,17 +351,15 @@ def convert_midi_to_sheets(midi_file_path: str, output_file_path: str, settings:
     
     last_tempo = None
     chord_index = 0
+    starts = notes.start.tolist()
+    pitches = notes.pitch.tolist()
     
-    for i, chord in enumerate(chords):
-        if not chord:
-            continue
+    for i in range(chord_count):
+        first, end = bounds[i], bounds[i + 1]
+        chord_start = starts[first]
+        chord_pitches = sorted(set(pitches[first:end]))
         
-        chord_start = chord[0]['start']
-        chord_pitches = sorted(set([n['pitch'] for n in chord]))
-        
-        current_tempo = get_tempo_at_time(chord_start)
-        beats_per_second = current_tempo / 60.0
-        seconds_per_beat = 1.0 / beats_per_second
+        current_tempo = grid.tempo[i]
         
         if final_settings['show_bpm_changes_as_comments']:
             if last_tempo is not None and current_tempo != last_tempo:
@@ -310,9 +379,8 @@ def convert_midi_to_sheets(midi_file_path: str, output_file_path: str, settings:
                 sheet_lines.append((comment, chord_index))
             last_tempo = current_tempo
         
-        is_quantized = len(chord) > 1 and any(
-            abs(n['start'] - chord[0]['start']) > 0.001 for n in chord
-        )
+        # Rows are sorted by start: the last one is the furthest from the first
+        is_quantized = end - first > 1 and starts[end - 1] - chord_start > 0.001
         
         oors_start = []
         oors_end = []
@@ -423,14 +491,9 @@ def convert_midi_to_sheets(midi_file_path: str, output_file_path: str, settings:
             else:
                 chord_str += "]"
         
-        if final_settings['show_tempo_timing_marks'] and i < len(chords) - 1:
-            next_chord = chords[i + 1]
-            if next_chord:
-                time_diff = next_chord[0]['start'] - chord_start
-                separator = get_separator(time_diff, seconds_per_beat)
-                chord_str += separator
-            else:
-                chord_str += " "
+        if final_settings['show_tempo_timing_marks'] and i < chord_count - 1:
+            separator = get_separator(grid.gap_seconds[i], grid.seconds_per_beat[i])
+            chord_str += separator
         else:
             chord_str += " "
         
@@ -440,36 +503,28 @@ def convert_midi_to_sheets(midi_file_path: str, output_file_path: str, settings:
         line_break_occurred = False
         
         if final_settings['break_lines_how'] == 'manually':
-            if i < len(chords) - 1:
-                next_chord = chords[i + 1]
-                if next_chord:
-                    time_diff = next_chord[0]['start'] - chord_start
-                    beats_passed = time_diff / seconds_per_beat
-                    beats_accumulated += beats_passed
-                    
-                    if beats_accumulated >= beats_per_line:
-                        sheet_lines.append(("".join(current_line).rstrip(), chord_index))
-                        current_line = []
-                        beats_accumulated = 0.0
-                        line_break_occurred = True
+            if i < chord_count - 1:
+                beats_accumulated += grid.gap_beats[i]
+                
+                if beats_accumulated >= beats_per_line:
+                    sheet_lines.append(("".join(current_line).rstrip(), chord_index))
+                    current_line = []
+                    beats_accumulated = 0.0
+                    line_break_occurred = True
             else:
                 if current_line:
                     sheet_lines.append(("".join(current_line).rstrip(), chord_index))
                     current_line = []
                     line_break_occurred = True
         else:
-            if i < len(chords) - 1:
-                next_chord = chords[i + 1]
-                if next_chord:
-                    time_diff = next_chord[0]['start'] - chord_start
-                    beats_passed = time_diff / seconds_per_beat
-                    beats_accumulated += beats_passed
-                    
-                    if beats_accumulated >= 4.0:
-                        sheet_lines.append(("".join(current_line).rstrip(), chord_index))
-                        current_line = []
-                        beats_accumulated = 0.0
-                        line_break_occurred = True
+            if i < chord_count - 1:
+                beats_accumulated += grid.gap_beats[i]
+                
+                if beats_accumulated >= 4.0:
+                    sheet_lines.append(("".join(current_line).rstrip(), chord_index))
+                    current_line = []
+                    beats_accumulated = 0.0
+                    line_break_occurred = True
     
     if current_line:
         sheet_lines.append(("".join(current_line).rstrip(), chord_index))
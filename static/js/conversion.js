@@ -488,6 +488,112 @@ function showConversionResult(resultData) {
   }
 }
 
+// Follow a task until it finishes. Updates arrive over Server-Sent Events
+// from /api/events/<task_id>; if the stream cannot be opened or drops, this
+// falls back to polling /api/status every 2 seconds. Resolves with the final
+// status payload (completed or cancelled), or null once the user pressed
+// Stop; rejects when the conversion fails.
+function watchTask(taskId, onUpdate) {
+  return new Promise((resolve, reject) => {
+    let settled = false;
+    let source = null;
+
+    const stopWatcher = setInterval(() => {
+      if (isStopped) finish(resolve, null);
+    }, 250);
+
+    function finish(settle, value) {
+      if (settled) return;
+      settled = true;
+      clearInterval(stopWatcher);
+      if (source) source.close();
+      settle(value);
+    }
+
+    function handle(statusData) {
+      if (statusData.status === 'completed' || statusData.status === 'cancelled') {
+        finish(resolve, statusData);
+      } else if (statusData.status === 'error' || (!statusData.status && statusData.error)) {
+        // Includes "Task not found" after a server restart
+        finish(reject, new Error(statusData.error || 'Conversion failed'));
+      } else if (!isStopped) {
+        onUpdate(statusData);
+      }
+    }
+
+    async function poll() {
+      const maxAttempts = 900; // 2s each — up to 30 min for long CPU conversions
+      let networkFailures = 0;
+
+      for (let attempts = 0; attempts < maxAttempts && !settled; attempts++) {
+        await new Promise(r => setTimeout(r, 2000));
+        if (settled) return;
+
+        // Only network failures are retried here. Errors reported by the
+        // server go through handle(), so they surface immediately instead
+        // of being swallowed until the timeout.
+        let statusData = null;
+        try {
+          const statusResponse = await fetch(`/api/status/${taskId}`);
+          statusData = await statusResponse.json();
+        } catch (err) {
+          console.error('Status check error:', err);
+          networkFailures++;
+          if (networkFailures >= 15) {
+            finish(reject, new Error('Lost connection to the server. Check that it is still running.'));
+            return;
+          }
+        }
+
+        if (statusData) {
+          networkFailures = 0;
+          handle(statusData);
+        }
+      }
+
+      finish(reject, new Error('Conversion timed out after 30 minutes. Check the server console for details.'));
+    }
+
+    if (typeof EventSource === 'undefined') {
+      poll();
+      return;
+    }
+
+    source = new EventSource(`/api/events/${encodeURIComponent(taskId)}`);
+    source.addEventListener('status', (event) => {
+      try {
+        handle(JSON.parse(event.data));
+      } catch (err) {
+        console.error('Bad status event:', err);
+      }
+    });
+    source.onerror = () => {
+      // The server closes the stream after the final event, so an error
+      // before that means SSE is blocked or the connection dropped.
+      if (settled) return;
+      source.close();
+      source = null;
+      poll();
+    };
+  });
+}
+
+// Map the server's percent_complete onto the part of the bar after `floor`
+function progressWidth(statusData, floor) {
+  const percent = Number(statusData.percent_complete);
+  if (statusData.percent_complete == null || !Number.isFinite(percent)) return null;
+  return `${floor + (Math.min(100, Math.max(0, percent)) / 100) * (95 - floor)}%`;
+}
+
+function describeProgress(statusData) {
+  let text = statusData.progress || 'Processing...';
+  const eta = Number(statusData.eta_seconds);
+  if (statusData.eta_seconds != null && Number.isFinite(eta) && eta > 0) {
+    text += eta >= 90 ? ` (~${Math.round(eta / 60)} min left)` : ` (~${Math.round(eta)}s left)`;
+  }
+  return text;
+}
+
 const fileUploadForm = document.getElementById('file-upload-form');
 if (fileUploadForm) {
   fileUploadForm.addEventListener('submit', async function(e) {
@@ -536,79 +642,38 @@ if (fileUploadForm) {
         if (progressText) progressText.textContent = 'Processing...';
         if (progressFill) progressFill.style.width = '30%';
         
-        let attempts = 0;
-        const maxAttempts = 900; // 2s each — up to 30 min for long CPU conversions
-        let networkFailures = 0;
-
-        while (!isStopped && attempts < maxAttempts) {
-          await new Promise(resolve => setTimeout(resolve, 2000));
-
-          if (isStopped) break;
-
-          // Only network failures are retried here. Errors reported by the
-          // server are handled below, outside this try, so they surface
-          // immediately instead of being swallowed until the timeout.
-          let statusData = null;
-          try {
-            const statusResponse = await fetch(`/api/status/${currentTaskId}`);
-            statusData = await statusResponse.json();
-          } catch (err) {
-            console.error('Status check error:', err);
-            networkFailures++;
-            if (networkFailures >= 15) {
-              throw new Error('Lost connection to the server. Check that it is still running.');
-            }
-          }
-
-          if (statusData) {
-            networkFailures = 0;
-            if (statusData.status === 'completed') {
-              if (!isStopped) {
-                if (progressFill) progressFill.style.width = '100%';
-                if (progressText) progressText.textContent = 'Done!';
-
-                setTimeout(() => {
-                  hideProgress();
-                  showConversionResult({
-                    status: 'completed',
-                    midi_name: statusData.midi_name,
-                    download_url: statusData.download_url,
-                    conversion_time: statusData.conversion_time,
-                    type: statusData.type || 'upload',
-                    mp3_name: file.name,
-                    library: statusData.library || 'Transkun',
-                    timestamp: statusData.timestamp
-                  });
-                  resetButtonStates();
-                }, 500);
-              }
-              return;
-            } else if (statusData.status === 'cancelled') {
-              isStopped = true;
-              if (progressText) progressText.textContent = 'Cancelled';
-              break;
-            } else if (statusData.status === 'error' || (!statusData.status && statusData.error)) {
-              // Includes "Task not found" after a server restart
-              throw new Error(statusData.error || 'Conversion failed');
-            } else if (!isStopped) {
-              if (progressText) progressText.textContent = statusData.progress || 'Processing...';
-              if (progressFill) progressFill.style.width = `${30 + (attempts / maxAttempts) * 60}%`;
-            }
-          }
-
-          attempts++;
-        }
-
-        if (isStopped) {
+        const statusData = await watchTask(currentTaskId, (update) => {
+          if (progressText) progressText.textContent = describeProgress(update);
+          const width = progressWidth(update, 30);
+          if (progressFill && width) progressFill.style.width = width;
+        });
+
+        if (!statusData || statusData.status === 'cancelled') {
+          isStopped = true;
+          if (progressText) progressText.textContent = 'Cancelled';
           resetButtonStates();
           hideProgress();
           currentTaskId = null;
           return;
         }
 
-        if (attempts >= maxAttempts) {
-          throw new Error('Conversion timed out after 30 minutes. Check the server console for details.');
-        }
+        if (progressFill) progressFill.style.width = '100%';
+        if (progressText) progressText.textContent = 'Done!';
+
+        setTimeout(() => {
+          hideProgress();
+          showConversionResult({
+            status: 'completed',
+            midi_name: statusData.midi_name,
+            download_url: statusData.download_url,
+            conversion_time: statusData.conversion_time,
+            type: statusData.type || 'upload',
+            mp3_name: file.name,
+            library: statusData.library || 'Transkun',
+            timestamp: statusData.timestamp
+          });
+          resetButtonStates();
+        }, 500);
       } else {
         throw new Error('No task ID received');
       }
@@ -665,72 +730,29 @@ if (youtubeForm) {
       const data = await response.json();
       currentTaskId = data.task_id;
 
-      let attempts = 0;
-      const maxAttempts = 900; // 2s each — up to 30 min for long CPU conversions
-      let networkFailures = 0;
-
-      while (!isStopped && attempts < maxAttempts) {
-        await new Promise(resolve => setTimeout(resolve, 2000));
-
-        if (isStopped) {
-          break;
-        }
-
-        // Only network failures are retried here. Errors reported by the
-        // server are handled below, outside this try, so they surface
-        // immediately instead of being swallowed until the timeout.
-        let statusData = null;
-        try {
-          const statusResponse = await fetch(`/api/status/${currentTaskId}`);
-          statusData = await statusResponse.json();
-        } catch (err) {
-          console.error('Status check error:', err);
-          networkFailures++;
-          if (networkFailures >= 15) {
-            throw new Error('Lost connection to the server. Check that it is still running.');
-          }
-        }
-
-        if (statusData) {
-          networkFailures = 0;
-          if (statusData.status === 'completed') {
-            if (!isStopped) {
-              progressFill.style.width = '100%';
-              progressText.textContent = 'Done!';
-
-              setTimeout(function() {
-                hideProgress();
-                showConversionResult(statusData);
-                resetButtonStates();
-              }, 500);
-            }
-            return;
-          } else if (statusData.status === 'cancelled') {
-            isStopped = true;
-            progressText.textContent = 'Cancelled';
-            break;
-          } else if (statusData.status === 'error' || (!statusData.status && statusData.error)) {
-            // Includes "Task not found" after a server restart
-            throw new Error(statusData.error || 'Conversion failed');
-          } else if (!isStopped) {
-            progressText.textContent = statusData.progress || 'Processing...';
-            progressFill.style.width = `${60 + (attempts / maxAttempts) * 30}%`;
-          }
-        }
-
-        attempts++;
-      }
+      const statusData = await watchTask(currentTaskId, (update) => {
+        progressText.textContent = describeProgress(update);
+        const width = progressWidth(update, 10);
+        if (width) progressFill.style.width = width;
+      });
 
-      if (isStopped) {
+      if (!statusData || statusData.status === 'cancelled') {
+        isStopped = true;
+        progressText.textContent = 'Cancelled';
         resetButtonStates();
         hideProgress();
         currentTaskId = null;
         return;
       }
 
-      if (attempts >= maxAttempts) {
-        throw new Error('Conversion timed out after 30 minutes. Check the server console for details.');
-      }
+      progressFill.style.width = '100%';
+      progressText.textContent = 'Done!';
+
+      setTimeout(function() {
+        hideProgress();
+        showConversionResult(statusData);
+        resetButtonStates();
+      }, 500);
     } catch (err) {
       showConversionError(err.message || String(err));
       resetButtonStates();
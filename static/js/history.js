@@ -3,7 +3,7 @@ async function reloadConverterHistory() {
   if (!historyList) return;
   
   try {
-    const response = await fetch('/api/history?limit=32&_=' + Date.now());
+    const response = await fetch('/api/history?limit=32', { cache: 'no-cache' });
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
@@ -123,7 +123,7 @@ function createHistoryItemHTML(rawItem) {
   }
   
   html += '</div>';
-  html += '<button class="delete-history-btn shrink-0 px-2 py-0.5 text-[10px] rounded-full bg-red-600/30 text-red-300 border border-red-700 hover:bg-red-600/50 hover-effect" data-timestamp="' + (item.timestamp || '') + '" title="Delete">Delete</button>';
+  html += '<button class="delete-history-btn shrink-0 px-2 py-0.5 text-[10px] rounded-full bg-red-600/30 text-red-300 border border-red-700 hover:bg-red-600/50 hover-effect" data-history-id="' + (item.id || '') + '" data-timestamp="' + (item.timestamp || '') + '" title="Delete">Delete</button>';
   html += '</div>';
   html += '<div class="history-card-body mt-2 space-y-2 text-sm flex-1 flex flex-col min-h-0">';
   
@@ -397,22 +397,72 @@ function filterHistoryItems(searchQuery) {
   renderHistoryPage();
 }
 
-async function fetchHistorySources() {
-  const [historyRes, midiRes] = await Promise.all([
-    fetch('/api/history?limit=500'),
-    fetch('/api/midi-files?_=' + Date.now()),
-  ]);
+// Change token from /api/midi-files: later refreshes only fetch what changed
+// in the converted folder since then.
+let libraryChangeToken = null;
 
-  if (!historyRes.ok) throw new Error(`HTTP error! status: ${historyRes.status}`);
+function applyLibraryChanges(changes) {
+  if (!changes.length) return;
+  const byName = new Map(allMidiFilesData.map(file => [file.filename, file]));
+  changes.forEach(change => {
+    byName.delete(change.filename);
+    if (change.file) byName.set(change.filename, change.file);
+  });
+  // Same as the server's listing: newest first, one file per content hash
+  const seenHashes = new Set();
+  allMidiFilesData = Array.from(byName.values())
+    .sort((a, b) => (b.modified_time || 0) - (a.modified_time || 0))
+    .filter(file => {
+      if (seenHashes.has(file.content_hash)) return false;
+      seenHashes.add(file.content_hash);
+      return true;
+    });
+}
 
-  fullHistoryData = (await historyRes.json()) || [];
+async function fetchMidiFiles() {
+  if (libraryChangeToken !== null) {
+    try {
+      const changesRes = await fetch('/api/library/changes?since=' + encodeURIComponent(libraryChangeToken), { cache: 'no-store' });
+      if (changesRes.ok) {
+        const changesData = await changesRes.json();
+        if (!changesData.reset) {
+          applyLibraryChanges(changesData.changes || []);
+          libraryChangeToken = changesData.token;
+          return;
+        }
+      }
+    } catch (err) {
+      console.error('Library changes error:', err);
+    }
+  }
 
+  const midiRes = await fetch('/api/midi-files?_=' + Date.now());
   if (midiRes.ok) {
     const midiData = await midiRes.json();
     allMidiFilesData = midiData.midi_files || [];
+    libraryChangeToken = midiData.token ?? null;
   }
 }
 
+async function fetchHistorySources() {
+  const [entries] = await Promise.all([fetchAllHistory(), fetchMidiFiles()]);
+  fullHistoryData = entries;
+}
+
+async function fetchAllHistory() {
+  // Pages hold at most 500 entries; follow X-Next-Cursor for the rest
+  const entries = [];
+  let cursor = null;
+  do {
+    const url = '/api/history?limit=500' + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+    const res = await fetch(url, { cache: 'no-cache' });
+    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+    entries.push(...((await res.json()) || []));
+    cursor = res.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return entries;
+}
+
 async function loadFullHistory() {
   const historyList = document.getElementById('full-history-list');
   if (!historyList) return;
@@ -542,9 +592,10 @@ async function setupDeleteButtons() {
     
     btn.addEventListener('click', async function(e) {
       e.stopPropagation();
+      const historyId = this.getAttribute('data-history-id');
       const timestamp = this.getAttribute('data-timestamp');
-      if (!timestamp || timestamp === '') {
-        showAlert('Cannot delete: missing timestamp', 'Error');
+      if (!historyId && !timestamp) {
+        showAlert('Cannot delete: missing history id', 'Error');
         return;
       }
       
@@ -554,6 +605,15 @@ async function setupDeleteButtons() {
       }
       
       const timestampFloat = parseFloat(timestamp);
+      // Entries are deleted by id; the timestamp is only a fallback for
+      // pages rendered before history had ids.
+      const isDeleted = (id, ts) => historyId
+        ? String(id || '') === historyId
+        : !isNaN(ts) && Math.abs(ts - timestampFloat) < 0.001;
+      const buttonIsDeleted = (button) => isDeleted(
+        button.getAttribute('data-history-id'),
+        parseFloat(button.getAttribute('data-timestamp'))
+      );
       
       try {
         const response = await fetch('/api/history/delete', {
@@ -561,7 +621,7 @@ async function setupDeleteButtons() {
           headers: {
             'Content-Type': 'application/json',
           },
-          body: JSON.stringify({ timestamp: timestampFloat })
+          body: JSON.stringify(historyId ? { id: Number(historyId) } : { timestamp: timestampFloat })
         });
         
         const responseData = await response.json();
@@ -580,15 +640,9 @@ async function setupDeleteButtons() {
           const items = Array.from(historyList.querySelectorAll('.history-item'));
           items.forEach(item => {
             const deleteBtn = item.querySelector('.delete-history-btn');
-            if (deleteBtn) {
-              const itemTimestamp = deleteBtn.getAttribute('data-timestamp');
-              if (itemTimestamp) {
-                const itemTimestampFloat = parseFloat(itemTimestamp);
-                if (!isNaN(itemTimestampFloat) && Math.abs(itemTimestampFloat - timestampFloat) < 0.001) {
-                  item.remove();
-                  removedFromHistoryList = true;
-                }
-              }
+            if (deleteBtn && buttonIsDeleted(deleteBtn)) {
+              item.remove();
+              removedFromHistoryList = true;
             }
           });
           
@@ -602,15 +656,9 @@ async function setupDeleteButtons() {
           const items = Array.from(fullHistoryList.querySelectorAll('.history-item'));
           items.forEach(item => {
             const deleteBtn = item.querySelector('.delete-history-btn');
-            if (deleteBtn) {
-              const itemTimestamp = deleteBtn.getAttribute('data-timestamp');
-              if (itemTimestamp) {
-                const itemTimestampFloat = parseFloat(itemTimestamp);
-                if (!isNaN(itemTimestampFloat) && Math.abs(itemTimestampFloat - timestampFloat) < 0.001) {
-                  item.remove();
-                  removedFromFullHistoryList = true;
-                }
-              }
+            if (deleteBtn && buttonIsDeleted(deleteBtn)) {
+              item.remove();
+              removedFromFullHistoryList = true;
             }
           });
           
@@ -621,10 +669,7 @@ async function setupDeleteButtons() {
         }
         
         if (typeof fullHistoryData !== 'undefined' && Array.isArray(fullHistoryData)) {
-          fullHistoryData = fullHistoryData.filter(item => {
-            const itemTimestamp = item.timestamp || 0;
-            return Math.abs(itemTimestamp - timestampFloat) >= 0.001;
-          });
+          fullHistoryData = fullHistoryData.filter(item => !isDeleted(item.id, item.timestamp || 0));
         }
         
         if (removedFromHistoryList || removedFromFullHistoryList) {
@@ -0,0 +1,67 @@
+"""Conversion time estimates.
+
+Transcription time grows roughly linearly with audio length, with a fixed
+start-up cost on top, and the slope depends on the device. DurationModel
+keeps a least-squares fit of `seconds = intercept + rate * audio_seconds`
+per device from running sums, so each finished job refits it in O(1).
+"""
+import threading
+
+# Seconds of processing per second of audio before any job has finished
+DEFAULT_RATES = {"cuda": 0.1, "mps": 0.35, "cpu": 1.2}
+MIN_INTERCEPT = 1.0
+
+
+class DurationModel:
+    def __init__(self, default_rates: dict | None = None):
+        self.default_rates = dict(DEFAULT_RATES)
+        if default_rates:
+            self.default_rates.update(default_rates)
+        # device -> [n, sum_x, sum_y, sum_xx, sum_xy]
+        self._sums: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, device: str, audio_seconds: float, elapsed: float):
+        if not audio_seconds or audio_seconds <= 0 or elapsed is None or elapsed < 0:
+            return
+        with self._lock:
+            sums = self._sums.setdefault(device, [0, 0.0, 0.0, 0.0, 0.0])
+            sums[0] += 1
+            sums[1] += audio_seconds
+            sums[2] += elapsed
+            sums[3] += audio_seconds * audio_seconds
+            sums[4] += audio_seconds * elapsed
+
+    def _fit(self, device: str) -> tuple[float, float]:
+        sums = self._sums.get(device)
+        if not sums or sums[0] == 0:
+            return MIN_INTERCEPT, self.default_rates.get(device, self.default_rates["cpu"])
+        n, sx, sy, sxx, sxy = sums
+        denom = n * sxx - sx * sx
+        if n >= 2 and denom > 1e-9:
+            rate = (n * sxy - sx * sy) / denom
+            intercept = (sy - rate * sx) / n
+            if rate > 0 and intercept >= 0:
+                return intercept, rate
+        # Too few or too similar samples for a line: plain ratio through 0
+        return 0.0, sy / sx if sx else self.default_rates.get(device, self.default_rates["cpu"])
+
+    def predict(self, device: str, audio_seconds: float | None) -> float | None:
+        if audio_seconds is None:
+            return None
+        with self._lock:
+            intercept, rate = self._fit(device)
+        return max(MIN_INTERCEPT, intercept + rate * audio_seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            devices = set(self._sums) | set(self.default_rates)
+            result = {}
+            for device in sorted(devices):
+                intercept, rate = self._fit(device)
+                result[device] = {
+                    "samples": self._sums.get(device, [0])[0],
+                    "intercept": round(intercept, 3),
+                    "rate": round(rate, 4),
+                }
+        return result
@@ -0,0 +1,88 @@
+"""Change notifications for conversion task state.
+
+The SSE endpoints wait on TaskEvents instead of polling: every change to a
+task bumps a global sequence number, and a reader remembers the last number
+it saw and sleeps until a newer one arrives.
+"""
+import threading
+
+
+class TaskEvents:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        # task_id -> sequence number of its last change
+        self._changed: dict = {}
+
+    @property
+    def seq(self) -> int:
+        with self._cond:
+            return self._seq
+
+    def publish(self, task_id: str):
+        with self._cond:
+            self._seq += 1
+            self._changed[task_id] = self._seq
+            self._cond.notify_all()
+
+    def wait(self, since: int, timeout: float) -> int:
+        """Block until something changed after `since` or timeout expires.
+        Returns the current sequence number."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > since, timeout=timeout)
+            return self._seq
+
+    def changed_since(self, since: int) -> list[str]:
+        with self._cond:
+            return [task_id for task_id, seq in self._changed.items() if seq > since]
+
+    def forget(self, task_id: str):
+        with self._cond:
+            self._changed.pop(task_id, None)
+
+
+class ObservedTasks(dict):
+    """Task table whose item assignments publish a change for their key, so
+    every `conversion_tasks[task_id] = {...}` reaches the event streams.
+    With a store (see utils.job_store), assignments and removals are also
+    persisted."""
+
+    def __init__(self, events: TaskEvents, store=None):
+        super().__init__()
+        self.events = events
+        self.store = store
+        # Orders assignments against merge_if's check-then-write
+        self._lock = threading.RLock()
+
+    def _assign(self, key, value):
+        super().__setitem__(key, value)
+        if self.store is not None:
+            self.store.save_state(key, value)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._assign(key, value)
+        self.events.publish(key)
+
+    def merge_if(self, key, statuses, changes: dict) -> bool:
+        """Merge changes into the task's record only while its status is one
+        of statuses, atomically with respect to other assignments, so a
+        concurrent update (e.g. a cancellation) is never overwritten by a
+        stale copy. Returns whether the record was updated."""
+        with self._lock:
+            current = self.get(key)
+            if current is None or current.get("status") not in statuses:
+                return False
+            self._assign(key, {**current, **changes})
+        self.events.publish(key)
+        return True
+
+    def pop(self, key, *default):
+        with self._lock:
+            if self.store is not None and key in self:
+                self.store.delete(key)
+            return super().pop(key, *default)
+
+    def restore(self, key, value):
+        """Load a stored state without writing it back."""
+        super().__setitem__(key, value)
@@ -0,0 +1,198 @@
+"""Change notifications for a folder.
+
+FolderWatcher reports files created, modified, deleted or renamed in one
+folder (not recursive). It uses inotify through the optional inotify_simple
+package on Linux and otherwise polls: the folder is re-listed when its mtime
+moves (adds, deletes and renames all touch it) and, less often, regardless,
+to catch files rewritten in place. Events for the same file are coalesced
+until it has been quiet for `debounce` seconds, so a file being copied in
+is reported once, after the copy.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # optional; polling is used without it
+    INotify = None
+    inotify_flags = None
+
+logger = logging.getLogger(__name__)
+
+FolderEvent = collections.namedtuple("FolderEvent", "kind name old_name")
+
+
+def inotify_available() -> bool:
+    return INotify is not None
+
+
+class FolderWatcher:
+    def __init__(self, folder: str, on_events, suffixes=None, mode: str = "auto",
+                 debounce: float = 0.5, poll_interval: float = 2.0, full_scan_every: int = 15):
+        """on_events(list[FolderEvent]) is called from the watcher thread.
+        mode is "auto" (inotify when available), "inotify" or "poll"."""
+        self.folder = folder
+        self.on_events = on_events
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes) if suffixes else None
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.full_scan_every = max(1, full_scan_every)
+        self.backend = "inotify" if mode != "poll" and inotify_available() else "poll"
+        # name -> [kind, old_name, last event time]
+        self._pending: collections.OrderedDict = collections.OrderedDict()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        target = self._run_inotify if self.backend == "inotify" else self._run_poll
+        self._thread = threading.Thread(target=target, name=f"watch:{self.folder}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _wanted(self, name: str) -> bool:
+        return bool(name) and (self.suffixes is None or name.lower().endswith(self.suffixes))
+
+    def _note(self, kind: str, name: str, old_name: str | None = None):
+        if not self._wanted(name) and not (old_name and self._wanted(old_name)):
+            return
+        now = time.monotonic()
+        previous = self._pending.pop(name, None)
+        if previous is not None:
+            prev_kind, prev_old = previous[0], previous[1]
+            if prev_kind == "deleted" and kind in ("created", "modified"):
+                kind = "modified"
+            elif prev_kind in ("created", "renamed") and kind == "modified":
+                kind, old_name = prev_kind, prev_old
+        self._pending[name] = [kind, old_name, now]
+
+    def _flush(self, force: bool = False):
+        if not self._pending:
+            return
+        cutoff = time.monotonic() - self.debounce
+        ready = [name for name, (_kind, _old, seen) in self._pending.items() if force or seen <= cutoff]
+        if not ready:
+            return
+        events = []
+        for name in ready:
+            kind, old_name, _seen = self._pending.pop(name)
+            if kind == "renamed" and not self._wanted(name):
+                # Renamed away from a watched suffix: gone as far as we care
+                events.append(FolderEvent("deleted", old_name, None))
+            elif kind == "renamed" and not self._wanted(old_name or ""):
+                events.append(FolderEvent("created", name, None))
+            else:
+                events.append(FolderEvent(kind, name, old_name))
+        try:
+            self.on_events(events)
+        except Exception:
+            logger.exception("Folder watcher callback failed for %s", self.folder)
+
+    # inotify backend
+
+    def _run_inotify(self):
+        inotify = INotify()
+        mask = (
+            inotify_flags.CREATE | inotify_flags.CLOSE_WRITE | inotify_flags.DELETE
+            | inotify_flags.MOVED_FROM | inotify_flags.MOVED_TO
+        )
+        try:
+            inotify.add_watch(self.folder, mask)
+        except OSError as exc:
+            logger.warning("inotify unavailable for %s (%s), polling instead", self.folder, exc)
+            inotify.close()
+            self.backend = "poll"
+            self._run_poll()
+            return
+        # MOVED_FROM cookie -> (old name, time), paired with MOVED_TO
+        moves: dict = {}
+        try:
+            while not self._stop.is_set():
+                timeout_ms = int(self.debounce * 1000) if self._pending or moves else 1000
+                for event in inotify.read(timeout=timeout_ms):
+                    flags = event.mask
+                    if flags & inotify_flags.MOVED_FROM:
+                        moves[event.cookie] = (event.name, time.monotonic())
+                    elif flags & inotify_flags.MOVED_TO:
+                        old = moves.pop(event.cookie, None)
+                        if old is not None:
+                            self._note("renamed", event.name, old[0])
+                        else:
+                            self._note("created", event.name)
+                    elif flags & inotify_flags.DELETE:
+                        self._note("deleted", event.name)
+                    elif flags & inotify_flags.CREATE:
+                        self._note("created", event.name)
+                    elif flags & inotify_flags.CLOSE_WRITE:
+                        self._note("modified", event.name)
+                # A move out of the folder never gets its MOVED_TO
+                cutoff = time.monotonic() - self.debounce
+                for cookie, (name, seen) in list(moves.items()):
+                    if seen <= cutoff:
+                        del moves[cookie]
+                        self._note("deleted", name)
+                self._flush()
+        finally:
+            inotify.close()
+
+    # polling backend
+
+    def _scan(self) -> dict:
+        listing = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not self._wanted(entry.name):
+                    continue
+                try:
+                    if entry.is_file():
+                        # os.stat, not entry.stat: on Windows the latter
+                        # reports no inode
+                        st = os.stat(entry.path)
+                        listing[entry.name] = (st.st_ino, st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+        return listing
+
+    def _run_poll(self):
+        try:
+            folder_mtime = os.stat(self.folder).st_mtime_ns
+            listing = self._scan()
+        except OSError:
+            folder_mtime, listing = None, {}
+        ticks = 0
+        while not self._stop.wait(self.poll_interval):
+            ticks += 1
+            try:
+                current_mtime = os.stat(self.folder).st_mtime_ns
+                if current_mtime == folder_mtime and ticks % self.full_scan_every:
+                    self._flush()
+                    continue
+                current = self._scan()
+            except OSError:
+                continue
+            folder_mtime = current_mtime
+
+            removed = listing.keys() - current.keys()
+            added = current.keys() - listing.keys()
+            # A file that left and one that arrived with the same inode is a
+            # rename; inode 0 means the filesystem doesn't report one
+            by_inode = {listing[name][0]: name for name in removed if listing[name][0]}
+            for name in added:
+                old_name = by_inode.pop(current[name][0], None) if current[name][0] else None
+                if old_name is not None:
+                    removed.discard(old_name)
+                    self._note("renamed", name, old_name)
+                else:
+                    self._note("created", name)
+            for name in removed:
+                self._note("deleted", name)
+            for name in current.keys() & listing.keys():
+                if current[name] != listing[name]:
+                    self._note("modified", name)
+            listing = current
+            self._flush()
@@ -0,0 +1,158 @@
+"""Content hashing for library files, thumbnails and upload dedup.
+
+Files are hashed in fixed-size chunks read with readinto() into one
+preallocated buffer per thread, so hashing never holds a whole file in
+memory or allocates per chunk. The digest defaults to blake2b, which is
+faster than sha256 in CPython; CONTENT_HASH_ALGORITHM picks another one
+from hashlib. DigestIndex remembers digests by (inode, size, mtime_ns), so
+a file is hashed at most once per change, across restarts, and can be
+looked up by digest to find an existing copy of some content.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_ALGORITHM = os.environ.get("CONTENT_HASH_ALGORITHM", "blake2b").strip().lower() or "blake2b"
+
+_buffers = threading.local()
+
+
+def new_digest(algorithm: str = DEFAULT_ALGORITHM):
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=32)
+    return hashlib.new(algorithm)
+
+
+def bytes_digest(data: bytes, algorithm: str = DEFAULT_ALGORITHM) -> str:
+    digest = new_digest(algorithm)
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def file_digest(path: str, algorithm: str = DEFAULT_ALGORITHM) -> str:
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _buffers.buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    digest = new_digest(algorithm)
+    with open(path, "rb", buffering=0) as handle:
+        while True:
+            size = handle.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def file_signature(st: os.stat_result) -> tuple[int, int, int]:
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class DigestIndex:
+    """Persistent path -> digest map, valid while the file's (inode, size,
+    mtime_ns) signature is unchanged."""
+
+    def __init__(self, db_path: str, algorithm: str = DEFAULT_ALGORITHM):
+        self.algorithm = algorithm
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS digests (
+                path TEXT PRIMARY KEY,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                algorithm TEXT NOT NULL,
+                digest TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS digests_digest ON digests (digest);
+            """
+        )
+
+    def digest(self, path: str) -> str:
+        path = os.path.abspath(path)
+        signature = file_signature(os.stat(path))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT inode, size, mtime_ns, algorithm, digest FROM digests WHERE path = ?", (path,)
+            ).fetchone()
+        if row is not None and tuple(row[:3]) == signature and row[3] == self.algorithm:
+            return row[4]
+        digest = file_digest(path, self.algorithm)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO digests (path, inode, size, mtime_ns, algorithm, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, *signature, self.algorithm, digest),
+            )
+        return digest
+
+    def record(self, path: str, digest: str):
+        """Remember the digest of a file just written from known content."""
+        path = os.path.abspath(path)
+        signature = file_signature(os.stat(path))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO digests (path, inode, size, mtime_ns, algorithm, digest) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, *signature, self.algorithm, digest),
+            )
+
+    def find(self, digest: str, folder: str) -> str | None:
+        """Path of a file in folder with this digest, or None. Rows whose file
+        is gone or changed since it was hashed are dropped on the way."""
+        folder = os.path.abspath(folder)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, inode, size, mtime_ns FROM digests WHERE digest = ? AND algorithm = ?",
+                (digest, self.algorithm),
+            ).fetchall()
+        for path, *signature in rows:
+            if os.path.dirname(path) != folder:
+                continue
+            try:
+                if file_signature(os.stat(path)) == tuple(signature):
+                    return path
+            except OSError:
+                pass
+            self.forget(path)
+        return None
+
+    def index_folder(self, folder: str, suffixes: tuple[str, ...]) -> int:
+        """Hash the files in folder ending in one of suffixes that the index
+        doesn't know yet, and drop rows for files no longer there. Returns
+        the number of files indexed."""
+        folder = os.path.abspath(folder)
+        present = set()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(suffixes) and entry.is_file():
+                        present.add(entry.path)
+        except OSError:
+            return 0
+        for path in present:
+            try:
+                self.digest(path)
+            except OSError:
+                continue
+        prefix = os.path.join(folder, "")
+        with self._lock:
+            known = [
+                row[0] for row in self._conn.execute(
+                    "SELECT path FROM digests WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+                )
+            ]
+        for path in known:
+            if path not in present and os.path.dirname(path) == folder and path.lower().endswith(suffixes):
+                self.forget(path)
+        return len(present)
+
+    def forget(self, path: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM digests WHERE path = ?", (os.path.abspath(path),))
@@ -0,0 +1,237 @@
+"""Conversion history in SQLite.
+
+history.json was read and rewritten in full for every append and delete.
+Here an append is one INSERT, entries are deleted by their row id, and the
+retention limits trim the oldest rows through the primary key and the
+timestamp index. Entries keep their original JSON shape, plus an "id".
+
+Reads are served from an in-memory copy that writers replace as a whole
+(version, entries) tuple under the lock, so readers take a consistent
+snapshot without locking. The version number changes with every write and
+doubles as an ETag.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class HistoryStore:
+    def __init__(self, db_path: str, max_items: int = 0, max_age_days: float = 0):
+        self.max_items = max_items
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                type TEXT,
+                library TEXT,
+                midi_name TEXT,
+                title TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp);
+            CREATE INDEX IF NOT EXISTS history_midi_name ON history (midi_name);
+            CREATE INDEX IF NOT EXISTS history_type_id ON history (type, id);
+            CREATE INDEX IF NOT EXISTS history_library_id ON history (library, id);
+            """
+        )
+        self._snapshot: tuple[int, tuple] = (0, ())
+        with self._lock:
+            self._reload()
+
+    def _reload(self):
+        rows = self._conn.execute("SELECT id, data FROM history ORDER BY id DESC").fetchall()
+        self._publish(tuple(self._decode(row) for row in rows))
+
+    def _publish(self, entries: tuple):
+        self._snapshot = (self._snapshot[0] + 1, entries)
+
+    def _retained(self, entries: tuple) -> tuple:
+        if self.max_age_days > 0:
+            cutoff = time.time() - self.max_age_days * 86400
+            entries = tuple(entry for entry in entries if (entry.get("timestamp") or 0) >= cutoff)
+        if self.max_items > 0:
+            entries = entries[:self.max_items]
+        return entries
+
+    @property
+    def version(self) -> int:
+        return self._snapshot[0]
+
+    def snapshot(self) -> tuple[int, tuple]:
+        """(version, entries newest first). The entries are shared: treat
+        them as read-only."""
+        return self._snapshot
+
+    def _insert(self, entry: dict) -> int:
+        entry = {key: value for key, value in entry.items() if key != "id"}
+        cursor = self._conn.execute(
+            "INSERT INTO history (timestamp, type, library, midi_name, title, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                float(entry.get("timestamp") or time.time()),
+                entry.get("type"),
+                entry.get("library"),
+                entry.get("midi_name"),
+                entry.get("video_title") or entry.get("midi_name"),
+                json.dumps(entry, ensure_ascii=False, default=str),
+            ),
+        )
+        return cursor.lastrowid
+
+    def _apply_retention(self):
+        if self.max_items > 0:
+            self._conn.execute(
+                "DELETE FROM history WHERE id <= "
+                "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.max_items,),
+            )
+        if self.max_age_days > 0:
+            cutoff = time.time() - self.max_age_days * 86400
+            self._conn.execute("DELETE FROM history WHERE timestamp < ?", (cutoff,))
+
+    def append(self, entry: dict) -> dict:
+        """Store an entry and return it with its id."""
+        with self._lock:
+            entry_id = self._insert(entry)
+            self._apply_retention()
+            stored = {**entry, "id": entry_id}
+            self._publish(self._retained((stored,) + self._snapshot[1]))
+        return stored
+
+    def entries(self, limit: int | None = None) -> list[dict]:
+        """Newest first."""
+        entries = self._snapshot[1]
+        return list(entries[:limit] if limit else entries)
+
+    def find_by_midi(self, midi_name: str) -> dict | None:
+        """Newest entry that produced midi_name."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, data FROM history WHERE midi_name = ? ORDER BY id DESC LIMIT 1",
+                (midi_name,),
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def page(self, limit: int, before_id: int | None = None, types=None, libraries=None,
+             since: float | None = None, until: float | None = None,
+             title: str | None = None) -> tuple[list[dict], int | None]:
+        """One page of entries, newest first, that match every given filter.
+        Pages are keyed by id: pass the returned cursor as before_id to get
+        the next one (None when there is no more). The id, type/library and
+        timestamp indexes keep the cost proportional to the page; a title
+        search scans rows in id order until the page is full."""
+        clauses, params = [], []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if types:
+            clauses.append(f"type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+        if libraries:
+            clauses.append(f"library IN ({', '.join('?' * len(libraries))})")
+            params.extend(libraries)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if title:
+            escaped = title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("title LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        query = "SELECT id, data FROM history"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        items = [self._decode(row) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit and items else None
+        return items, next_cursor
+
+    def update(self, entry_id: int, fields: dict) -> dict | None:
+        """Merge fields into a stored entry; returns the updated entry, or
+        None when it no longer exists."""
+        with self._lock:
+            row = self._conn.execute("SELECT id, data FROM history WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return None
+            entry = {**self._decode(row), **fields, "id": entry_id}
+            data = {key: value for key, value in entry.items() if key != "id"}
+            self._conn.execute(
+                "UPDATE history SET title = ?, data = ? WHERE id = ?",
+                (
+                    data.get("video_title") or data.get("midi_name"),
+                    json.dumps(data, ensure_ascii=False, default=str),
+                    entry_id,
+                ),
+            )
+            self._publish(tuple(entry if item["id"] == entry_id else item for item in self._snapshot[1]))
+        return entry
+
+    def delete(self, entry_id: int) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM history WHERE id = ?", (entry_id,))
+            if cursor.rowcount:
+                self._publish(tuple(entry for entry in self._snapshot[1] if entry["id"] != entry_id))
+        return cursor.rowcount > 0
+
+    def delete_by_timestamp(self, timestamp: float) -> bool:
+        """For clients that still identify entries by their timestamp."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM history WHERE timestamp BETWEEN ? AND ?",
+                (timestamp - 0.001, timestamp + 0.001),
+            )
+            if cursor.rowcount:
+                self._reload()
+        return cursor.rowcount > 0
+
+    def import_json(self, json_path: str) -> int:
+        """One-time migration: load a legacy history.json into an empty
+        store and rename the file so it is not imported again."""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(data, list):
+            data = []
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM history LIMIT 1").fetchone() is None:
+                self._conn.execute("BEGIN")
+                try:
+                    for entry in data:
+                        if isinstance(entry, dict):
+                            self._insert(entry)
+                    self._apply_retention()
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                self._reload()
+            else:
+                data = []
+        os.replace(json_path, json_path + ".migrated")
+        return len(data)
+
+    @staticmethod
+    def _decode(row) -> dict:
+        entry_id, data = row
+        try:
+            entry = json.loads(data)
+        except ValueError:
+            entry = {}
+        entry["id"] = entry_id
+        return entry
@@ -0,0 +1,91 @@
+import threading
+
+
+class InflightRegistry:
+    """Coalesces identical conversions that are queued or running.
+
+    The first task submitted for a key (a media id or an upload digest) does
+    the work; later tasks for the same key become subscribers whose ids
+    resolve to it. Every subscriber, including the first task, holds one
+    reference, and the work is only worth cancelling once all of them have
+    let go.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leaders: dict = {}
+        self._keys: dict = {}
+        self._subscribers: dict = {}
+        self._aliases: dict = {}
+        self._detached: set = set()
+
+    def attach(self, key: str, task_id: str, is_active) -> str | None:
+        """Register task_id for key.
+
+        Returns the task already working on key if is_active(leader) says it
+        is still queued or running; task_id then subscribes to it. Returns
+        None when task_id becomes the one doing the work.
+        """
+        with self._lock:
+            leader = self._leaders.get(key)
+            if leader is not None and leader in self._subscribers and is_active(leader):
+                self._subscribers[leader].add(task_id)
+                self._aliases[task_id] = leader
+                return leader
+            self._leaders[key] = task_id
+            self._keys[task_id] = key
+            self._subscribers[task_id] = {task_id}
+            return None
+
+    def resolve(self, task_id: str) -> str:
+        """The task whose state task_id reports; itself once detached."""
+        with self._lock:
+            if task_id in self._detached:
+                return task_id
+            return self._aliases.get(task_id, task_id)
+
+    def is_detached(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._detached
+
+    def detach(self, task_id: str) -> tuple[str, int]:
+        """Drop task_id's reference. Returns (leader, references left)."""
+        with self._lock:
+            leader = self._aliases.get(task_id, task_id)
+            subscribers = self._subscribers.get(leader)
+            if subscribers is None or task_id not in subscribers:
+                return leader, 0
+            subscribers.discard(task_id)
+            self._detached.add(task_id)
+            if not subscribers:
+                self._release(leader)
+            return leader, len(subscribers)
+
+    def finish(self, leader: str) -> list[str]:
+        """The leader reached a final state: new requests start fresh work.
+        Subscribers keep resolving to it so they can read its result.
+        Returns the subscribers that were still waiting for it."""
+        with self._lock:
+            waiting = self._subscribers.get(leader, set()) - {leader}
+            self._release(leader)
+            return sorted(waiting)
+
+    def forget(self, task_id: str) -> list[str]:
+        """Drop all bookkeeping for a task that is being pruned. Returns the
+        subscribers that resolved to it: they have nothing left to report
+        and should be pruned along with it."""
+        with self._lock:
+            self._release(task_id)
+            self._aliases.pop(task_id, None)
+            self._detached.discard(task_id)
+            orphans = [sub for sub, leader in self._aliases.items() if leader == task_id]
+            for sub in orphans:
+                del self._aliases[sub]
+                self._detached.discard(sub)
+            return orphans
+
+    def _release(self, leader: str):
+        key = self._keys.pop(leader, None)
+        if key is not None and self._leaders.get(key) == leader:
+            del self._leaders[key]
+        self._subscribers.pop(leader, None)
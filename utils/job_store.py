@@ -0,0 +1,189 @@
+"""Durable record of conversion tasks.
+
+conversion_tasks and task_results stay in memory for the hot path, but every
+change is also written to a SQLite table so a restart keeps finished results
+pollable and can pick queued or interrupted jobs back up. The inputs a job
+needs to run again (URL or upload path, device, options) are stored with it.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+ACTIVE_STATUSES = ("queued", "processing")
+FINAL_STATUSES = ("completed", "error", "cancelled")
+
+
+class JobStore:
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                task_id TEXT PRIMARY KEY,
+                kind TEXT,
+                inputs TEXT,
+                status TEXT NOT NULL,
+                stage TEXT,
+                state TEXT NOT NULL,
+                result TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                started REAL,
+                finished REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created);
+            CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+            CREATE TABLE IF NOT EXISTS pending_thumbnails (
+                task_id TEXT PRIMARY KEY,
+                fetch TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            """
+        )
+
+    def save_state(self, task_id: str, state: dict):
+        """Upsert the task's current conversion_tasks record."""
+        now = time.time()
+        status = state.get("status") or "processing"
+        payload = json.dumps(state, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (task_id, status, stage, state, created, updated, started, finished)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (task_id) DO UPDATE SET
+                    status = excluded.status,
+                    stage = excluded.stage,
+                    state = excluded.state,
+                    updated = excluded.updated,
+                    started = COALESCE(jobs.started, excluded.started),
+                    finished = excluded.finished
+                """,
+                (
+                    task_id, status, state.get("stage"), payload, now, now,
+                    now if status == "processing" else None,
+                    now if status in FINAL_STATUSES else None,
+                ),
+            )
+
+    def set_inputs(self, task_id: str, kind: str, inputs: dict):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET kind = ?, inputs = ? WHERE task_id = ?",
+                (kind, json.dumps(inputs, ensure_ascii=False, default=str), task_id),
+            )
+
+    def save_result(self, task_id: str, result: dict):
+        # Results are usually stored just before the task is marked completed,
+        # sometimes before it has any state at all (media cache hits)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (task_id, status, state, result, created, updated)
+                VALUES (?, 'processing', '{}', ?, ?, ?)
+                ON CONFLICT (task_id) DO UPDATE SET
+                    result = excluded.result,
+                    updated = excluded.updated
+                """,
+                (task_id, json.dumps(result, ensure_ascii=False, default=str), now, now),
+            )
+
+    def get(self, task_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT task_id, kind, inputs, state, result, created FROM jobs WHERE task_id = ?",
+                (task_id,),
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def active(self) -> list[dict]:
+        """Jobs that were queued or running, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, kind, inputs, state, result, created FROM jobs "
+                "WHERE status IN (?, ?) ORDER BY created",
+                ACTIVE_STATUSES,
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def delete(self, task_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE task_id = ?", (task_id,))
+
+    def prune(self, max_keep: int) -> int:
+        """Drop all but the max_keep most recently finished jobs."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE finished IS NOT NULL AND task_id NOT IN "
+                "(SELECT task_id FROM jobs WHERE finished IS NOT NULL ORDER BY finished DESC LIMIT ?)",
+                (max_keep,),
+            )
+            return cursor.rowcount
+
+    def add_pending_thumbnail(self, task_id: str, fetch: dict):
+        """Remember a thumbnail fetch still to be done for a finished task,
+        so it can be retried after a restart."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending_thumbnails (task_id, fetch, created) VALUES (?, ?, ?)",
+                (task_id, json.dumps(fetch, ensure_ascii=False, default=str), time.time()),
+            )
+
+    def pending_thumbnails(self) -> list[tuple[str, dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, fetch FROM pending_thumbnails ORDER BY created"
+            ).fetchall()
+        pending = []
+        for task_id, fetch in rows:
+            try:
+                pending.append((task_id, json.loads(fetch)))
+            except ValueError:
+                self.finish_pending_thumbnail(task_id)
+        return pending
+
+    def finish_pending_thumbnail(self, task_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM pending_thumbnails WHERE task_id = ?", (task_id,))
+
+    @staticmethod
+    def _row(row) -> dict:
+        task_id, kind, inputs, state, result, created = row
+
+        def _load(value):
+            if value is None:
+                return None
+            try:
+                return json.loads(value)
+            except ValueError:
+                return None
+
+        return {
+            "task_id": task_id,
+            "kind": kind,
+            "inputs": _load(inputs) or {},
+            "state": _load(state) or {},
+            "result": _load(result),
+            "created": created,
+        }
+
+
+class StoredResults(dict):
+    """task_results whose assignments are written to the job store."""
+
+    def __init__(self, store: JobStore):
+        super().__init__()
+        self.store = store
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.store.save_result(key, value)
+
+    def restore(self, key, value):
+        """Load a stored result without writing it back."""
+        super().__setitem__(key, value)
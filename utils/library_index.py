@@ -0,0 +1,291 @@
+"""Persistent index of the MIDI library in the converted folder.
+
+/api/midi-files used to list the folder, stat and hash every file and join
+the whole history on each request. The index keeps one row per MIDI with its
+size, mtime, content hash, duration, note count and the history metadata
+(title, thumbnail, source) it was converted from. Files are (re)analysed
+only when their inode, size or mtime changed. The folder is listed again
+only when its own mtime moves, which is what adding, deleting or renaming a
+file does; otherwise the indexed files are just re-stat'ed, which catches a
+file rewritten in place without reading the folder or any file.
+
+Every insert, update and removal is also appended to a change log, so
+clients holding a change token can fetch only what changed since.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.hashing import DEFAULT_ALGORITHM, file_digest, file_signature
+
+MIDI_EXTENSIONS = (".mid", ".midi")
+# Change log rows kept; clients with an older token reload everything
+MAX_CHANGES = 2000
+
+
+def _midi_stats(path: str) -> tuple[float | None, int | None]:
+    """(duration in seconds, note count), or Nones for unreadable files."""
+    try:
+        import pretty_midi
+
+        midi = pretty_midi.PrettyMIDI(path)
+        return round(midi.get_end_time(), 3), sum(len(inst.notes) for inst in midi.instruments)
+    except Exception:
+        return None, None
+
+
+class LibraryIndex:
+    def __init__(self, db_path: str, folder: str, metadata_for=None, hash_algorithm: str = DEFAULT_ALGORITHM):
+        """metadata_for(filename) returns the history metadata to join for a
+        file the index discovers on its own, or None."""
+        self.folder = folder
+        self.metadata_for = metadata_for
+        self.hash_algorithm = hash_algorithm
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._folder_mtime_ns = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS midi_files (
+                filename TEXT PRIMARY KEY,
+                inode INTEGER,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                duration REAL,
+                note_count INTEGER,
+                metadata TEXT,
+                indexed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS midi_files_mtime ON midi_files (mtime);
+            CREATE INDEX IF NOT EXISTS midi_files_hash ON midi_files (content_hash);
+            CREATE TABLE IF NOT EXISTS midi_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL,
+                change TEXT NOT NULL
+            );
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(midi_files)")}
+        if "hash_algorithm" not in columns:
+            self._conn.execute("ALTER TABLE midi_files ADD COLUMN hash_algorithm TEXT")
+        # Hashes from another algorithm don't compare: make the next
+        # reconcile treat those files as changed
+        self._conn.execute(
+            "UPDATE midi_files SET mtime_ns = -1 WHERE hash_algorithm IS NOT ?", (hash_algorithm,)
+        )
+
+    def _record(self, filename: str, change: str):
+        """Append to the change log; called with the lock held."""
+        cursor = self._conn.execute(
+            "INSERT INTO midi_changes (filename, change) VALUES (?, ?)", (filename, change)
+        )
+        if cursor.lastrowid % 100 == 0:
+            self._conn.execute("DELETE FROM midi_changes WHERE seq <= ?", (cursor.lastrowid - MAX_CHANGES,))
+
+    def _known(self, filename: str):
+        return self._conn.execute(
+            "SELECT inode, size, mtime_ns, content_hash, duration, note_count, metadata, hash_algorithm "
+            "FROM midi_files WHERE filename = ?",
+            (filename,),
+        ).fetchone()
+
+    def refresh_file(self, filename: str, metadata: dict | None = None) -> bool:
+        """Index or re-index one file. metadata replaces the joined history
+        metadata when given. Returns False when the file is gone."""
+        path = os.path.join(self.folder, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.remove(filename)
+            return False
+        if not filename.lower().endswith(MIDI_EXTENSIONS):
+            return False
+
+        with self._lock:
+            known = self._known(filename)
+        if known and known[:3] == file_signature(st) and known[7] == self.hash_algorithm:
+            content_hash, duration, note_count, stored_metadata = known[3:7]
+        else:
+            content_hash = file_digest(path, self.hash_algorithm)
+            duration, note_count = _midi_stats(path)
+            stored_metadata = known[6] if known else None
+        if metadata is None and stored_metadata is None and self.metadata_for is not None:
+            metadata = self.metadata_for(filename)
+        if metadata is not None:
+            stored_metadata = json.dumps(metadata, ensure_ascii=False, default=str)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO midi_files (filename, inode, size, mtime, mtime_ns, content_hash, "
+                "duration, note_count, metadata, indexed, hash_algorithm) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    filename, st.st_ino, st.st_size, st.st_mtime, st.st_mtime_ns, content_hash,
+                    duration, note_count, stored_metadata, time.time(), self.hash_algorithm,
+                ),
+            )
+            self._record(filename, "upsert")
+        return True
+
+    def remove(self, filename: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM midi_files WHERE filename = ?", (filename,)
+            ).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM midi_files WHERE filename = ?", (filename,))
+            self._record(filename, "delete")
+            # A copy with the same content hidden by the listing's dedup
+            # takes the removed file's place
+            twin = self._conn.execute(
+                "SELECT filename FROM midi_files WHERE content_hash = ? ORDER BY mtime DESC LIMIT 1",
+                (row[0],),
+            ).fetchone()
+            if twin is not None:
+                self._record(twin[0], "upsert")
+
+    def rename(self, old_name: str, new_name: str):
+        """Move a file's row to its new name, keeping its history metadata."""
+        with self._lock:
+            known = self._known(old_name)
+        metadata = None
+        if known and known[6]:
+            try:
+                metadata = json.loads(known[6])
+            except ValueError:
+                metadata = None
+        self.remove(old_name)
+        self.refresh_file(new_name, metadata)
+
+    def change_token(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(seq) FROM midi_changes").fetchone()
+        return row[0] or 0
+
+    def changes_since(self, token: int) -> tuple[int, list[tuple[str, str]] | None]:
+        """(current token, [(filename, "upsert"|"delete")] with the last change
+        per file). The list is None when the token is older than the log, and
+        the caller has to reload the full listing."""
+        with self._lock:
+            oldest = self._conn.execute("SELECT MIN(seq), MAX(seq) FROM midi_changes").fetchone()
+            rows = self._conn.execute(
+                "SELECT seq, filename, change FROM midi_changes WHERE seq > ? ORDER BY seq", (token,)
+            ).fetchall()
+        first, latest = oldest[0] or 0, oldest[1] or 0
+        if token > latest or (first and token < first - 1):
+            return latest, None
+        last_change = {}
+        for _seq, filename, change in rows:
+            last_change.pop(filename, None)
+            last_change[filename] = change
+        return latest, list(last_change.items())
+
+    def reconcile(self) -> dict:
+        """Bring the index in line with the folder: new and changed files
+        are analysed, rows for vanished files dropped."""
+        with self._reconcile_lock:
+            try:
+                folder_mtime_ns = os.stat(self.folder).st_mtime_ns
+                on_disk = {}
+                with os.scandir(self.folder) as entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith(MIDI_EXTENSIONS) and entry.is_file():
+                            # os.stat, not entry.stat: on Windows the latter
+                            # reports no inode
+                            on_disk[entry.name] = file_signature(os.stat(entry.path))
+            except OSError:
+                return {"added": 0, "updated": 0, "removed": 0}
+
+            with self._lock:
+                indexed = {
+                    row[0]: tuple(row[1:])
+                    for row in self._conn.execute("SELECT filename, inode, size, mtime_ns FROM midi_files")
+                }
+            counts = {"added": 0, "updated": 0, "removed": 0}
+            for filename in indexed.keys() - on_disk.keys():
+                self.remove(filename)
+                counts["removed"] += 1
+            for filename, signature in on_disk.items():
+                if indexed.get(filename) == signature:
+                    continue
+                try:
+                    if self.refresh_file(filename):
+                        counts["added" if filename not in indexed else "updated"] += 1
+                except OSError:
+                    continue
+            self._folder_mtime_ns = folder_mtime_ns
+            return counts
+
+    def reconcile_if_changed(self):
+        """Reconcile when the folder's mtime moved since the last pass.
+        Otherwise nothing was added, removed or renamed, and a stat of each
+        indexed file is enough to find the ones rewritten in place."""
+        try:
+            folder_mtime_ns = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return
+        if folder_mtime_ns != self._folder_mtime_ns:
+            self.reconcile()
+            return
+        with self._lock:
+            indexed = self._conn.execute("SELECT filename, inode, size, mtime_ns FROM midi_files").fetchall()
+        for filename, *signature in indexed:
+            try:
+                if file_signature(os.stat(os.path.join(self.folder, filename))) == tuple(signature):
+                    continue
+            except OSError:
+                pass
+            try:
+                self.refresh_file(filename)
+            except OSError:
+                continue
+
+    def files(self) -> list[dict]:
+        """Indexed MIDI files newest first, one per content hash (the
+        newest copy)."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM midi_files ORDER BY mtime DESC"
+            ).fetchall()
+        result = []
+        seen = set()
+        for row in rows:
+            if row[3] in seen:
+                continue
+            seen.add(row[3])
+            result.append(self._item(row))
+        return result
+
+    def file(self, filename: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self._COLUMNS} FROM midi_files WHERE filename = ?", (filename,)
+            ).fetchone()
+        return self._item(row) if row else None
+
+    _COLUMNS = "filename, size, mtime, content_hash, duration, note_count, metadata"
+
+    @staticmethod
+    def _item(row) -> dict:
+        filename, size, mtime, content_hash, duration, note_count, metadata = row
+        try:
+            metadata = json.loads(metadata) if metadata else {}
+        except ValueError:
+            metadata = {}
+        return {
+            "filename": filename,
+            "file_size": size,
+            "modified_time": mtime,
+            "content_hash": content_hash,
+            "duration": duration,
+            "note_count": note_count,
+            "metadata": metadata,
+        }
@@ -0,0 +1,186 @@
+"""Chunked transcription of long recordings.
+
+A single Transkun run over an hour of audio keeps a couple of cores busy for
+a long time. For long inputs the decoded WAV is split into overlapping
+windows that are transcribed in parallel, and the per-window MIDI files are
+stitched back into one: each window owns the notes whose onset falls between
+the midpoints of its overlaps with its neighbours, and notes that both sides
+of a seam picked up are merged.
+"""
+import os
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import pretty_midi
+
+# Same pitch, onsets closer than this across a seam: one note seen twice
+SEAM_ONSET_TOLERANCE = 0.05
+
+
+def wav_duration(wav_path: str) -> float:
+    with wave.open(wav_path, "rb") as handle:
+        return handle.getnframes() / float(handle.getframerate())
+
+
+def plan_windows(duration: float, window: float, overlap: float) -> list[tuple[float, float, float, float]]:
+    """Split [0, duration) into windows of `window` seconds overlapping by
+    `overlap`. Returns (start, end, own_start, own_end) per window, where the
+    owned ranges tile the whole recording without gaps."""
+    overlap = max(0.0, min(overlap, window / 2))
+    step = window - overlap
+    starts = []
+    start = 0.0
+    while True:
+        starts.append(start)
+        if start + window >= duration:
+            break
+        start += step
+
+    windows = []
+    for index, start in enumerate(starts):
+        end = min(start + window, duration)
+        own_start = 0.0 if index == 0 else start + overlap / 2
+        own_end = duration if index == len(starts) - 1 else starts[index + 1] + overlap / 2
+        windows.append((start, end, own_start, own_end))
+    return windows
+
+
+def split_wav(wav_path: str, out_dir: str, windows, prefix: str = "chunk") -> list[str]:
+    """Write one WAV per window, reading the source sequentially once."""
+    paths = []
+    with wave.open(wav_path, "rb") as src:
+        rate = src.getframerate()
+        params = src.getparams()
+        for index, (start, end, _own_start, _own_end) in enumerate(windows):
+            first = int(round(start * rate))
+            count = int(round(end * rate)) - first
+            src.setpos(first)
+            frames = src.readframes(count)
+            path = os.path.join(out_dir, f"{prefix}_{index:04d}.wav")
+            with wave.open(path, "wb") as dst:
+                dst.setparams(params)
+                dst.writeframes(frames)
+            paths.append(path)
+    return paths
+
+
+def stitch_midis(chunk_paths: list[str], windows, output_path: str):
+    """Shift each chunk to its window start, keep the notes it owns, merge
+    duplicates across seams and write a single MIDI."""
+    merged: dict = {}
+    # Notes a window sees sounding from its very first frame: usually a key
+    # held across the seam, which the previous window cut off at its end.
+    carried: dict = {}
+    for path, (start, _end, own_start, own_end) in zip(chunk_paths, windows):
+        midi = pretty_midi.PrettyMIDI(path)
+        for inst in midi.instruments:
+            key = (inst.program, inst.is_drum, inst.name)
+            target = merged.get(key)
+            if target is None:
+                target = merged[key] = pretty_midi.Instrument(inst.program, is_drum=inst.is_drum, name=inst.name)
+            for note in inst.notes:
+                onset = note.start + start
+                shifted = pretty_midi.Note(note.velocity, note.pitch, onset, note.end + start)
+                if own_start <= onset < own_end:
+                    target.notes.append(shifted)
+                elif start > 0 and note.start <= SEAM_ONSET_TOLERANCE:
+                    carried.setdefault(key, []).append(shifted)
+            for cc in inst.control_changes:
+                time = cc.time + start
+                if own_start <= time < own_end:
+                    target.control_changes.append(pretty_midi.ControlChange(cc.number, cc.value, time))
+
+    out = pretty_midi.PrettyMIDI()
+    for key, inst in merged.items():
+        _extend_held_notes(inst.notes, carried.get(key, []))
+        inst.notes = _merge_seam_duplicates(inst.notes)
+        inst.control_changes.sort(key=lambda cc: cc.time)
+        out.instruments.append(inst)
+    out.write(output_path)
+
+
+def _extend_held_notes(notes: list, carried: list):
+    """Lengthen notes that a window cut off with the same pitch still
+    sounding at the start of the next one."""
+    if not carried:
+        return
+    by_pitch: dict = {}
+    for note in notes:
+        by_pitch.setdefault(note.pitch, []).append(note)
+    for cont in carried:
+        for note in by_pitch.get(cont.pitch, ()):
+            if note.start <= cont.start and note.end >= cont.start - SEAM_ONSET_TOLERANCE:
+                note.end = max(note.end, cont.end)
+
+
+def _merge_seam_duplicates(notes: list) -> list:
+    notes.sort(key=lambda n: (n.pitch, n.start))
+    result = []
+    for note in notes:
+        prev = result[-1] if result else None
+        if prev is not None and prev.pitch == note.pitch:
+            if note.start - prev.start <= SEAM_ONSET_TOLERANCE:
+                prev.end = max(prev.end, note.end)
+                prev.velocity = max(prev.velocity, note.velocity)
+                continue
+            if prev.end > note.start:
+                # A key cannot sound twice: end the held note at the re-strike
+                prev.end = note.start
+        result.append(note)
+    result.sort(key=lambda n: (n.start, n.pitch))
+    return result
+
+
+class ProcessGroup:
+    """Looks like one Popen to task_processes, so /api/stop can kill every
+    worker a chunked transcription is using at once."""
+
+    def __init__(self):
+        self._procs = []
+        self._lock = threading.Lock()
+        self.killed = False
+
+    def add(self, proc):
+        with self._lock:
+            self._procs.append(proc)
+            killed = self.killed
+        if killed:
+            proc.kill()
+
+    def poll(self):
+        with self._lock:
+            procs = list(self._procs)
+        if self.killed:
+            return -9
+        if not procs or any(proc.poll() is None for proc in procs):
+            return None
+        return 0
+
+    def kill(self):
+        with self._lock:
+            self.killed = True
+            procs = list(self._procs)
+        for proc in procs:
+            if proc.poll() is None:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+
+
+def transcribe_chunks(chunk_paths: list[str], transcribe_one, workers: int) -> list[str]:
+    """Run transcribe_one(in_path, out_path) for every chunk on `workers`
+    threads. Returns the MIDI paths in chunk order."""
+    midi_paths = [os.path.splitext(path)[0] + ".mid" for path in chunk_paths]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(transcribe_one, src, dst) for src, dst in zip(chunk_paths, midi_paths)]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # Don't start the remaining windows once one has failed
+            for future in futures:
+                future.cancel()
+            raise
+    return midi_paths
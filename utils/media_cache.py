@@ -0,0 +1,72 @@
+"""Lookup of finished conversions by (source, media id).
+
+A YouTube video id, TikTok video id, Discord attachment path or MuseScore
+score id maps to the MIDI produced for it last time, so resubmitting the same
+media completes without a download or a transcription.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+
+class MediaResultCache:
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                source TEXT NOT NULL,
+                media_id TEXT NOT NULL,
+                midi_name TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (source, media_id)
+            );
+            CREATE INDEX IF NOT EXISTS results_midi_name ON results (midi_name);
+            """
+        )
+
+    def lookup(self, source: str, media_ids, midi_exists) -> dict | None:
+        """Return the stored metadata for the first known id whose MIDI still
+        exists; entries pointing at deleted files are dropped on the way."""
+        for media_id in media_ids:
+            if not media_id:
+                continue
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT midi_name, metadata FROM results WHERE source = ? AND media_id = ?",
+                    (source, media_id),
+                ).fetchone()
+            if row is None:
+                continue
+            midi_name, metadata = row
+            if not midi_exists(midi_name):
+                self.invalidate_midi(midi_name)
+                continue
+            try:
+                return json.loads(metadata)
+            except ValueError:
+                continue
+        return None
+
+    def store(self, source: str, media_ids, midi_name: str, metadata: dict):
+        payload = json.dumps(metadata, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            for media_id in dict.fromkeys(media_ids):
+                if not media_id:
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (source, media_id, midi_name, metadata, created) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (source, media_id, midi_name, payload, now),
+                )
+
+    def invalidate_midi(self, midi_name: str) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM results WHERE midi_name = ?", (midi_name,))
+            return cursor.rowcount
@@ -0,0 +1,59 @@
+"""Parsing of tool output into numeric task progress.
+
+Each conversion stage covers a fixed span of the overall percentage, and
+the tools running a stage report how far into it they are: yt-dlp through
+its progress hook, ffmpeg through `-progress pipe:1`, Transkun through any
+tqdm-style percentage it prints (and chunked mode per finished window).
+"""
+import re
+
+# Overall percent covered by each stage, in pipeline order
+STAGE_SPANS = {
+    "download": (0.0, 20.0),
+    "decode": (20.0, 30.0),
+    "transcribe": (30.0, 99.0),
+}
+
+_TQDM_PERCENT = re.compile(r"(\d{1,3})%\|")
+
+
+def overall_percent(stage: str, fraction: float) -> float:
+    start, end = STAGE_SPANS[stage]
+    return start + (end - start) * min(1.0, max(0.0, fraction))
+
+
+def parse_percent_line(line: str) -> float | None:
+    """Fraction done from a tqdm-style progress line, e.g. ' 42%|####  |'."""
+    match = _TQDM_PERCENT.search(line)
+    if not match:
+        return None
+    return min(100, int(match.group(1))) / 100.0
+
+
+class FfmpegProgress:
+    """Feeds `ffmpeg -progress pipe:1` key=value lines and calls
+    on_progress(fraction, speed) with speed as a realtime factor."""
+
+    def __init__(self, duration: float | None, on_progress):
+        self.duration = duration
+        self.on_progress = on_progress
+        self._speed = None
+
+    def feed(self, line: str):
+        key, _, value = line.strip().partition("=")
+        if key == "speed":
+            try:
+                self._speed = float(value.rstrip("x"))
+            except ValueError:
+                self._speed = None
+        elif key == "out_time_us" or key == "out_time_ms":
+            # Both are microseconds (out_time_ms is misnamed by ffmpeg)
+            if not self.duration:
+                return
+            try:
+                seconds = int(value) / 1_000_000
+            except ValueError:
+                return
+            self.on_progress(min(1.0, seconds / self.duration), self._speed)
+        elif key == "progress" and value == "end":
+            self.on_progress(1.0, self._speed)
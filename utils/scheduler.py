@@ -0,0 +1,209 @@
+import collections
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when a pool already holds as many waiting jobs as it accepts."""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"Conversion queue '{pool}' is full")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """A fixed number of worker threads draining one FIFO queue.
+
+    Jobs are plain callables; the pool only tracks which job ids are waiting
+    and which are running so callers can report a queue position.
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self._queue = collections.deque()
+        self._running: dict = {}
+        self._cond = threading.Condition()
+        self._threads: list = []
+        # Exponential moving average of job duration, used for Retry-After
+        self._avg_duration: float | None = None
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"{self.name}-worker-{index + 1}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job_id: str, fn, *args):
+        with self._cond:
+            self._ensure_started()
+            self._queue.append((job_id, fn, args))
+            self._cond.notify()
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that has not started yet. Returns True if it was queued."""
+        with self._cond:
+            for item in self._queue:
+                if item[0] == job_id:
+                    self._queue.remove(item)
+                    return True
+        return False
+
+    def position(self, job_id: str) -> int | None:
+        """1-based position among waiting jobs, 0 while running, None if unknown."""
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            for index, item in enumerate(self._queue):
+                if item[0] == job_id:
+                    return index + 1
+        return None
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queue)
+
+    def estimated_wait(self, position: int | None = None) -> float:
+        """Rough seconds until a newly queued job would start, or the job
+        currently waiting at `position` (1-based) when given."""
+        with self._cond:
+            ahead = len(self._queue) if position is None else max(0, position - 1)
+            waiting = ahead + len(self._running)
+            avg = self._avg_duration or 60.0
+        return waiting * avg / self.workers
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queued": len(self._queue),
+                "running": len(self._running),
+            }
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job_id, fn, args = self._queue.popleft()
+                self._running[job_id] = time.monotonic()
+
+            try:
+                fn(*args)
+            except Exception:
+                # Task functions report their own errors; this only keeps the
+                # worker alive if one of them lets something escape.
+                logger.exception("Unhandled error in %s job %s", self.name, job_id)
+            finally:
+                with self._cond:
+                    started = self._running.pop(job_id, None)
+                    if started is not None:
+                        duration = time.monotonic() - started
+                        if self._avg_duration is None:
+                            self._avg_duration = duration
+                        else:
+                            self._avg_duration = 0.7 * self._avg_duration + 0.3 * duration
+
+
+class ConversionScheduler:
+    """Routes conversion jobs to named worker pools (pipeline stages and one
+    pool per device class). A job may move from pool to pool via handoff().
+
+    `max_queue` bounds how many jobs may wait in any single pool; beyond that
+    submit() raises QueueFull so the API can answer 429 instead of piling up
+    Transkun processes that all slow each other down.
+    """
+
+    def __init__(self, pool_sizes: dict, max_queue: int = 20):
+        self.max_queue = max(1, int(max_queue))
+        self._pools = {name: WorkerPool(name, size) for name, size in pool_sizes.items()}
+        self._job_pools: dict = {}
+        self._cancel_callbacks: dict = {}
+        self._lock = threading.Lock()
+
+    def pool(self, name: str) -> WorkerPool:
+        return self._pools[name]
+
+    def retry_after(self, pool: str) -> int:
+        return max(5, int(math.ceil(self._pools[pool].estimated_wait())))
+
+    def submit(self, job_id: str, pool: str, fn, *args, on_cancel=None):
+        """Queue fn(*args) on a pool. on_cancel runs if the job is cancelled
+        before it starts, e.g. to delete an upload nobody will process."""
+        worker_pool = self._pools[pool]
+        if worker_pool.pending() >= self.max_queue:
+            raise QueueFull(pool, self.retry_after(pool))
+        self._enqueue(job_id, pool, fn, args, on_cancel)
+
+    def handoff(self, job_id: str, pool: str, fn, *args, on_cancel=None):
+        """Queue the next stage of a job that is running right now.
+
+        Jobs are only admitted (and refused with QueueFull) at their first
+        stage; a later stage always gets queued so admitted work is never
+        dropped halfway through.
+        """
+        self._enqueue(job_id, pool, fn, args, on_cancel)
+
+    def _enqueue(self, job_id: str, pool: str, fn, args, on_cancel):
+        # Identifies this stage, so a stage finishing after it handed the job
+        # to another pool does not drop the new stage's bookkeeping.
+        token = object()
+
+        def _run(*job_args):
+            try:
+                fn(*job_args)
+            finally:
+                with self._lock:
+                    if self._job_pools.get(job_id, (None, None))[1] is token:
+                        self._job_pools.pop(job_id, None)
+                        self._cancel_callbacks.pop(job_id, None)
+
+        with self._lock:
+            self._job_pools[job_id] = (pool, token)
+            if on_cancel is not None:
+                self._cancel_callbacks[job_id] = on_cancel
+            else:
+                self._cancel_callbacks.pop(job_id, None)
+        self._pools[pool].submit(job_id, _run, *args)
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            pool, _ = self._job_pools.get(job_id, (None, None))
+        if pool is None:
+            return False
+        removed = self._pools[pool].cancel(job_id)
+        if removed:
+            with self._lock:
+                self._job_pools.pop(job_id, None)
+                callback = self._cancel_callbacks.pop(job_id, None)
+            if callback is not None:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Cancel callback failed for job %s", job_id)
+        return removed
+
+    def position(self, job_id: str) -> tuple[str, int] | None:
+        """(pool name, position) for a known job; see WorkerPool.position."""
+        with self._lock:
+            pool, _ = self._job_pools.get(job_id, (None, None))
+        if pool is None:
+            return None
+        position = self._pools[pool].position(job_id)
+        if position is None:
+            return None
+        return pool, position
+
+    def snapshot(self) -> dict:
+        return {name: pool.snapshot() for name, pool in self._pools.items()}
@@ -0,0 +1,164 @@
+"""Cache of MIDI-to-sheet conversions.
+
+The sheet viewer asks for a conversion on every open and every settings
+change. Results are keyed by the MIDI's content digest, the canonical
+converter settings and the converter version, so reopening a sheet or
+toggling a setting back returns the stored text without parsing the MIDI.
+Recent sheets are kept in memory; all of them live in `<root>/<key>.txt`,
+bounded in size and evicted least recently used first through the SQLite
+index in `<root>/index.sqlite3`.
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def sheet_cache_key(midi_digest: str, settings: dict, converter_version) -> str:
+    material = json.dumps(
+        [midi_digest, settings, str(converter_version)], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SheetCache:
+    def __init__(self, root: str, max_bytes: int, memory_items: int = 64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        os.makedirs(root, exist_ok=True)
+        self._memory: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(root, "index.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            """
+        )
+        self._hits = {"memory": 0, "disk": 0}
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _text_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.txt")
+
+    def _remember(self, key: str, text: str):
+        """Put text in the memory tier; called with the lock held."""
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> tuple[str | None, str | None]:
+        """(sheet text, "memory" or "disk") for a cached conversion, or
+        (None, None)."""
+        if not self.enabled:
+            return None, None
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self._hits["memory"] += 1
+                self._conn.execute(
+                    "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+                )
+                return text, "memory"
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            try:
+                with open(self._text_path(key), "r", encoding="utf-8") as handle:
+                    text = handle.read()
+            except OSError:
+                text = None
+        with self._lock:
+            if text is None:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._misses += 1
+                return None, None
+            self._conn.execute(
+                "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            self._hits["disk"] += 1
+            self._remember(key, text)
+        return text, "disk"
+
+    def put(self, key: str, text: str):
+        if not self.enabled:
+            return
+        path = self._text_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                handle.write(text)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Could not store sheet in cache: %s", exc)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        now = time.time()
+        with self._lock:
+            self._remember(key, text)
+            self._conn.execute(
+                "INSERT INTO entries (key, size, created, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET size = excluded.size, last_used = excluded.last_used",
+                (key, os.path.getsize(path), now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            try:
+                os.remove(self._text_path(key))
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            return {
+                "memory_hits": self._hits["memory"],
+                "disk_hits": self._hits["disk"],
+                "misses": self._misses,
+                "entries": entries,
+                "memory_entries": len(self._memory),
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,154 @@
+"""Silence trimming before transcription.
+
+Screen recordings and short-form videos often carry long silent intros,
+outros or gaps that Transkun would otherwise process at full cost. The
+decoded PCM is scanned block by block for frames whose RMS stays below a
+threshold, long silent stretches are cut out of a copy of the WAV, and the
+resulting MIDI is mapped back onto the original timeline afterwards.
+"""
+import bisect
+import os
+import wave
+
+import numpy as np
+
+from utils.long_audio import wav_duration
+
+FRAME_SECONDS = 0.05
+BLOCK_FRAMES = 2048
+
+
+def _frame_levels_db(wav_path: str) -> tuple[np.ndarray, int, float]:
+    """RMS level in dBFS of each FRAME_SECONDS frame of a 16-bit WAV."""
+    with wave.open(wav_path, "rb") as handle:
+        if handle.getsampwidth() != 2:
+            raise ValueError("silence trimming needs 16-bit PCM")
+        channels = handle.getnchannels()
+        rate = handle.getframerate()
+        frame_len = max(1, int(rate * FRAME_SECONDS))
+        levels = []
+        while True:
+            raw = handle.readframes(frame_len * BLOCK_FRAMES)
+            if not raw:
+                break
+            samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            usable = len(samples) - len(samples) % frame_len
+            if usable:
+                frames = samples[:usable].reshape(-1, frame_len)
+                levels.append(np.sqrt(np.mean(frames * frames, axis=1)))
+            if usable < len(samples):
+                tail = samples[usable:]
+                levels.append(np.array([np.sqrt(np.mean(tail * tail))], dtype=np.float32))
+    if not levels:
+        return np.zeros(0, dtype=np.float32), rate, FRAME_SECONDS
+    rms = np.concatenate(levels)
+    return 20.0 * np.log10(np.maximum(rms, 1e-10)), rate, frame_len / rate
+
+
+def find_silent_regions(wav_path: str, threshold_db: float = -50.0, min_silence: float = 2.0,
+                        padding: float = 0.25) -> tuple[list[tuple[float, float]], float]:
+    """Silent stretches of at least min_silence seconds, shrunk by `padding`
+    on both sides so note tails and attacks are kept. Returns
+    (regions, total duration)."""
+    levels, _rate, frame_seconds = _frame_levels_db(wav_path)
+    duration = wav_duration(wav_path)
+    if not len(levels):
+        return [], duration
+
+    silent = levels < threshold_db
+    # Run boundaries: +1 where a silent run starts, -1 just after it ends
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    regions = []
+    for start, end in zip(starts, ends):
+        begin = float(start * frame_seconds)
+        finish = min(float(end * frame_seconds), duration)
+        if finish - begin < min_silence:
+            continue
+        cut_start = begin + padding if begin > 0 else 0.0
+        cut_end = finish - padding if finish < duration else duration
+        if cut_end > cut_start:
+            regions.append((cut_start, cut_end))
+    return regions, duration
+
+
+def trim_regions(wav_path: str, output_path: str, regions) -> list[tuple[float, float]]:
+    """Write wav_path without `regions`. Returns the kept segments as
+    (start in trimmed file, start in original) pairs, one per segment."""
+    with wave.open(wav_path, "rb") as src, wave.open(output_path, "wb") as dst:
+        rate = src.getframerate()
+        total = src.getnframes()
+        dst.setparams(src.getparams())
+
+        segments = []
+        cursor = 0
+        written = 0
+        bounds = [(int(round(a * rate)), int(round(b * rate))) for a, b in regions]
+        for cut_start, cut_end in bounds + [(total, total)]:
+            if cut_start > cursor:
+                segments.append((written / rate, cursor / rate))
+                src.setpos(cursor)
+                remaining = cut_start - cursor
+                while remaining > 0:
+                    chunk = src.readframes(min(remaining, rate * 10))
+                    if not chunk:
+                        break
+                    dst.writeframes(chunk)
+                    remaining -= len(chunk) // (src.getsampwidth() * src.getnchannels())
+                written += cut_start - cursor
+            cursor = max(cursor, cut_end)
+    return segments
+
+
+class TimeMap:
+    """Maps times in the trimmed audio back to the original timeline."""
+
+    def __init__(self, segments):
+        self._trimmed = [seg[0] for seg in segments]
+        self._original = [seg[1] for seg in segments]
+
+    def _segment(self, t: float) -> int:
+        return max(0, bisect.bisect_right(self._trimmed, t) - 1)
+
+    def __call__(self, t: float) -> float:
+        if not self._trimmed:
+            return t
+        index = self._segment(t)
+        return self._original[index] + (t - self._trimmed[index])
+
+    def span(self, start: float, end: float) -> tuple[float, float]:
+        """Map a note. The end is mapped through the start's segment and
+        clamped to where that segment ends, so a note held across a splice
+        isn't stretched over the silence that was cut there."""
+        if not self._trimmed:
+            return start, end
+        index = self._segment(start)
+        if index + 1 < len(self._trimmed):
+            end = min(end, self._trimmed[index + 1])
+        offset = self._original[index] - self._trimmed[index]
+        return start + offset, max(start, end) + offset
+
+
+def remap_midi(midi_path: str, segments):
+    """Rewrite a MIDI transcribed from trimmed audio onto the original
+    timeline."""
+    import pretty_midi
+
+    time_map = TimeMap(segments)
+    midi = pretty_midi.PrettyMIDI(midi_path)
+    for inst in midi.instruments:
+        for note in inst.notes:
+            note.start, note.end = time_map.span(note.start, note.end)
+        for cc in inst.control_changes:
+            cc.time = time_map(cc.time)
+        for bend in inst.pitch_bends:
+            bend.time = time_map(bend.time)
+    # Replace rather than overwrite: the file may be a hard link into the
+    # transcription cache.
+    tmp_path = f"{midi_path}.remap.tmp"
+    midi.write(tmp_path)
+    os.replace(tmp_path, midi_path)
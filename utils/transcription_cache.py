@@ -0,0 +1,164 @@
+"""Content-addressed cache of Transkun results.
+
+Entries are keyed by a digest of the decoded PCM plus whatever identifies the
+model run (model file, Transkun version, device), so the same audio submitted
+again — re-uploaded or through another URL — skips transcription entirely.
+MIDI blobs live in `<root>/midi/`, the index in `<root>/index.sqlite3`.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import wave
+
+logger = logging.getLogger(__name__)
+
+PCM_CHUNK_FRAMES = 256 * 1024
+
+
+def wav_pcm_digest(wav_path: str) -> str:
+    """sha256 of the sample data only, so header differences don't matter."""
+    digest = hashlib.sha256()
+    with wave.open(wav_path, "rb") as handle:
+        digest.update(f"{handle.getnchannels()}:{handle.getsampwidth()}:{handle.getframerate()}:".encode())
+        while True:
+            frames = handle.readframes(PCM_CHUNK_FRAMES)
+            if not frames:
+                break
+            digest.update(frames)
+    return digest.hexdigest()
+
+
+def cache_key(audio_digest: str, *parts) -> str:
+    material = ":".join([audio_digest, *(str(part) for part in parts)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class TranscriptionCache:
+    """Size-bounded LRU store of MIDI files with an on-disk SQLite index."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "midi")
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(root, "index.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            """
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.blob_dir, f"{key}.mid")
+
+    def _bump(self, counter: str):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (counter,),
+        )
+
+    def fetch(self, key: str, dest_path: str) -> bool:
+        """Place the cached MIDI for key at dest_path. Counts a hit or miss."""
+        if not self.enabled:
+            return False
+        blob = self._blob_path(key)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(blob):
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump("misses")
+                return False
+            self._conn.execute(
+                "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            self._bump("hits")
+
+        try:
+            os.link(blob, dest_path)
+        except OSError:
+            shutil.copy2(blob, dest_path)
+        return True
+
+    def store(self, key: str, midi_path: str):
+        if not self.enabled or not os.path.exists(midi_path):
+            return
+        blob = self._blob_path(key)
+        tmp_path = f"{blob}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(midi_path, tmp_path)
+            os.replace(tmp_path, blob)
+        except OSError as exc:
+            logger.warning("Could not store transcription in cache: %s", exc)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO entries (key, size, created, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET size = excluded.size, last_used = excluded.last_used",
+                (key, os.path.getsize(blob), now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
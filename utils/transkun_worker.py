@@ -0,0 +1,372 @@
+"""Long-lived Transkun worker processes.
+
+Running `transkun in.mp3 out.mid` per job pays interpreter start-up, the torch
+import and the checkpoint load every time, which dominates short clips. A
+worker started with `python -m utils.transkun_worker --device cuda` loads the
+model once and then transcribes jobs sent to it as JSON lines on stdin,
+answering on stdout. TranskunEngine keeps a pool of such workers per device.
+"""
+import argparse
+import collections
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STARTUP_TIMEOUT = 300
+# Queued by the stdout reader when the worker's pipe closes
+_EOF = {"type": "eof"}
+
+
+class TranskunEngineUnavailable(Exception):
+    """The resident worker could not be started or could not load the model."""
+
+
+class TranskunWorkerCrashed(Exception):
+    """The worker process exited while a job was running (killed or crashed)."""
+
+
+class TranskunWorkerStartupTimeout(TranskunWorkerCrashed):
+    """The worker did not report ready in time. Usually a slow cold start
+    (first model download, busy disk), so it counts as a transient failure."""
+
+
+class TranskunWorkerError(RuntimeError):
+    """Transkun itself reported an error for a job."""
+
+
+def default_model_files() -> tuple[str, str]:
+    weight = os.environ.get("TRANSKUN_WEIGHT")
+    conf = os.environ.get("TRANSKUN_CONF")
+    if weight and conf:
+        return weight, conf
+
+    import transkun
+    pretrained = os.path.join(os.path.dirname(transkun.__file__), "pretrained")
+    return (
+        weight or os.path.join(pretrained, "2.0.pt"),
+        conf or os.path.join(pretrained, "2.0.conf"),
+    )
+
+
+def load_model(device: str):
+    """Load the Transkun model the same way `transkun.transcribe` does."""
+    import torch
+    import moduleconf
+
+    weight, conf_path = default_model_files()
+    conf_manager = moduleconf.parseFromFile(conf_path)
+    transkun_cls = conf_manager["Model"].module.TransKun
+    conf = conf_manager["Model"].config
+
+    checkpoint = torch.load(weight, map_location=device)
+    model = transkun_cls(conf=conf).to(device)
+    if "best_state_dict" in checkpoint:
+        model.load_state_dict(checkpoint["best_state_dict"], strict=False)
+    else:
+        model.load_state_dict(checkpoint["state_dict"], strict=False)
+    model.eval()
+    torch.set_grad_enabled(False)
+    return model, os.path.basename(weight)
+
+
+def transcribe_file(model, device: str, input_path: str, output_path: str):
+    import torch
+    from transkun.transcribe import readAudio, writeMidi
+
+    fs, audio = readAudio(input_path)
+    if fs != model.fs:
+        import soxr
+        audio = soxr.resample(audio, fs, model.fs)
+
+    x = torch.from_numpy(audio).to(device)
+    notes = model.transcribe(x, discardSecondHalf=False)
+    writeMidi(notes).write(output_path)
+
+
+def serve(device: str, threads: int | None = None) -> int:
+    # Keep stdout for the protocol only: anything Transkun, torch or C
+    # extensions print goes to stderr instead of corrupting the JSON stream.
+    protocol = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    def send(message: dict):
+        protocol.write(json.dumps(message) + "\n")
+        protocol.flush()
+
+    try:
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        model, model_name = load_model(device)
+    except Exception as exc:
+        send({"type": "fatal", "error": f"{type(exc).__name__}: {exc}"})
+        return 1
+
+    send({"type": "ready", "device": device, "model": model_name, "fs": getattr(model, "fs", None)})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            continue
+        job_id = job.get("id")
+        try:
+            transcribe_file(model, device, job["input"], job["output"])
+            send({"type": "done", "id": job_id})
+        except Exception as exc:
+            send({"type": "error", "id": job_id, "error": f"{type(exc).__name__}: {exc}"})
+    return 0
+
+
+class TranskunWorker:
+    """Parent-side handle for one worker process."""
+
+    def __init__(self, device: str, threads: int | None = None, cwd: str | None = None):
+        self.device = device
+        self.threads = threads
+        self.cwd = cwd
+        self.process: subprocess.Popen | None = None
+        self.model_name = None
+        self._messages: queue.Queue = queue.Queue()
+        self._stderr_tail = collections.deque(maxlen=40)
+        # Called with each stderr line while a job runs (progress parsing)
+        self.output_listener = None
+
+    def start(self, timeout: float = DEFAULT_STARTUP_TIMEOUT, on_spawn=None):
+        cmd = [sys.executable, "-m", "utils.transkun_worker", "--device", self.device]
+        if self.threads:
+            cmd += ["--threads", str(self.threads)]
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+            )
+        except OSError as exc:
+            raise TranskunEngineUnavailable(str(exc)) from exc
+
+        if on_spawn is not None:
+            on_spawn(self.process)
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+        message = self._next_message(timeout)
+        if message is not None and message.get("type") == "ready":
+            self.model_name = message.get("model")
+            return
+
+        self.kill()
+        if message is _EOF:
+            # No "fatal" report: the process was killed (e.g. /api/stop) or
+            # died hard, which says nothing about whether the model loads.
+            raise TranskunWorkerCrashed(self.stderr_summary() or "worker exited during start-up")
+        if message is None:
+            raise TranskunWorkerStartupTimeout(
+                f"worker did not become ready within {timeout:g}s"
+                + (f": {self.stderr_summary()}" if self.stderr_summary() else "")
+            )
+        # The worker reported that the model cannot be loaded
+        raise TranskunEngineUnavailable(message.get("error") or "worker failed to start")
+
+    def _read_stdout(self):
+        proc = self.process
+        try:
+            for line in proc.stdout:
+                try:
+                    self._messages.put(json.loads(line))
+                except ValueError:
+                    continue
+        except Exception:
+            pass
+        finally:
+            self._messages.put(_EOF)
+
+    def _read_stderr(self):
+        try:
+            for line in self.process.stderr:
+                line = line.strip()
+                if line:
+                    self._stderr_tail.append(line)
+                    listener = self.output_listener
+                    if listener is not None:
+                        try:
+                            listener(line)
+                        except Exception:
+                            logger.debug("Output listener failed", exc_info=True)
+        except Exception:
+            pass
+
+    def _next_message(self, timeout: float | None):
+        try:
+            return self._messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stderr_summary(self) -> str:
+        return " | ".join(list(self._stderr_tail)[-4:])
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.kill()
+            except Exception:
+                pass
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.kill()
+
+    def run(self, input_path: str, output_path: str, timeout: float | None = None):
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "input": os.path.abspath(input_path), "output": os.path.abspath(output_path)}
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError) as exc:
+            raise TranskunWorkerCrashed(str(exc)) from exc
+
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            message = self._next_message(remaining)
+            if message is None:
+                self.kill()
+                raise TimeoutError("Transkun worker timed out")
+            if message is _EOF:
+                raise TranskunWorkerCrashed(self.stderr_summary() or "worker exited")
+            if message.get("id") != job_id:
+                continue
+            if message.get("type") == "done":
+                return
+            raise TranskunWorkerError(message.get("error") or "Transkun failed")
+
+
+class TranskunEngine:
+    """Pool of resident workers, created on demand and reused across jobs.
+
+    Concurrency is bounded by the conversion scheduler, so the pool never
+    holds more workers per device than that device has worker slots.
+    """
+
+    def __init__(self, cwd: str | None = None, startup_timeout: float = DEFAULT_STARTUP_TIMEOUT):
+        self.cwd = cwd
+        self.startup_timeout = startup_timeout
+        self._idle: dict = collections.defaultdict(list)
+        self._unavailable: dict = {}
+        self._startup_crashes: dict = collections.Counter()
+        self._lock = threading.Lock()
+
+    def available(self, device: str) -> bool:
+        return device not in self._unavailable
+
+    def unavailable_reason(self, device: str) -> str | None:
+        return self._unavailable.get(device)
+
+    def _checkout(self, device: str, threads: int | None, on_spawn=None) -> TranskunWorker:
+        with self._lock:
+            idle = self._idle[(device, threads)]
+            while idle:
+                worker = idle.pop()
+                if worker.alive():
+                    return worker
+
+        worker = TranskunWorker(device, threads=threads, cwd=self.cwd)
+        try:
+            worker.start(self.startup_timeout, on_spawn=on_spawn)
+        except TranskunEngineUnavailable as exc:
+            # A fatal report (the model cannot be loaded) is not transient;
+            # stop retrying the resident path for this device and let
+            # callers fall back.
+            self._unavailable[device] = str(exc)
+            raise
+        except TranskunWorkerCrashed as exc:
+            # Crashes and start-up timeouts may be transient: give up on the
+            # device only after three in a row
+            self._startup_crashes[device] += 1
+            if self._startup_crashes[device] >= 3:
+                self._unavailable[device] = f"worker keeps failing during start-up: {exc}"
+            raise
+        self._startup_crashes[device] = 0
+        logger.info("Resident Transkun worker ready on %s (%s)", device, worker.model_name)
+        return worker
+
+    def _checkin(self, worker: TranskunWorker):
+        if not worker.alive():
+            return
+        with self._lock:
+            self._idle[(worker.device, worker.threads)].append(worker)
+
+    def _respawn(self, device: str, threads: int | None):
+        """Replace a crashed worker in the background so the next job finds a
+        loaded model instead of paying the start-up cost itself."""
+        def _start():
+            try:
+                self._checkin(self._checkout(device, threads))
+            except Exception as exc:
+                logger.warning("Could not restart Transkun worker on %s: %s", device, exc)
+        threading.Thread(target=_start, daemon=True).start()
+
+    def transcribe(self, input_path: str, output_path: str, device: str,
+                   threads: int | None = None, on_start=None, timeout: float | None = None,
+                   on_output=None):
+        """Transcribe on a resident worker. on_start(process) receives the
+        worker's Popen so the caller can register it for cancellation;
+        on_output(line) receives what the worker prints to stderr meanwhile."""
+        worker = self._checkout(device, threads, on_spawn=on_start)
+        if on_start is not None:
+            on_start(worker.process)
+        worker.output_listener = on_output
+        try:
+            worker.run(input_path, output_path, timeout=timeout)
+        except TranskunWorkerCrashed:
+            worker.kill()
+            self._respawn(device, threads)
+            raise
+        finally:
+            worker.output_listener = None
+            self._checkin(worker)
+
+    def shutdown(self):
+        with self._lock:
+            workers = [worker for idle in self._idle.values() for worker in idle]
+            self._idle.clear()
+        for worker in workers:
+            worker.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Resident Transkun transcription worker")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    return serve(args.device, args.threads)
+
+
+if __name__ == "__main__":
+    sys.exit(main())